@@ -0,0 +1,73 @@
+"""Benchmark building the paralympics query database with the row-by-row loaders and with bulk_load_data.
+
+The sheets in paralympics_all.xlsx are repeated to make larger data sets. Each copy of the events is moved on by
+100 years so that (year, type) stays unique, and the medal standings are moved with them. The row-by-row loaders
+insert through a pandas Series per row, so they are only timed on the smaller scales.
+
+Run from the project root:
+    python benchmarks/bench_bulk_load.py
+"""
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from tutorialpkg.caching import read_sheet
+from tutorialpkg.week8_queries import create_query_db as cqd
+
+DATA_PATH = Path(__file__).parent.parent.joinpath('src', 'tutorialpkg', 'data_db_activity', 'paralympics_all.xlsx')
+SCALES = [1, 10, 100, 1000]
+ROW_BY_ROW_MAX_SCALE = 100
+
+
+def scale_sheets(events_df, medals_df, scale):
+    """Return the events and medal standings repeated scale times, with the years moved on 100 years per copy."""
+    events = pd.concat([events_df.assign(year=events_df['year'] + 100 * k) for k in range(scale)], ignore_index=True)
+    medals = pd.concat([medals_df.assign(Year=medals_df['Year'] + 100 * k) for k in range(scale)], ignore_index=True)
+    return events, medals
+
+
+def build(db_path, events_df, medals_df, npc_df, bulk):
+    """Create the database and add the data, returning the time taken in seconds."""
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.execute('PRAGMA foreign_keys = ON;')
+    cqd.create_paralympics_db_structure(cur, conn)
+    start = time.perf_counter()
+    if bulk:
+        cqd.bulk_load_data(events_df.copy(), medals_df, npc_df, cur, conn)
+    else:
+        events = events_df.copy()
+        cqd.add_country_data(npc_df, cur, conn)
+        cqd.add_host_data(events, cur, conn)
+        cqd.add_event_data(events, cur, conn)
+        cqd.add_host_event_data(events, cur, conn)
+        cqd.add_disabilities_data(events, cur, conn)
+        cqd.add_medal_result_data(medals_df, cur, conn)
+    elapsed = time.perf_counter() - start
+    medal_rows = cur.execute('SELECT COUNT(*) FROM MedalResult').fetchone()[0]
+    conn.close()
+    return elapsed, medal_rows
+
+
+def main():
+    events_df = read_sheet(DATA_PATH, sheet_name='events')
+    medals_df = read_sheet(DATA_PATH, sheet_name='medal_standings')
+    npc_df = read_sheet(DATA_PATH, sheet_name='npc_codes')
+
+    print(f"{'scale':>6} {'events':>8} {'medals':>9} {'row by row (s)':>15} {'bulk (s)':>9}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for scale in SCALES:
+            events, medals = scale_sheets(events_df, medals_df, scale)
+            row_time = float('nan')
+            if scale <= ROW_BY_ROW_MAX_SCALE:
+                row_time, _ = build(Path(tmp_dir).joinpath(f'row_{scale}.db'), events, medals, npc_df, bulk=False)
+            bulk_time, medal_rows = build(Path(tmp_dir).joinpath(f'bulk_{scale}.db'), events, medals, npc_df,
+                                          bulk=True)
+            print(f'{scale:>6} {len(events):>8} {medal_rows:>9} {row_time:>15.2f} {bulk_time:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
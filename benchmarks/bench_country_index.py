@@ -0,0 +1,52 @@
+"""Benchmark building the country index from an NPC codes file against loading the saved, memory-mapped index.
+
+Synthetic NPC codes tables of each size are written as CSV files to a temporary directory with
+synthetic_data.generate_npc_chunk. The index is built from the file with use_cache=False, then loaded twice with the
+default cache: the first load builds and saves the index, the second memory-maps the saved copy. Each time the codes
+of 1,000 country names are then looked up, which searches the memory-mapped names of the saved copy.
+
+Run from the project root:
+    python benchmarks/bench_country_index.py
+    python benchmarks/bench_country_index.py --sizes 100000 1000000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from tutorialpkg.country_names import CountryIndex
+from tutorialpkg.synthetic_data import generate_npc_chunk
+
+DEFAULT_SIZES = [232, 10_000, 100_000, 1_000_000]
+
+
+def time_load(npc_path, names, use_cache):
+    """Return the time taken to load the country index for npc_path and look up the codes of names in seconds."""
+    start = time.perf_counter()
+    CountryIndex.load(npc_path, aliases_path=None, use_cache=use_cache).codes(names)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark building and loading the country index.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Numbers of NPCs to test')
+    args = parser.parse_args()
+
+    print(f"{'NPCs':>10} {'build (s)':>10} {'build and save (s)':>19} {'memory-mapped (s)':>18} {'speed up':>9}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_npcs in args.sizes:
+            npc_path = Path(tmp_dir).joinpath(f'npc_codes_{n_npcs}.csv')
+            npc_df = generate_npc_chunk(0, n_npcs, np.random.default_rng(0))
+            npc_df.to_csv(npc_path, index=False)
+            names = npc_df['name'].sample(1_000, replace=True, random_state=0)
+            build_time = time_load(npc_path, names, use_cache=False)
+            save_time = time_load(npc_path, names, use_cache=True)
+            mapped_time = time_load(npc_path, names, use_cache=True)
+            print(f'{n_npcs:>10} {build_time:>10.3f} {save_time:>19.3f} {mapped_time:>18.3f} '
+                  f'{build_time / mapped_time:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Benchmark the data preparation functions on scaled copies of the shipped data files.
+
+The raw events in paralympics_events_raw.csv are repeated to each size and each function is timed on a fresh copy of
+its input. Each function is then run a second time under tracemalloc to record the peak memory it allocates, as
+tracemalloc slows down the code it traces. Setting up the inputs is not included in either measurement.
+
+Results can be saved to a CSV file and compared with a previous run, to catch regressions in the nightly run.
+
+Run from the project root, e.g.:
+    python benchmarks/bench_data_prep.py --sizes 1000 100000 --save results.csv
+    python benchmarks/bench_data_prep.py --sizes 1000 100000 --compare results.csv
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import pandas as pd
+
+from tutorialpkg import data_utils
+from tutorialpkg.country_names import CountryIndex, load_aliases
+from tutorialpkg.tutor_solution import tutorial2_refactored as t2
+
+DATA_DIR = Path(__file__).parent.parent.joinpath('src', 'tutorialpkg', 'data')
+DEFAULT_SIZES = [1_000, 100_000, 10_000_000]
+EVENTS_COLUMNS_TO_CHANGE = ['countries', 'events', 'participants_m', 'participants_f', 'participants']
+
+
+def scale_rows(df, n_rows):
+    """Repeat the rows of df to make a DataFrame with n_rows rows."""
+    repeats = -(-n_rows // len(df))
+    return pd.concat([df] * repeats, ignore_index=True).head(n_rows)
+
+
+def make_inputs(n_rows):
+    """Create the inputs for the benchmarks at a given size. Returns a dictionary of DataFrames."""
+    raw = scale_rows(pd.read_csv(DATA_DIR.joinpath('paralympics_events_raw.csv')), n_rows)
+    npc = pd.read_csv(DATA_DIR.joinpath('npc_codes.csv'), encoding='utf-8', encoding_errors='ignore')
+    prepared = data_utils.prepare_data(raw.copy(), EVENTS_COLUMNS_TO_CHANGE, save=False, verbose=False)
+    cleaned = data_utils.clean_events(prepared.copy(), CountryIndex(npc, load_aliases()))
+    dated = t2.convert_to_datetime(raw.copy(), ['start', 'end'])
+    return {'raw': raw, 'npc': npc[['Code', 'Name']], 'npc_all': npc, 'prepared': prepared, 'cleaned': cleaned,
+            'dated': dated}
+
+
+# Each benchmark is (name, name of the input, function called with a copy of the input and the inputs dictionary)
+BENCHMARKS = [
+    ('data_utils.prepare_data', 'raw',
+     lambda df, inputs: data_utils.prepare_data(df, EVENTS_COLUMNS_TO_CHANGE, save=False, verbose=False)),
+    ('data_utils.handle_missing_values', 'prepared',
+     lambda df, inputs: data_utils.handle_missing_values(df, verbose=False)),
+    ('data_utils.replace_country_names', 'prepared',
+     lambda df, inputs: data_utils.replace_country_names(df, verbose=False)),
+    ('data_utils.merge_dataframes', 'cleaned',
+     lambda df, inputs: data_utils.merge_dataframes(df, inputs['npc'], verbose=False)),
+    ('tutorial2_refactored.convert_float_to_int', 'raw',
+     lambda df, inputs: t2.convert_float_to_int(df)),
+    ('tutorial2_refactored.convert_to_datetime', 'raw',
+     lambda df, inputs: t2.convert_to_datetime(df, ['start', 'end'])),
+    ('tutorial2_refactored.clean_type_column', 'raw',
+     lambda df, inputs: t2.clean_type_column(df)),
+    ('tutorial2_refactored.add_duration_column', 'dated',
+     lambda df, inputs: t2.add_duration_column(df, 'start', 'end')),
+    ('tutorial2_refactored.prepare_event_data', 'raw',
+     lambda df, inputs: t2.prepare_event_data(df, inputs['npc_all'], save=False)),
+]
+
+
+def run_benchmark(func, df, inputs, measure_memory):
+    """Run func on a copy of df, returning the time taken in seconds and the peak memory allocated in bytes."""
+    data = df.copy()
+    start = time.perf_counter()
+    func(data, inputs)
+    seconds = time.perf_counter() - start
+    del data
+
+    peak = float('nan')
+    if measure_memory:
+        data = df.copy()
+        tracemalloc.start()
+        func(data, inputs)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def run(sizes, measure_memory=True):
+    """Run all the benchmarks at each size. Returns a DataFrame with a row per benchmark and size."""
+    results = []
+    for n_rows in sizes:
+        inputs = make_inputs(n_rows)
+        for name, input_name, func in BENCHMARKS:
+            # Hide the messages the functions print, e.g. when a column with missing values cannot be converted
+            with warnings.catch_warnings(), open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                warnings.simplefilter('ignore')
+                seconds, peak = run_benchmark(func, inputs[input_name], inputs, measure_memory)
+            results.append({'function': name, 'rows': n_rows, 'seconds': seconds, 'peak_mb': peak / 1e6})
+            print(f'{name:<45} {n_rows:>10} {seconds:>10.4f} s {peak / 1e6:>10.1f} MB')
+        del inputs
+    return pd.DataFrame(results)
+
+
+def compare(results, baseline_path, threshold):
+    """Print the benchmarks that are slower than the baseline by more than the threshold ratio.
+
+    Returns:
+        bool: True if there are no regressions.
+    """
+    baseline = pd.read_csv(baseline_path)
+    merged = results.merge(baseline, on=['function', 'rows'], suffixes=('', '_baseline'))
+    merged['ratio'] = merged['seconds'] / merged['seconds_baseline']
+    regressions = merged[merged['ratio'] > threshold]
+    if regressions.empty:
+        print(f'\nNo benchmark is more than {threshold:.2f}x slower than {baseline_path}.')
+        return True
+    print(f'\nBenchmarks more than {threshold:.2f}x slower than {baseline_path}:')
+    print(regressions[['function', 'rows', 'seconds_baseline', 'seconds', 'ratio']].to_string(index=False))
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the paralympics data preparation functions.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Numbers of rows to test')
+    parser.add_argument('--no-memory', action='store_true', help='Only record the time, not the peak memory')
+    parser.add_argument('--save', type=Path, help='Save the results to this CSV file')
+    parser.add_argument('--compare', type=Path, help='Compare the times with the results in this CSV file')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='Slow down ratio reported as a regression by --compare, default 1.25')
+    args = parser.parse_args()
+
+    print(f"{'function':<45} {'rows':>10} {'time':>12} {'peak memory':>13}")
+    results = run(args.sizes, measure_memory=not args.no_memory)
+    if args.save:
+        results.to_csv(args.save, index=False)
+    if args.compare and not compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark drawing a long time series with every point against drawing it downsampled to the point budget.
+
+An hourly participants series of each size is made with a random walk and a single spike, like the 1994 winter games
+in the events. Hours rather than days are used as matplotlib cannot draw dates after the year 9999. The series is drawn
+and saved with draw_and_save_timeseries on the Agg backend, once with point_budget=None and once with the default
+budget. The time to choose the points with minmax_positions is shown on its own, and the spike is checked to be in the
+points that are kept.
+
+Run from the project root:
+    python benchmarks/bench_downsample.py
+    python benchmarks/bench_downsample.py --sizes 10000000 --budget 2000
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from tutorialpkg.downsample import DEFAULT_POINT_BUDGET, minmax_positions  # noqa: E402
+from tutorialpkg.sample import draw_and_save_timeseries  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def make_series(n_hours):
+    """Return hourly participants for n_hours hours, with a spike a third of the way through."""
+    rng = np.random.default_rng(0)
+    participants = 1_000 + np.cumsum(rng.normal(0, 5, n_hours))
+    participants[n_hours // 3] += 5_000
+    return pd.DataFrame({'start': pd.date_range('1960-01-01', periods=n_hours, freq='h'),
+                         'participants': participants})
+
+
+def timed(func, *args, **kwargs):
+    """Return the time taken to call func in seconds, without the messages it prints."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark downsampling the time series plots.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Numbers of hours to test')
+    parser.add_argument('--budget', type=int, default=DEFAULT_POINT_BUDGET, help='Points to draw')
+    args = parser.parse_args()
+
+    print(f"{'hours':>10} {'all points (s)':>15} {'downsampled (s)':>16} {'select (s)':>11} {'speed up':>9} "
+          f"{'peak kept':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_hours in args.sizes:
+            df = make_series(n_hours)
+            full_time = timed(draw_and_save_timeseries, df, 'start', 'participants', save_dir=tmp_dir, show=False,
+                              point_budget=None)
+            sampled_time = timed(draw_and_save_timeseries, df, 'start', 'participants', save_dir=tmp_dir, show=False,
+                                 point_budget=args.budget)
+            start = time.perf_counter()
+            keep = minmax_positions(df['participants'], args.budget)
+            select_time = time.perf_counter() - start
+            peak_kept = df['participants'].idxmax() in keep
+            print(f'{n_hours:>10} {full_time:>15.2f} {sampled_time:>16.2f} {select_time:>11.4f} '
+                  f'{full_time / sampled_time:>8.1f}x {str(peak_kept):>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark the batched nullable integer conversion against the per column conversions it replaced.
+
+The raw events in paralympics_events_raw.csv are repeated to each size. Three conversions of the float64 count columns
+are compared:
+- per column astype('int'), the old tutorial2_refactored.convert_float_to_int, which skips the columns with NaN
+- per column fillna(0).astype('int'), the old data_utils.prepare_data, which replaces NaN with 0
+- to_nullable_integers, which converts all the columns from one float array and keeps NaN as <NA>
+
+Each conversion is timed on a fresh copy of the input and then run again under tracemalloc to record the peak memory it
+allocates. The memory of the converted DataFrame is also shown.
+
+Run from the project root:
+    python benchmarks/bench_float_to_int.py
+    python benchmarks/bench_float_to_int.py --sizes 1000000 10000000
+"""
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+from tutorialpkg.data_utils import to_nullable_integers
+
+DATA_PATH = Path(__file__).parent.parent.joinpath('src', 'tutorialpkg', 'data', 'paralympics_events_raw.csv')
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000, 10_000_000]
+
+
+def per_column_astype(df):
+    """The tutorial2_refactored.convert_float_to_int loop from before it was batched."""
+    for col in df.select_dtypes(include=['float64']).columns:
+        try:
+            df[col] = df[col].astype('int')
+        except ValueError:
+            pass
+    return df
+
+
+def per_column_fillna(df):
+    """The data_utils.prepare_data conversion from before it was batched."""
+    for col in df.select_dtypes(include=['float64']).columns:
+        df[col] = df[col].fillna(0).astype('int')
+    return df
+
+
+def batched_nullable(df):
+    """The conversion now used by convert_float_to_int and prepare_data."""
+    return df.assign(**to_nullable_integers(df, df.select_dtypes(include=['float64']).columns))
+
+
+CONVERSIONS = [
+    ('per column astype', per_column_astype),
+    ('per column fillna(0)', per_column_fillna),
+    ('batched nullable', batched_nullable),
+]
+
+
+def make_counts(n_rows):
+    """Repeat the numeric columns of the raw events to n_rows rows."""
+    raw = pd.read_csv(DATA_PATH).select_dtypes(include='number')
+    return pd.concat([raw] * -(-n_rows // len(raw)), ignore_index=True).head(n_rows)
+
+
+def run_conversion(func, df):
+    """Return the time in seconds, the peak memory allocated and the memory of the result in bytes."""
+    data = df.copy()
+    start = time.perf_counter()
+    result = func(data)
+    seconds = time.perf_counter() - start
+    result_bytes = result.memory_usage(index=False).sum()
+    del data, result
+
+    data = df.copy()
+    tracemalloc.start()
+    func(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, result_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the float to integer conversions.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Numbers of rows to test')
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'conversion':<22} {'time (s)':>10} {'peak (MB)':>10} {'result (MB)':>12}")
+    for n_rows in args.sizes:
+        counts = make_counts(n_rows)
+        for name, func in CONVERSIONS:
+            seconds, peak, result_bytes = run_conversion(func, counts)
+            print(f'{n_rows:>10} {name:<22} {seconds:>10.4f} {peak / 1e6:>10.1f} {result_bytes / 1e6:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
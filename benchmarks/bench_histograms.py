@@ -0,0 +1,81 @@
+"""Benchmark drawing the summer and winter histograms with DataFrame.hist against drawing them from cached bin counts.
+
+The prepared events are repeated to each size and the participants_m and participants_f histograms of the summer and
+winter games are drawn and saved on the Agg backend. DataFrame.hist filters and bins the rows for each event type, as
+draw_and_save_histogram_by_event_type used to. With histogram_counts the first pair of histograms groups and bins the
+rows, the next pair fingerprints the columns and finds the counts in the cache, and the last pair is given the counts
+so the rows are not read at all. The time to calculate the counts is shown on its own.
+
+Run from the project root:
+    python benchmarks/bench_histograms.py
+    python benchmarks/bench_histograms.py --sizes 10000000
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+from pathlib import Path
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from tutorialpkg.histograms import calculate_histograms  # noqa: E402
+from tutorialpkg.sample import PREPARED_CSV_PATH, draw_and_save_histogram_by_event_type  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+COLUMNS = ['participants_m', 'participants_f']
+EVENT_TYPES = ['summer', 'winter']
+
+
+def dataframe_hist(df, save_dir):
+    for event_type in EVENT_TYPES:
+        axes = df[df['type'] == event_type][COLUMNS].hist(bins=10, figsize=(10, 6))
+        fig = axes.flat[0].figure
+        fig.savefig(Path(save_dir, f'histogram_{event_type}_events.png'))
+        plt.close(fig)
+
+
+def cached_counts(df, save_dir, histograms=None):
+    for event_type in EVENT_TYPES:
+        draw_and_save_histogram_by_event_type(df, event_type, COLUMNS, save_dir=save_dir, show=False,
+                                              histograms=histograms)
+
+
+def timed(func, *args, **kwargs):
+    """Return the time taken to call func in seconds, without the messages it prints."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the cached histogram counts.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Numbers of rows to test')
+    args = parser.parse_args()
+    events = pd.read_csv(PREPARED_CSV_PATH)
+
+    print(f"{'rows':>10} {'DataFrame.hist (s)':>19} {'first (s)':>10} {'cached (s)':>11} {'given (s)':>10} "
+          f"{'counts (s)':>11}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_rows in args.sizes:
+            df = events.iloc[np.arange(n_rows) % len(events)].reset_index(drop=True)
+            hist_time = timed(dataframe_hist, df, tmp_dir)
+            first_time = timed(cached_counts, df, tmp_dir)
+            cached_time = timed(cached_counts, df, tmp_dir)
+            start = time.perf_counter()
+            histograms = calculate_histograms(df, COLUMNS, group_col='type')
+            counts_time = time.perf_counter() - start
+            given_time = timed(cached_counts, None, tmp_dir, histograms=histograms)
+            print(f'{n_rows:>10} {hist_time:>19.3f} {first_time:>10.3f} {cached_time:>11.3f} {given_time:>10.3f} '
+                  f'{counts_time:>11.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark the host/country pair extraction used by add_host_data.
+
+Compares the original row-by-row pd.concat loop with extract_host_country_pairs on synthetic events data built from
+the events sheet of paralympics_all.xlsx. The loop is quadratic so it is only timed on the smaller sizes.
+
+Run from the project root:
+    python benchmarks/bench_host_pairs.py
+"""
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from tutorialpkg.caching import read_sheet
+from tutorialpkg.week8_queries.create_query_db import extract_host_country_pairs
+
+DATA_PATH = Path(__file__).parent.parent.joinpath('src', 'tutorialpkg', 'data_db_activity', 'paralympics_all.xlsx')
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+LOOP_MAX_SIZE = 10_000
+
+
+def concat_loop_pairs(df_events):
+    """The original implementation, kept here to compare against."""
+    host_country_df = pd.DataFrame(columns=['host', 'country'])
+    for index, row in df_events.iterrows():
+        hosts = row['host'].split(',')
+        countries = row['country'].split(',')
+        for host, country in zip(hosts, countries):
+            new_row = pd.DataFrame({'host': [host.strip()], 'country': [country.strip()]})
+            host_country_df = pd.concat([host_country_df, new_row], ignore_index=True)
+    return host_country_df.drop_duplicates(subset=['host', 'country'])
+
+
+def scale_events(df_events, n_rows):
+    """Repeat the events to n_rows, numbering the hosts so that the number of unique pairs also grows."""
+    repeats = -(-n_rows // len(df_events))
+    df = pd.concat([df_events[['host', 'country']]] * repeats, ignore_index=True).head(n_rows)
+    suffix = (df.index // len(df_events)).astype(str)
+    df['host'] = df['host'] + ' ' + suffix
+    return df
+
+
+def time_it(func, df):
+    start = time.perf_counter()
+    result = func(df)
+    return time.perf_counter() - start, result
+
+
+def main():
+    events = read_sheet(DATA_PATH, sheet_name='events')
+    # The pairs must be identical to the original for the sample data
+    expected = concat_loop_pairs(events).reset_index(drop=True)
+    actual = extract_host_country_pairs(events)
+    pd.testing.assert_frame_equal(expected.astype(str), actual.astype(str))
+
+    print(f"{'events':>10} {'loop (s)':>10} {'vectorised (s)':>15} {'us/event':>10}")
+    for n_rows in SIZES:
+        df = scale_events(events, n_rows)
+        loop_time = time_it(concat_loop_pairs, df)[0] if n_rows <= LOOP_MAX_SIZE else float('nan')
+        vec_time, _ = time_it(extract_host_country_pairs, df)
+        print(f'{n_rows:>10} {loop_time:>10.3f} {vec_time:>15.3f} {vec_time / n_rows * 1e6:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Compare query timings on the paralympics query database with and without the indexes from create_indexes.
+
+Builds the database at 1000x the sample size with bulk_load_data, times the week 8 queries and the foreign key
+lookups the row-by-row loaders used to make, then creates the indexes and times them again.
+
+Run from the project root:
+    python benchmarks/bench_indexes.py
+"""
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from bench_bulk_load import DATA_PATH, scale_sheets
+from tutorialpkg.caching import read_sheet
+from tutorialpkg.tutor_solution import tutorial8_para_select as para_select
+from tutorialpkg.week8_queries import create_query_db as cqd
+
+SCALE = 1000
+REPEATS = 5
+LOOKUPS = 1000
+
+
+def lookup_events(cursor):
+    """Find event ids by year and type, as add_host_event_data did for each row."""
+    for year in range(1960, 1960 + LOOKUPS):
+        cursor.execute('SELECT event_id FROM Event WHERE year = ? AND type = ?', (year, 'winter')).fetchone()
+
+
+def lookup_hosts(cursor):
+    """Find host ids by name, as add_host_event_data did for each row."""
+    hosts = [row[0] for row in cursor.execute('SELECT host FROM Host LIMIT ?', (LOOKUPS,)).fetchall()]
+    for host in hosts:
+        cursor.execute('SELECT host_id FROM Host WHERE host = ?', (host,)).fetchone()
+
+
+def medal_counts_for_event(cursor):
+    """Count the medal results for a single event."""
+    cursor.execute('SELECT COUNT(*) FROM MedalResult WHERE event_id = 27').fetchone()
+
+
+QUERIES = {
+    'select_event_participants_winter': para_select.select_event_participants_winter,
+    'select_intellectual_ability_events': para_select.select_intellectual_ability_events,
+    'select_faroe_results': para_select.select_faroe_results,
+    'select_join_groupby': para_select.select_join_groupby,
+    'medal results for event 27': medal_counts_for_event,
+    f'{LOOKUPS} Event lookups by year, type': lookup_events,
+    f'{LOOKUPS} Host lookups by host': lookup_hosts,
+}
+
+
+def time_queries(cursor):
+    """Return the best of REPEATS timings in seconds for each query."""
+    timings = {}
+    for name, query in QUERIES.items():
+        best = float('inf')
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            query(cursor)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    return timings
+
+
+def main():
+    events_df = read_sheet(DATA_PATH, sheet_name='events')
+    medals_df = read_sheet(DATA_PATH, sheet_name='medal_standings')
+    npc_df = read_sheet(DATA_PATH, sheet_name='npc_codes')
+    events, medals = scale_sheets(events_df, medals_df, SCALE)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = sqlite3.connect(Path(tmp_dir).joinpath('indexes.db'))
+        cur = conn.cursor()
+        cqd.create_paralympics_db_structure(cur, conn)
+        cqd.bulk_load_data(events, medals, npc_df, cur, conn)
+
+        without_indexes = time_queries(cur)
+        start = time.perf_counter()
+        cqd.create_indexes(cur, conn)
+        index_time = time.perf_counter() - start
+        with_indexes = time_queries(cur)
+        conn.close()
+
+    print(f'{len(events)} events, {len(medals)} medal results, indexes created in {index_time:.2f} s\n')
+    print(f"{'query':<40} {'no indexes (ms)':>16} {'indexes (ms)':>13} {'speed up':>9}")
+    for name in QUERIES:
+        before, after = without_indexes[name] * 1000, with_indexes[name] * 1000
+        print(f'{name:<40} {before:>16.2f} {after:>13.2f} {before / after:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
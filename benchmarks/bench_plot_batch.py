@@ -0,0 +1,75 @@
+"""Benchmark drawing the sample.py charts one after another against render_plots in a process pool.
+
+The sample plots are repeated to each number of charts, with each repeat saved to its own directory so no file is
+overwritten. The charts are first drawn one by one in this process on the Agg backend with show=False, then rendered
+with render_plots using one worker and the default of one worker per CPU. The number of figures still open after the
+charts are drawn is shown, as each chart now closes its figure once it is saved.
+
+Run from the project root:
+    python benchmarks/bench_plot_batch.py
+    python benchmarks/bench_plot_batch.py --sizes 500 --workers 4
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+from pathlib import Path
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from tutorialpkg.sample import PLOT_FUNCTIONS, PREPARED_CSV_PATH, SAMPLE_PLOTS, render_plots  # noqa: E402
+
+DEFAULT_SIZES = [7, 70, 210]
+
+
+def make_specs(n_charts, tmp_dir):
+    """Repeat the sample plots to n_charts specs, each repeat saved to a different directory."""
+    return [dict(SAMPLE_PLOTS[i % len(SAMPLE_PLOTS)], save_dir=Path(tmp_dir, str(i // len(SAMPLE_PLOTS))))
+            for i in range(n_charts)]
+
+
+def one_by_one(df, specs):
+    for spec in specs:
+        kwargs = dict(spec)
+        PLOT_FUNCTIONS[kwargs.pop('plot')](df, show=False, **kwargs)
+
+
+def timed(func, *args, **kwargs):
+    """Return the time taken to call func in seconds, without the messages it prints."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the batch plot renderer.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Numbers of charts to test')
+    parser.add_argument('--workers', type=int, default=None, help='Processes for render_plots. Default is one per CPU')
+    args = parser.parse_args()
+    df = pd.read_csv(PREPARED_CSV_PATH)
+    df['start'] = pd.to_datetime(df['start'], dayfirst=True)
+
+    print(f"{'charts':>8} {'method':<22} {'time (s)':>10} {'charts/s':>10} {'open figures':>13}")
+    for n_charts in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            specs = make_specs(n_charts, tmp_dir)
+            methods = [
+                ('one by one', lambda: one_by_one(df, specs)),
+                ('render_plots, 1 worker', lambda: render_plots(df, specs, max_workers=1)),
+                ('render_plots', lambda: render_plots(df, specs, max_workers=args.workers)),
+            ]
+            for name, func in methods:
+                seconds = timed(func)
+                print(f'{n_charts:>8} {name:<22} {seconds:>10.2f} {n_charts / seconds:>10.1f} '
+                      f'{len(plt.get_fignums()):>13}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark the week4 date format and duration checks against the row by row versions they replaced.
+
+The prepared events are repeated to each size and 0.1% of the rows are given a badly formatted date or a wrong
+duration, so the checks have some errors to report. The row by row versions call strptime on every value and are only
+timed up to ROW_BY_ROW_MAX_ROWS rows. Logging is turned off while timing so the time spent writing the error messages to
+the console is not measured.
+
+Run from the project root:
+    python benchmarks/bench_week4_checks.py
+    python benchmarks/bench_week4_checks.py --sizes 1000000 5000000
+"""
+import argparse
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from tutorialpkg import week4
+
+DATA_PATH = Path(__file__).parent.parent.joinpath('src', 'tutorialpkg', 'data', 'paralympics_events_prepared.csv')
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 5_000_000]
+ROW_BY_ROW_MAX_ROWS = 100_000
+
+
+def row_by_row_check_date_format(df, columns, date_format='%d/%m/%Y'):
+    """The check_date_format loop from before it was vectorised."""
+    for column in columns:
+        for index, value in df[column].items():
+            try:
+                datetime.strptime(value, date_format)
+            except ValueError:
+                logging.error(f"Date format error in column '{column}' at row {index}: '{value}' does not match "
+                              f"format {date_format}")
+
+
+def row_by_row_check_duration(df):
+    """The check_duration loop from before it was vectorised."""
+    for index, row in df.iterrows():
+        try:
+            start_date = datetime.strptime(row['start'], '%d/%m/%Y')
+            end_date = datetime.strptime(row['end'], '%d/%m/%Y')
+            expected_duration = (end_date - start_date).days
+            if row['duration'] != expected_duration:
+                logging.error(f"Duration error at row {index}: Expected {expected_duration}, found {row['duration']}")
+        except ValueError as e:
+            logging.error(f'Date parsing error at row {index}: {e}')
+
+
+def make_events(n_rows, error_fraction=0.001, seed=0):
+    """Repeat the prepared events to n_rows rows and add some date format and duration errors."""
+    events = pd.read_csv(DATA_PATH)[['start', 'end', 'duration']]
+    events = pd.concat([events] * -(-n_rows // len(events)), ignore_index=True).head(n_rows)
+    rng = np.random.default_rng(seed)
+    n_errors = max(int(n_rows * error_fraction), 1)
+    events.loc[rng.choice(n_rows, n_errors, replace=False), 'start'] = '1960-09-18'
+    events.loc[rng.choice(n_rows, n_errors, replace=False), 'duration'] = -1
+    return events
+
+
+def time_call(func, *args):
+    """Return the time taken to call func in seconds."""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the week4 date format and duration checks.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Numbers of rows to test')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    print(f"{'rows':>10} {'check':<18} {'row by row (s)':>15} {'vectorised (s)':>15} {'speed up':>9}")
+    for n_rows in args.sizes:
+        events = make_events(n_rows)
+        checks = [
+            ('check_date_format', row_by_row_check_date_format, week4.check_date_format, (events, ['start', 'end'])),
+            ('check_duration', row_by_row_check_duration, week4.check_duration, (events,)),
+        ]
+        for name, row_by_row, vectorised, check_args in checks:
+            row_time = float('nan')
+            if n_rows <= ROW_BY_ROW_MAX_ROWS:
+                row_time = time_call(row_by_row, *check_args)
+            vectorised_time = time_call(vectorised, *check_args)
+            print(f'{n_rows:>10} {name:<18} {row_time:>15.3f} {vectorised_time:>15.3f} '
+                  f'{row_time / vectorised_time:>8.0f}x')
+
+
+if __name__ == '__main__':
+    main()
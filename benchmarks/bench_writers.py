@@ -0,0 +1,80 @@
+"""Benchmark saving the prepared events with each writer in tutorial2_refactored, and reading the files back.
+
+The prepared events are repeated to each size. Each file type is saved on its own with save_dataframe_to_file, then
+all the file types are saved at the same time with save_dataframe_to_files. The time to read each file back is shown
+too, as the Parquet and Feather files can be read without parsing any text. Saving all the files at once is timed with
+threads and with processes. Excel files are slow to write and limited
+to 1,048,576 rows, so they are only written up to XLSX_MAX_ROWS rows.
+
+Run from the project root:
+    python benchmarks/bench_writers.py
+    python benchmarks/bench_writers.py --sizes 1000000 --compression parquet=zstd feather=uncompressed
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from tutorialpkg.tutor_solution import tutorial2_refactored as t2
+
+DATA_DIR = Path(__file__).parent.parent.joinpath('src', 'tutorialpkg', 'data')
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+XLSX_MAX_ROWS = 100_000
+READERS = {
+    'csv': pd.read_csv,
+    'xlsx': pd.read_excel,
+    'parquet': pd.read_parquet,
+    'feather': pd.read_feather,
+}
+
+
+def make_prepared(n_rows):
+    """Prepare the raw events with prepare_event_data and repeat them to n_rows rows."""
+    raw = pd.read_csv(DATA_DIR.joinpath('paralympics_events_raw.csv'))
+    npc = pd.read_csv(DATA_DIR.joinpath('npc_codes.csv'), encoding='utf-8', encoding_errors='ignore')
+    prepared = t2.prepare_event_data(raw, npc, save=False)
+    # Take the rows by position rather than concatenating copies, so the text columns are not split into many chunks
+    return prepared.iloc[np.arange(n_rows) % len(prepared)].reset_index(drop=True)
+
+
+def timed(func, *args, **kwargs):
+    """Return the time taken to call func in seconds."""
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the prepared events writers.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Numbers of rows to test')
+    parser.add_argument('--compression', nargs='*', default=[],
+                        help='Compression for a file type as type=compression, e.g. parquet=zstd')
+    args = parser.parse_args()
+    compression = dict(item.split('=', 1) for item in args.compression)
+
+    print(f"{'rows':>10} {'file type':<12} {'write (s)':>10} {'read (s)':>10} {'size (MB)':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_rows in args.sizes:
+            df = make_prepared(n_rows)
+            file_types = [t for t in t2.WRITERS if t != 'xlsx' or n_rows <= XLSX_MAX_ROWS]
+            file_paths = {t: Path(tmp_dir).joinpath(f'prepared.{t}') for t in file_types}
+            total = 0
+            for file_type, file_path in file_paths.items():
+                write_time = timed(t2.save_dataframe_to_file, df, file_path, file_type, compression.get(file_type))
+                read_kwargs = {'compression': compression['csv']} if file_type == 'csv' and 'csv' in compression else {}
+                read_time = timed(READERS[file_type], file_path, **read_kwargs)
+                total += write_time
+                print(f'{n_rows:>10} {file_type:<12} {write_time:>10.3f} {read_time:>10.3f} '
+                      f'{file_path.stat().st_size / 1e6:>10.1f}')
+            thread_time = timed(t2.save_dataframe_to_files, df, file_paths, compression)
+            process_time = timed(t2.save_dataframe_to_files, df, file_paths, compression, use_processes=True)
+            print(f"{n_rows:>10} {'all, one by one':<12} {total:>10.3f}")
+            print(f"{n_rows:>10} {'all, threads':<12} {thread_time:>10.3f}")
+            print(f"{n_rows:>10} {'all, processes':<12} {process_time:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark streaming the prepared events to .xlsx with write_xlsx_chunks against DataFrame.to_excel.
+
+The prepared events are repeated to each size and written to a temporary directory. Each writer is run once for the
+time, then again under tracemalloc to record the peak memory it allocates. to_excel is only run up to TO_EXCEL_MAX_ROWS
+rows as it is slow and cannot write more than 1,048,576 rows. The streaming writer is given the rows in chunks of
+CHUNKSIZE, as they would come from pd.read_csv with a chunksize, and splits them across sheets at the Excel limit.
+
+Run from the project root:
+    python benchmarks/bench_xlsx_export.py
+    python benchmarks/bench_xlsx_export.py --sizes 1100000
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from tutorialpkg.tutor_solution import tutorial2_refactored as t2
+from tutorialpkg.xlsx_export import write_xlsx_chunks
+
+DATA_DIR = Path(__file__).parent.parent.joinpath('src', 'tutorialpkg', 'data')
+DEFAULT_SIZES = [10_000, 50_000, 200_000]
+TO_EXCEL_MAX_ROWS = 50_000
+CHUNKSIZE = 50_000
+
+
+def make_prepared(n_rows):
+    """Prepare the raw events with prepare_event_data and repeat them to n_rows rows."""
+    raw = pd.read_csv(DATA_DIR.joinpath('paralympics_events_raw.csv'))
+    npc = pd.read_csv(DATA_DIR.joinpath('npc_codes.csv'), encoding='utf-8', encoding_errors='ignore')
+    prepared = t2.prepare_event_data(raw, npc, save=False)
+    return prepared.iloc[np.arange(n_rows) % len(prepared)].reset_index(drop=True)
+
+
+def to_excel(df, file_path):
+    df.to_excel(file_path, index=False)
+
+
+def streamed(df, file_path):
+    write_xlsx_chunks(file_path, (df.iloc[i:i + CHUNKSIZE] for i in range(0, len(df), CHUNKSIZE)))
+
+
+def run(func, df, file_path):
+    """Return the time in seconds and the peak memory allocated in bytes to write df with func."""
+    start = time.perf_counter()
+    func(df, file_path)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    func(df, file_path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the streaming .xlsx export.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Numbers of rows to test')
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'writer':<10} {'time (s)':>10} {'peak (MB)':>10} {'size (MB)':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = Path(tmp_dir).joinpath('prepared.xlsx')
+        for n_rows in args.sizes:
+            df = make_prepared(n_rows)
+            writers = [('streamed', streamed)]
+            if n_rows <= TO_EXCEL_MAX_ROWS:
+                writers.insert(0, ('to_excel', to_excel))
+            for name, func in writers:
+                seconds, peak = run(func, df, file_path)
+                print(f'{n_rows:>10} {name:<10} {seconds:>10.2f} {peak / 1e6:>10.1f} '
+                      f'{file_path.stat().st_size / 1e6:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+"""Caching helpers shared by the paralympics data preparation and database scripts.
+
+Parsing the .xlsx workbooks with openpyxl is by far the slowest part of the scripts that use them, and the workbooks
+rarely change. The first time a sheet is read it is saved next to the workbook as a Feather file. Later runs memory-map
+the Feather copy instead of parsing the workbook again, unless the workbook has changed since the copy was made.
+
+pyarrow is needed for the Feather files. If it is not installed the sheets are read with pandas.read_excel as before.
+
+Results calculated from data, such as profiles and histogram counts, are cached with a ResultCache under a cache_key
+made from a fingerprint of the data and the options used.
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    feather = None
+
+# Name of the directory, created next to the workbook, that holds the cached sheets
+CACHE_DIR_NAME = '.sheet_cache'
+
+# Number of results, e.g. profiles, that each ResultCache keeps in memory
+RESULT_CACHE_SIZE = 128
+
+
+def file_hash(file_path, block_size=1024 * 1024):
+    """Calculate the sha256 hash of the contents of a file.
+
+    Args:
+        file_path (Path): The file to hash.
+        block_size (int): Number of bytes to read at a time.
+
+    Returns:
+        str: The hex digest of the file contents.
+    """
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def file_fingerprint(file_path):
+    """Return the size, modified time and content hash of a file.
+
+    Args:
+        file_path (Path): The file to fingerprint.
+
+    Returns:
+        dict: With the keys 'size', 'mtime_ns' and 'sha256'.
+    """
+    stat = Path(file_path).stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': file_hash(file_path)}
+
+
+def fingerprint_matches(file_path, fingerprint):
+    """Check whether a file still matches a fingerprint saved by file_fingerprint.
+
+    The size and modified time are checked first as they are cheap. The contents are only hashed when the size is the
+    same but the modified time is not, e.g. when the file has been copied or touched without being changed.
+
+    Args:
+        file_path (Path): The file to check.
+        fingerprint (dict): A fingerprint previously returned by file_fingerprint.
+
+    Returns:
+        bool: True if the file is unchanged.
+    """
+    stat = Path(file_path).stat()
+    if stat.st_size != fingerprint.get('size'):
+        return False
+    if stat.st_mtime_ns == fingerprint.get('mtime_ns'):
+        return True
+    return file_hash(file_path) == fingerprint.get('sha256')
+
+
+def cache_key(fingerprint, *options):
+    """Combine the fingerprint of the data with the options that change a result, e.g. the number of rows."""
+    return hashlib.sha256(':'.join([fingerprint, *map(str, options)]).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Results kept in memory by key and, if a cache directory is given, saved there as JSON files.
+
+    Only the maxsize most recently used results are kept in memory, older ones are dropped and are read again from the
+    cache directory if they are needed.
+
+    Args:
+        suffix (str): End of the file names, each file is named '<key><suffix>'. Default is '.json'.
+        maxsize (int): Number of results to keep in memory. Default is RESULT_CACHE_SIZE.
+    """
+
+    def __init__(self, suffix='.json', maxsize=RESULT_CACHE_SIZE):
+        self.suffix = suffix
+        self.maxsize = maxsize
+        self._results = OrderedDict()
+
+    def _path(self, key, cache_dir):
+        return Path(cache_dir).joinpath(f'{key}{self.suffix}')
+
+    def _remember(self, key, result):
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def get(self, key, cache_dir=None):
+        """Return the result for a key from memory or the cache directory, or None if it is not cached."""
+        if key in self._results:
+            self._results.move_to_end(key)
+            return self._results[key]
+        if cache_dir is not None and self._path(key, cache_dir).exists():
+            result = json.loads(self._path(key, cache_dir).read_text(encoding='utf-8'))
+            self._remember(key, result)
+            return result
+        return None
+
+    def put(self, key, result, cache_dir=None):
+        """Keep a result in memory and, if a cache directory is given, save it there. The result must be JSON."""
+        self._remember(key, result)
+        if cache_dir is not None:
+            path = self._path(key, cache_dir)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(result, indent=2), encoding='utf-8')
+
+
+def sheet_cache_paths(file_path, sheet_name):
+    """Return the paths of the cached Feather file and its metadata file for a sheet in a workbook.
+
+    Args:
+        file_path (Path): The workbook.
+        sheet_name (str or int): The sheet name, or position as used by pandas.read_excel.
+
+    Returns:
+        tuple: (Path to the .feather file, Path to the .json metadata file)
+    """
+    file_path = Path(file_path)
+    cache_dir = file_path.parent.joinpath(CACHE_DIR_NAME)
+    stem = f'{file_path.stem}.{sheet_name}'
+    return cache_dir.joinpath(f'{stem}.feather'), cache_dir.joinpath(f'{stem}.json')
+
+
+def _cached_sheet_is_fresh(file_path, data_path, meta_path):
+    """Return True if the cached copy of a sheet exists and the workbook has not changed since it was made."""
+    if not data_path.exists() or not meta_path.exists():
+        return False
+    try:
+        fingerprint = json.loads(meta_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return False
+    if not fingerprint_matches(file_path, fingerprint):
+        return False
+    # The contents are unchanged but the file may have been touched, save the new time so it is not hashed again
+    if file_path.stat().st_mtime_ns != fingerprint.get('mtime_ns'):
+        meta_path.write_text(json.dumps(file_fingerprint(file_path)), encoding='utf-8')
+    return True
+
+
+def _write_cached_sheet(df, file_path, data_path, meta_path):
+    """Save a sheet as an uncompressed Feather file, uncompressed so that it can be memory-mapped when read."""
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = data_path.with_suffix('.feather.tmp')
+    feather.write_feather(df, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, data_path)
+    meta_path.write_text(json.dumps(file_fingerprint(file_path)), encoding='utf-8')
+
+
+def table_file_path(dir_path, table_name):
+    """Return the path of the file for a table in a directory with a file per sheet, preferring Parquet to CSV.
+
+    Args:
+        dir_path (Path): The directory with the files.
+        table_name (str): The sheet name, the file is '<table_name>.parquet' or '<table_name>.csv'.
+
+    Returns:
+        Path: The path of the file.
+
+    Raises:
+        FileNotFoundError: If there is no file for the table in the directory.
+    """
+    dir_path = Path(dir_path)
+    for suffix in ['.parquet', '.csv']:
+        path = dir_path.joinpath(f'{table_name}{suffix}')
+        if path.exists():
+            return path
+    raise FileNotFoundError(f"No .parquet or .csv file for '{table_name}' in {dir_path}")
+
+
+def read_table_file(dir_path, table_name):
+    """Read a table saved as a file per sheet in a directory, as written by synthetic_data.generate_dataset.
+
+    Args:
+        dir_path (Path): The directory with the files.
+        table_name (str): The sheet name, the file is '<table_name>.parquet' or '<table_name>.csv'.
+
+    Returns:
+        pd.DataFrame: The data in the table.
+
+    Raises:
+        FileNotFoundError: If there is no file for the table in the directory.
+    """
+    path = table_file_path(dir_path, table_name)
+    if path.suffix == '.parquet':
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def read_sheet(file_path, sheet_name=0, use_cache=True):
+    """Read a sheet from an Excel workbook, using a cached columnar copy of the sheet where possible.
+
+    The file path can also be a directory with a .parquet or .csv file for each sheet, see read_table_file.
+
+    Args:
+        file_path (Path): The workbook to read.
+        sheet_name (str or int): The sheet name, or position as used by pandas.read_excel. Default is the first sheet.
+        use_cache (bool): Set to False to always parse the workbook. Default is True.
+
+    Returns:
+        pd.DataFrame: The data in the sheet.
+    """
+    if Path(file_path).is_dir():
+        return read_table_file(file_path, sheet_name)
+
+    if feather is None or not use_cache:
+        return pd.read_excel(file_path, sheet_name=sheet_name)
+
+    file_path = Path(file_path)
+    data_path, meta_path = sheet_cache_paths(file_path, sheet_name)
+
+    if _cached_sheet_is_fresh(file_path, data_path, meta_path):
+        try:
+            return feather.read_table(data_path, memory_map=True).to_pandas()
+        except (pa.ArrowException, OSError) as e:
+            print(f'Could not read the cached copy of sheet {sheet_name} in {file_path.name}, re-reading it. Error: {e}')
+
+    df = pd.read_excel(file_path, sheet_name=sheet_name)
+    try:
+        _write_cached_sheet(df, file_path, data_path, meta_path)
+    except (pa.ArrowException, OSError) as e:
+        print(f'Could not cache sheet {sheet_name} in {file_path.name}. Error: {e}')
+    return df
@@ -0,0 +1,323 @@
+"""Match the country names in the paralympics data to NPC codes.
+
+The events spell some countries differently to npc_codes.csv, e.g. 'UK' rather than 'Great Britain'. Matching the raw
+strings misses those names without any warning. Instead, every NPC name, NPC code and alias in country_aliases.csv is
+normalised once into an index from name to NPC code. Normalising ignores case, accents, punctuation and a leading
+'the'. The aliases are a maintained table, so to match a new spelling add a row to country_aliases.csv.
+
+Names are looked up once per distinct value rather than once per row. The result is cached, and the cache hits and
+misses are counted. The names that are not in the index are counted with the number of rows they appear in, so they
+can be reported.
+
+CountryIndex.load saves the index and the NPC records next to the NPC codes file as uncompressed Feather files. Later
+loads memory-map them instead of parsing the file and normalising the names again, until the NPC codes file, the
+aliases or INDEX_FORMAT_VERSION change. The names are searched in the memory-mapped table with pyarrow.compute, so the
+dictionary of every name is not made again on each load. The same index is used to merge the NPC codes with pandas and to find the host country codes when
+loading the SQLite database. pyarrow is needed for the saved index. If it is not installed the index is built each time.
+
+Example:
+    index = CountryIndex.load()
+    events_df['Code'] = index.codes(events_df['country'])
+    index.print_report()
+"""
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from tutorialpkg.caching import file_fingerprint, fingerprint_matches, read_sheet, table_file_path
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    pc = None
+    feather = None
+
+DATA_DIR = Path(__file__).parent.joinpath("data")
+NPC_CODES_PATH = DATA_DIR.joinpath("npc_codes.csv")
+ALIASES_PATH = DATA_DIR.joinpath("country_aliases.csv")
+
+# Name of the directory, created next to the NPC codes file, that holds the saved indexes
+INDEX_CACHE_DIR_NAME = '.index_cache'
+
+# Version of the saved indexes. Change it when normalise_name or the saved tables change, so the old indexes are rebuilt
+INDEX_FORMAT_VERSION = 1
+
+_APOSTROPHES = re.compile(r"['’`]")
+_PUNCTUATION = re.compile(r"[^\w\s]|_")
+_SPACES = re.compile(r"\s+")
+
+
+def normalise_name(name):
+    """Normalise a country name for matching, e.g. "  Côte d'Ivoire " and 'COTE DIVOIRE' both become 'cote divoire'.
+
+    Args:
+        name (str): The country name.
+
+    Returns:
+        str: The name without accents, apostrophes, other punctuation, a leading 'the' or extra spaces, in lower case.
+    """
+    name = unicodedata.normalize('NFKD', str(name))
+    name = ''.join(char for char in name if not unicodedata.combining(char))
+    name = name.casefold().replace('&', ' and ')
+    name = _PUNCTUATION.sub(' ', _APOSTROPHES.sub('', name))
+    name = _SPACES.sub(' ', name).strip()
+    return name.removeprefix('the ')
+
+
+def load_aliases(file_path=ALIASES_PATH):
+    """Load the alias and code columns from the country aliases CSV file."""
+    return pd.read_csv(file_path, usecols=['Alias', 'Code'], encoding='utf-8')
+
+
+def read_npc_records(file_path, sheet_name=None):
+    """Read all the columns of the NPC codes from a CSV, Parquet or Excel file.
+
+    The database workbook names the code and name columns 'code' and 'name', they are renamed to 'Code' and 'Name'.
+
+    Args:
+        file_path (Path): The NPC codes file.
+        sheet_name (str or int): The sheet with the NPC codes in an Excel file. Default is the first sheet.
+
+    Returns:
+        pd.DataFrame: The NPC records.
+    """
+    file_path = Path(file_path)
+    if file_path.suffix == '.csv':
+        df = pd.read_csv(file_path, encoding='utf-8', encoding_errors='ignore')
+    elif file_path.suffix == '.parquet':
+        df = pd.read_parquet(file_path)
+    else:
+        df = read_sheet(file_path, sheet_name=0 if sheet_name is None else sheet_name)
+    return df.rename(columns={'code': 'Code', 'name': 'Name'})
+
+
+def build_name_index(npc_df, aliases_df=None):
+    """Return a dictionary from each normalised NPC name, code and alias to its NPC code.
+
+    Where two entries normalise to the same name the NPC names win over the codes, and the codes over the aliases.
+    """
+    entries = list(zip(npc_df['Name'], npc_df['Code'])) + list(zip(npc_df['Code'], npc_df['Code']))
+    if aliases_df is not None:
+        entries += list(zip(aliases_df['Alias'], aliases_df['Code']))
+    name_index = {}
+    for name, code in entries:
+        if pd.notna(name):
+            name_index.setdefault(normalise_name(name), code)
+    return name_index
+
+
+def index_cache_paths(file_path, sheet_name=None):
+    """Return the paths of the saved name index, NPC records and metadata for an NPC codes file.
+
+    Args:
+        file_path (Path): The NPC codes file.
+        sheet_name (str or int): The sheet with the NPC codes in an Excel file.
+
+    Returns:
+        tuple: (Path to the names .feather file, Path to the records .feather file, Path to the .json metadata file)
+    """
+    file_path = Path(file_path)
+    cache_dir = file_path.parent.joinpath(INDEX_CACHE_DIR_NAME)
+    stem = file_path.name if sheet_name is None else f'{file_path.name}.{sheet_name}'
+    return (cache_dir.joinpath(f'{stem}.names.feather'), cache_dir.joinpath(f'{stem}.records.feather'),
+            cache_dir.joinpath(f'{stem}.json'))
+
+
+def _index_metadata(source_paths):
+    """Return the metadata saved with an index, the format version and the fingerprint of each source file."""
+    return {'version': INDEX_FORMAT_VERSION, 'sources': {str(path): file_fingerprint(path) for path in source_paths}}
+
+
+def _saved_index_is_fresh(source_paths, meta_path):
+    """Return True if the saved index has the current format, was made from the files in source_paths and none of them
+    have changed."""
+    if not meta_path.exists():
+        return False
+    try:
+        metadata = json.loads(meta_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return False
+    if not isinstance(metadata, dict) or metadata.get('version') != INDEX_FORMAT_VERSION:
+        return False
+    fingerprints = metadata.get('sources', {})
+    if sorted(fingerprints) != sorted(str(path) for path in source_paths):
+        return False
+    return all(path.exists() and fingerprint_matches(path, fingerprints[str(path)]) for path in source_paths)
+
+
+class CountryIndex:
+    """Index from normalised NPC names, codes and aliases to NPC codes, and from NPC codes to NPC records.
+
+    Args:
+        npc_df (pd.DataFrame): NPC codes with 'Code' and 'Name' columns, and any other columns of the records.
+        aliases_df (pd.DataFrame): Aliases with 'Alias' and 'Code' columns. Default is None, no aliases.
+
+    Attributes:
+        records (pd.DataFrame): The NPC records.
+        names (pd.Series): The NPC name of each code.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups that normalised the name and searched the index.
+        unmatched (Counter): Number of rows of each name that is not in the index, in the order they were found.
+    """
+
+    def __init__(self, npc_df, aliases_df=None):
+        self._set_tables(npc_df, build_name_index(npc_df, aliases_df))
+
+    def _set_tables(self, records, name_index=None, names_table=None):
+        """Set the records and the name index. A saved names_table is only turned into the index when it is used."""
+        self.records = records
+        self._index = name_index
+        self._names_table = names_table
+        self._names = None
+        self._positions = None
+        self._cache = {}
+        self.hits = 0
+        self.misses = 0
+        self.unmatched = Counter()
+
+    @classmethod
+    def load(cls, npc_path=NPC_CODES_PATH, sheet_name=None, aliases_path=ALIASES_PATH, use_cache=True):
+        """Load the index saved for an NPC codes file, or build and save it if the file or the aliases have changed.
+
+        Args:
+            npc_path (Path): The NPC codes CSV, Parquet or Excel file, or a directory with a file per sheet.
+            sheet_name (str or int): The sheet with the NPC codes in an Excel file or directory. Default is the first
+                sheet of an Excel file.
+            aliases_path (Path): The country aliases CSV file, or None for no aliases.
+            use_cache (bool): Set to False to always build the index from the files. Default is True.
+
+        Returns:
+            CountryIndex: The index.
+        """
+        npc_path = Path(npc_path)
+        if npc_path.is_dir():
+            npc_path, sheet_name = table_file_path(npc_path, sheet_name), None
+        source_paths = [npc_path] + ([Path(aliases_path)] if aliases_path is not None else [])
+        names_path, records_path, meta_path = index_cache_paths(npc_path, sheet_name)
+
+        if feather is not None and use_cache and _saved_index_is_fresh(source_paths, meta_path):
+            try:
+                index = cls.__new__(cls)
+                index._set_tables(feather.read_table(records_path, memory_map=True).to_pandas(),
+                                  names_table=feather.read_table(names_path, memory_map=True))
+                return index
+            except (pa.ArrowException, OSError) as e:
+                print(f'Could not read the saved country index for {npc_path.name}, building it again. Error: {e}')
+
+        aliases_df = load_aliases(aliases_path) if aliases_path is not None else None
+        index = cls(read_npc_records(npc_path, sheet_name), aliases_df)
+        if feather is not None and use_cache:
+            try:
+                index.save(names_path, records_path)
+                meta_path.write_text(json.dumps(_index_metadata(source_paths)), encoding='utf-8')
+            except (pa.ArrowException, OSError) as e:
+                print(f'Could not save the country index for {npc_path.name}. Error: {e}')
+        return index
+
+    @property
+    def names(self):
+        if self._names is None:
+            records = self.records.drop_duplicates('Code')
+            self._names = pd.Series(records['Name'].to_numpy(), index=records['Code'], name='Name')
+        return self._names
+
+    def _name_index(self):
+        """Return the dictionary from normalised name to code, making it from the saved names table if needed."""
+        if self._index is None:
+            self._index = dict(zip(self._names_table['name'].to_pylist(), self._names_table['code'].to_pylist()))
+            self._names_table = None
+        return self._index
+
+    def _search(self, normalised_names):
+        """Return the code of each normalised name, or None if it is not in the index.
+
+        A saved index is searched in its memory-mapped table in one call, without making the dictionary of every name.
+        """
+        if self._index is not None:
+            return [self._index.get(name) for name in normalised_names]
+        names_column = self._names_table['name']
+        positions = pc.index_in(pa.array(normalised_names, type=names_column.type), value_set=names_column)
+        return pc.take(self._names_table['code'], positions).to_pylist()
+
+    def save(self, names_path, records_path):
+        """Save the name index and the records as uncompressed Feather files, so they can be memory-mapped."""
+        names_path.parent.mkdir(parents=True, exist_ok=True)
+        name_index = self._name_index()
+        names_df = pd.DataFrame({'name': list(name_index), 'code': list(name_index.values())})
+        for df, path in [(names_df, names_path), (self.records, records_path)]:
+            tmp_path = path.with_suffix('.feather.tmp')
+            feather.write_feather(df.reset_index(drop=True), tmp_path, compression='uncompressed')
+            os.replace(tmp_path, path)
+
+    def record(self, code):
+        """Return the NPC record of a code as a dictionary, or None if there is no NPC with the code."""
+        if self._positions is None:
+            self._positions = {}
+            for position, record_code in enumerate(self.records['Code']):
+                self._positions.setdefault(record_code, position)
+        position = self._positions.get(code)
+        return None if position is None else self.records.iloc[position].to_dict()
+
+    def lookup(self, name):
+        """Return the NPC code of a country name or alias, or None if it is not in the index."""
+        try:
+            code = self._cache[name]
+            self.hits += 1
+        except KeyError:
+            self.misses += 1
+            code = self._name_index().get(normalise_name(name))
+            self._cache[name] = code
+        return code
+
+    def codes(self, names):
+        """Find the NPC code of each country name, looking up each distinct name once.
+
+        Args:
+            names (pd.Series): The country names.
+
+        Returns:
+            pd.Series: The NPC codes with the same index as names. Names not in the index, and missing names, have no
+                code.
+        """
+        labels, uniques = pd.factorize(names)
+        # Only the names that have not been looked up before are normalised and searched for
+        new_names = [name for name in uniques if name not in self._cache]
+        self._cache.update(zip(new_names, self._search([normalise_name(name) for name in new_names])))
+        self.misses += len(new_names)
+        self.hits += len(uniques) - len(new_names)
+        unique_codes = [self._cache[name] for name in uniques]
+        rows = np.bincount(labels[labels >= 0], minlength=len(uniques))
+        for name, code, n_rows in zip(uniques, unique_codes, rows):
+            if code is None:
+                self.unmatched[name] += int(n_rows)
+        # Missing names have the label -1, so they take the None added at the end
+        codes = np.array(unique_codes + [None], dtype=object)[labels]
+        return pd.Series(codes, index=names.index, name='Code')
+
+    def npc_names(self, names):
+        """Replace each country name that is in the index with its NPC name, e.g. 'UK' with 'Great Britain'.
+
+        Args:
+            names (pd.Series): The country names.
+
+        Returns:
+            pd.Series: The NPC names. Names that are not in the index are left unchanged.
+        """
+        return self.codes(names).map(self.names).fillna(names)
+
+    def print_report(self):
+        """Print the cache hits and misses and the country names that are not in the index."""
+        print(f"\nCountry name lookups: {self.hits} cache hits, {self.misses} misses.")
+        if self.unmatched:
+            print(f"No NPC code found for {len(self.unmatched)} country names:")
+            for name, n_rows in self.unmatched.items():
+                print(f"    '{name}' in {n_rows} rows")
@@ -1,19 +1,33 @@
 from pathlib import Path
+
+import numpy as np
 import pandas as pd
 
-def prepare_data(df, columns_to_change=None):
+from tutorialpkg.caching import read_sheet
+from tutorialpkg.country_names import CountryIndex, load_aliases
+from tutorialpkg.profiling import print_profile, profile_dataframe
+from tutorialpkg.pipeline import FileInput, Stage, run_concurrently, stages_to_run
+
+
+def prepare_data(df, columns_to_change=None, save=True, verbose=True, compact=False):
     if columns_to_change is None:
         columns_to_change = []
 
-    print("\nColumns in the DataFrame for preparation:")
-    print(df.columns)
-
-    for col in columns_to_change:
-        if col in df.columns:
-            df[col] = df[col].fillna(0).astype('int')
-            print(f"Converted column '{col}' to integers.")
-        else:
-            print(f"Column '{col}' not found in the DataFrame, skipping conversion.")
+    if verbose:
+        print("\nColumns in the DataFrame for preparation:")
+        print(df.columns)
+
+    # 一次转换所有列，缺失值保留为 <NA>，不再填充为 0
+    integer_arrays = to_nullable_integers(df, [col for col in columns_to_change if col in df.columns])
+    df = df.assign(**integer_arrays)
+    if verbose:
+        for col in columns_to_change:
+            if col in integer_arrays:
+                print(f"Converted column '{col}' to {integer_arrays[col].dtype}.")
+            elif col in df.columns:
+                print(f"Column '{col}' has values that are not whole numbers, skipping conversion.")
+            else:
+                print(f"Column '{col}' not found in the DataFrame, skipping conversion.")
 
     # 将 'start' 和 'end' 列转换为 datetime 类型
     if 'start' in df.columns:
@@ -24,40 +38,144 @@ def prepare_data(df, columns_to_change=None):
     # 处理 'type' 列中的空格和大小写
     if 'type' in df.columns:
         df['type'] = df['type'].str.strip().str.lower()  # 去除空格并转换为小写
-        print("\nProcessed 'type' column (stripped whitespace and converted to lowercase).")
+        if verbose:
+            print("\nProcessed 'type' column (stripped whitespace and converted to lowercase).")
 
     # 删除 'URL', 'disabilities_included', 'highlights' 列，并分配给新的 DataFrame
     columns_to_drop = ['URL', 'disabilities_included', 'highlights']
-    df_prepared = df.drop(columns=columns_to_drop, axis=1, errors='ignore')  # 删除指定的列
-    print("\nDropped columns: 'URL', 'disabilities_included', 'highlights'.")
+    df_prepared = df.drop(columns=columns_to_drop, errors='ignore')  # 删除指定的列
+    if verbose:
+        print("\nDropped columns: 'URL', 'disabilities_included', 'highlights'.")
 
     # 添加新列 'duration'，计算持续天数并将其插入到 'end' 列后面
     if 'start' in df.columns and 'end' in df.columns:
         df_prepared.insert(df_prepared.columns.get_loc('end') + 1, 
                            'duration', 
                            (df_prepared['end'] - df_prepared['start']).dt.days.astype(int))
-        print("\nAdded new column 'duration' based on the difference between 'start' and 'end'.")
+        if verbose:
+            print("\nAdded new column 'duration' based on the difference between 'start' and 'end'.")
 
     # 保存处理后的 DataFrame 到 CSV 文件
-    output_path = Path(__file__).parent.joinpath("data", "paralympics_events_prepared.csv")
-    df_prepared.to_csv(output_path, index=False)
-    print(f"\nSaved prepared DataFrame to '{output_path}'.")
+    if save:
+        output_path = Path(__file__).parent.joinpath("data", "paralympics_events_prepared.csv")
+        df_prepared.to_csv(output_path, index=False)
+        print(f"\nSaved prepared DataFrame to '{output_path}'.")
 
     # 打印新的 DataFrame 的列名
-    print("\nColumns after preparation:")
-    print(df_prepared.columns)
+    if verbose:
+        print("\nColumns after preparation:")
+        print(df_prepared.columns)
+
+    # 使用更省内存的数据类型
+    if compact:
+        df_prepared = compact_dtypes(df_prepared, verbose=verbose)
 
     return df_prepared
 
 
+# 可空整数类型，从小到大排列
+NULLABLE_INTEGER_DTYPES = ['UInt8', 'UInt16', 'UInt32', 'UInt64', 'Int8', 'Int16', 'Int32', 'Int64']
+
+
+def to_nullable_integers(df, columns):
+    """Convert the columns that only hold whole numbers to the smallest nullable integer type that fits them.
+
+    The columns are copied once into a single float array. The missing values are found and replaced in that array,
+    and each column is cast from it straight to its integer type, so there are no per column fillna or astype copies.
+    Missing values become <NA>, they are not replaced with 0. Columns that are not numeric, or that have fractions or
+    infinite values, are left out.
+
+    Args:
+        df (pd.DataFrame): The DataFrame.
+        columns (list): The columns to convert.
+
+    Returns:
+        dict: The converted arrays, e.g. with dtype 'UInt16', by column name. Use df.assign(**arrays) to replace the
+            columns.
+    """
+    columns = [col for col in columns
+               if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])]
+    if not columns:
+        return {}
+
+    values = df[columns].to_numpy(dtype='float64', na_value=np.nan, copy=True)
+    missing = np.isnan(values)
+    np.copyto(values, 0, where=missing)
+    minimums = values.min(axis=0)
+    maximums = values.max(axis=0)
+
+    arrays = {}
+    for i, col in enumerate(columns):
+        if not np.isfinite(minimums[i]) or not np.isfinite(maximums[i]):
+            continue
+        candidates = NULLABLE_INTEGER_DTYPES[:4] if minimums[i] >= 0 else NULLABLE_INTEGER_DTYPES[4:]
+        for dtype in candidates:
+            info = np.iinfo(dtype.lower())
+            if info.min <= minimums[i] and maximums[i] <= info.max:
+                integers = values[:, i].astype(dtype.lower())
+                # 小数部分会在转换中丢失，比较后跳过这些列
+                if np.array_equal(integers, values[:, i]):
+                    arrays[col] = pd.arrays.IntegerArray(integers, missing[:, i].copy())
+                break
+    return arrays
+
+
+# 紧凑的数据类型，用于很大的数据
+COMPACT_CATEGORY_COLUMNS = ['type', 'country', 'host', 'Code']
+COMPACT_INTEGER_COLUMNS = ['countries', 'events', 'sports', 'participants_m', 'participants_f', 'participants']
+
+
+def compact_dtypes(df, category_columns=None, integer_columns=None, verbose=True):
+    """Reduce the memory used by a prepared paralympics DataFrame.
+
+    Low cardinality text columns are stored as 'category' and count columns as the smallest integer type that fits
+    their values. Missing values in nullable integer columns are kept as <NA>.
+
+    Args:
+        df (pd.DataFrame): The prepared DataFrame.
+        category_columns (list): Columns to convert to 'category'. Default is COMPACT_CATEGORY_COLUMNS.
+        integer_columns (list): Columns to downcast. Default is COMPACT_INTEGER_COLUMNS.
+        verbose (bool): Print the memory used before and after. Default is True.
+
+    Returns:
+        pd.DataFrame: The DataFrame with the compact data types.
+    """
+    if category_columns is None:
+        category_columns = COMPACT_CATEGORY_COLUMNS
+    if integer_columns is None:
+        integer_columns = COMPACT_INTEGER_COLUMNS
+
+    memory_before = df.memory_usage(deep=True).sum()
+
+    for col in category_columns:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    for col in integer_columns:
+        if col in df.columns and pd.api.types.is_integer_dtype(df[col]):
+            # 计数不会是负数，优先使用无符号整数
+            downcast = 'unsigned' if df[col].min() >= 0 else 'integer'
+            df[col] = pd.to_numeric(df[col], downcast=downcast)
+
+    memory_after = df.memory_usage(deep=True).sum()
+    if verbose:
+        print(f"\nMemory usage reduced from {memory_before:,} bytes to {memory_after:,} bytes "
+              f"({memory_after / memory_before:.0%}).")
+        print(df.dtypes)
+
+    return df
+
+
 # 处理缺失值函数
-def handle_missing_values(df):
-    print("\nHandling missing values...")
+def handle_missing_values(df, verbose=True):
+    if verbose:
+        print("\nHandling missing values...")
 
     # 删除 'Name' 列
     if 'Name' in df.columns:
         df = df.drop(columns=['Name'])
-        print("Dropped 'Name' column.")
+        if verbose:
+            print("Dropped 'Name' column.")
 
     # # 删除缺失参与者数据的行（index 0, 17, 31）
     # df = df.drop([0, 17, 31], errors='ignore')
@@ -65,130 +183,285 @@ def handle_missing_values(df):
 
     # 重置索引
     df = df.reset_index(drop=True)
-    print("Index reset.")
+    if verbose:
+        print("Index reset.")
 
     return df
 
 # 替换国家名称
-def replace_country_names(df):
-    replacement_names = {
-        'UK': 'Great Britain',
-        'USA': 'United States of America',
-        'Korea': 'Republic of Korea',
-        'Russia': 'Russian Federation',
-        'China': "People's Republic of China"
-    }
-    df['country'] = df['country'].replace(replacement_names)
-    print("\nReplaced country names.")
+def replace_country_names(df, verbose=True, index=None):
+    """Replace each country name that matches an NPC name or alias with the NPC name, e.g. 'UK' with 'Great Britain'.
+
+    Args:
+        df (pd.DataFrame): The events with a 'country' column.
+        verbose (bool): Print the lookups and the names that are not matched. Default is True.
+        index (CountryIndex): The index to match the names with. Default is built from npc_codes.csv and
+            country_aliases.csv.
+
+    Returns:
+        pd.DataFrame: The events with the NPC names in the 'country' column.
+    """
+    if index is None:
+        index = CountryIndex.load()
+    df['country'] = index.npc_names(df['country'])
+    if verbose:
+        print("\nReplaced country names.")
+        index.print_report()
     return df
 
+
+# 分块处理 CSV 文件，内存占用只取决于块的大小
+def process_csv_in_chunks(input_path, output_path, process_chunk, chunksize=100_000, **read_csv_kwargs):
+    """Read a CSV file in chunks, apply process_chunk to each chunk and append the result to output_path.
+
+    Only one chunk is held in memory at a time, so peak memory depends on chunksize rather than the file size.
+
+    Args:
+        input_path (Path): The CSV file to read.
+        output_path (Path): The CSV file to write, it is replaced if it exists.
+        process_chunk (function): Takes a DataFrame chunk and returns the processed DataFrame.
+        chunksize (int): Number of rows to read at a time.
+        **read_csv_kwargs: Other arguments for pd.read_csv e.g. usecols.
+
+    Returns:
+        int: The number of rows written.
+    """
+    rows_written = 0
+    with pd.read_csv(input_path, chunksize=chunksize, **read_csv_kwargs) as reader:
+        for chunk in reader:
+            processed = process_chunk(chunk)
+            # 第一块写表头并覆盖旧文件，之后的块追加
+            processed.to_csv(output_path, mode='w' if rows_written == 0 else 'a', header=rows_written == 0,
+                             index=False)
+            rows_written += len(processed)
+    print(f"\nSaved {rows_written} rows in chunks of {chunksize} to '{output_path}'.")
+    return rows_written
+
+
+def prepare_data_in_chunks(input_path, output_path, columns_to_change=None, chunksize=100_000, usecols=None,
+                           index=None):
+    """Streaming version of prepare_data, handle_missing_values and replace_country_names for large event files.
+
+    Args:
+        input_path (Path): The raw events CSV file.
+        output_path (Path): The prepared events CSV file to write.
+        columns_to_change (list): Columns to convert to integers, as for prepare_data.
+        chunksize (int): Number of rows to read at a time.
+        usecols (list): Columns to read from the raw file. Default is all columns.
+        index (CountryIndex): The index to match the country names with. Default is the index saved for
+            npc_codes.csv.
+
+    Returns:
+        int: The number of rows written.
+    """
+
+    # 所有块共用一个索引，每个国家名称只查找一次
+    if index is None:
+        index = CountryIndex.load()
+
+    def prepare_chunk(chunk):
+        chunk = prepare_data(chunk, columns_to_change, save=False, verbose=False)
+        chunk = handle_missing_values(chunk, verbose=False)
+        return replace_country_names(chunk, verbose=False, index=index)
+
+    return process_csv_in_chunks(input_path, output_path, prepare_chunk, chunksize=chunksize, usecols=usecols)
+
 # 描述 DataFrame 的函数
-def describe_dataframe(df):
-    print(f"DataFrame shape: {df.shape}")
-    print("\nFirst 5 rows:")
-    print(df.head())
-    print("\nLast 5 rows:")
-    print(df.tail())
-    print("\nColumn labels:")
-    print(df.columns)
-    print("\nColumn data types:")
-    print(df.dtypes)
-    print("\nDataFrame info:")
-    df.info()
-    print("\nStatistical summary:")
-    print(df.describe())
+def describe_dataframe(df, cache_dir=None):
+    """Print a profile of the DataFrame, calculated in one pass by profile_dataframe, and return it."""
+    profile = profile_dataframe(df, cache_dir=cache_dir)
+    print_profile(profile)
+    return profile
 
 # 合并两个 DataFrames 的函数
-def merge_dataframes(events_df, npc_df):
-    merged_df = events_df.merge(npc_df, how='left', left_on='country', right_on='Name')
-    print("\nMerged DataFrame with NPC Codes:")
-    print(merged_df[['country', 'Code', 'Name']].head())  # 仅显示合并的部分
+def merge_dataframes(events_df, npc_df=None, verbose=True, index=None):
+    """Add the NPC code of each event's country, then join the NPC data on the code.
+
+    Args:
+        events_df (pd.DataFrame): The events with a 'country' column.
+        npc_df (pd.DataFrame): The NPC codes with 'Code' and 'Name' columns. Default is the 'Code' and 'Name' of the
+            records in the index.
+        verbose (bool): Print the first merged rows and the lookups. Default is True.
+        index (CountryIndex): The index to match the names with. Default is built from npc_df and
+            country_aliases.csv, or if npc_df is None the index saved for npc_codes.csv.
+
+    Returns:
+        pd.DataFrame: The events with the NPC columns. Events whose country is not matched have no code.
+    """
+    if index is None:
+        index = CountryIndex(npc_df, load_aliases()) if npc_df is not None else CountryIndex.load()
+    if npc_df is None:
+        npc_df = index.records[['Code', 'Name']]
+    n_unmatched = len(index.unmatched)
+    # 没有匹配的国家代码为空，不能与代码为空的 NPC 行合并
+    npc_df = npc_df[npc_df['Code'].notna()]
+    merged_df = events_df.assign(Code=index.codes(events_df['country'])).merge(npc_df, how='left', on='Code')
+    # 没有匹配的名称只报告一次
+    new_unmatched = list(index.unmatched)[n_unmatched:]
+    if new_unmatched:
+        print(f"\nNo NPC code found for the countries: {', '.join(map(str, new_unmatched))}")
+    if verbose:
+        print("\nMerged DataFrame with NPC Codes:")
+        print(merged_df[['country', 'Code', 'Name']].head())  # 仅显示合并的部分
+        index.print_report()
     return merged_df
 
 
-# 主程序
-def main():
-    pd.set_option("display.max_columns", None)
-
-    # 读取第一个 DataFrame (CSV 文件)
+# 数据文件和缓存的位置
+DATA_DIR = Path(__file__).parent.joinpath("data")
+PIPELINE_CACHE_DIR = DATA_DIR.joinpath(".pipeline_cache")
+EVENTS_SELECTED_COLUMNS = ['type', 'year', 'country', 'host', 'start', 'end', 'countries', 'events', 'sports',
+                           'participants_m', 'participants_f', 'participants']
+EVENTS_COLUMNS_TO_CHANGE = ['countries', 'events', 'participants_m', 'participants_f', 'participants']
+EXCEL_COLUMNS_TO_CHANGE = ['Rank', 'Gold', 'Silver', 'Bronze', 'Total']
+
+
+def load_events_csv(file_path, usecols=None):
+    """Load the raw events CSV file."""
+    return pd.read_csv(file_path, usecols=usecols)
+
+
+def load_country_index(npc_path, aliases_path):
+    """Load the country index saved for the NPC codes file, building it again only if either file has changed."""
+    return CountryIndex.load(npc_path, aliases_path=aliases_path)
+
+
+def clean_events(df, index):
+    """Handle the missing values and replace the country names in the prepared events."""
+    df = handle_missing_values(df, verbose=False)
+    return replace_country_names(df, verbose=False, index=index)
+
+
+def merge_npc_codes(events_df, index):
+    """Join the NPC codes to the cleaned events, matching the country names with the NPC names and aliases."""
+    return merge_dataframes(events_df, index.records[['Code', 'Name']], verbose=False, index=index)
+
+
+def write_prepared_files(events_df, excel_df, merged_df, events_path, excel_path, merged_path):
+    """Save the prepared events, Excel and merged DataFrames, each to its own CSV file, once."""
+    for df, output_path in [(events_df, events_path), (excel_df, excel_path), (merged_df, merged_path)]:
+        df.to_csv(output_path, index=False)
+        print(f"Saved '{output_path}'.")
+    return [str(events_path), str(excel_path), str(merged_path)]
+
+
+def build_pipeline(data_dir=DATA_DIR, cache_dir=PIPELINE_CACHE_DIR):
+    """Create the stages that prepare the paralympics data files.
+
+    The stages are: load each input file, prepare the events and the Excel data, clean the events, merge the NPC
+    codes and write the output files. Changing only npc_codes.csv or country_aliases.csv reruns only the stages that use
+    them, cleaning the events, the merge and the write.
+
+    Args:
+        data_dir (Path): Directory with the raw data files, the output files are written here too.
+        cache_dir (Path): Directory for the cached output of each stage. If None nothing is cached.
+
+    Returns:
+        dict: The stages by name. Call value() on a stage to run it and the stages it depends on.
+    """
+    data_dir = Path(data_dir)
+    events_path = data_dir.joinpath("paralympics_events_prepared.csv")
+    excel_path = data_dir.joinpath("paralympics_excel_prepared.csv")
+    merged_path = data_dir.joinpath("paralympics_merged_prepared.csv")
+
+    stages = {}
+    stages['load_events'] = Stage('load_events', load_events_csv,
+                                  [FileInput(data_dir.joinpath("paralympics_events_raw.csv"))],
+                                  params={'usecols': EVENTS_SELECTED_COLUMNS}, cache_dir=cache_dir)
+    stages['load_excel'] = Stage('load_excel', read_sheet, [FileInput(data_dir.joinpath("paralympics_all_raw.xlsx"))],
+                                 params={'sheet_name': 0}, cache_dir=cache_dir)
+    # 国家索引有自己的缓存，不再保存到流水线缓存中
+    stages['load_country_index'] = Stage('load_country_index', load_country_index,
+                                         [FileInput(data_dir.joinpath("npc_codes.csv")),
+                                          FileInput(data_dir.joinpath("country_aliases.csv"))])
+    stages['prepare_events'] = Stage('prepare_events', prepare_data, [stages['load_events']],
+                                     params={'columns_to_change': EVENTS_COLUMNS_TO_CHANGE, 'save': False,
+                                             'verbose': False},
+                                     cache_dir=cache_dir)
+    stages['prepare_excel'] = Stage('prepare_excel', prepare_data, [stages['load_excel']],
+                                    params={'columns_to_change': EXCEL_COLUMNS_TO_CHANGE, 'save': False,
+                                            'verbose': False},
+                                    cache_dir=cache_dir)
+    stages['clean_events'] = Stage('clean_events', clean_events,
+                                   [stages['prepare_events'], stages['load_country_index']],
+                                   cache_dir=cache_dir)
+    stages['merge_npc_codes'] = Stage('merge_npc_codes', merge_npc_codes,
+                                      [stages['clean_events'], stages['load_country_index']],
+                                      cache_dir=cache_dir)
+    stages['write'] = Stage('write', write_prepared_files,
+                            [stages['clean_events'], stages['prepare_excel'], stages['merge_npc_codes']],
+                            params={'events_path': events_path, 'excel_path': excel_path, 'merged_path': merged_path},
+                            cache_dir=cache_dir, outputs=[events_path, excel_path, merged_path])
+    return stages
+
+
+def merge_prepared_chunk(chunk, npc_codes_df, index, columns_to_change=EVENTS_COLUMNS_TO_CHANGE):
+    """Merge the NPC codes with a chunk read back from the prepared events CSV file.
+
+    A chunk with a missing count is read as float64, so the counts are converted to nullable integers again first and
+    the merged file has the same values, e.g. 195 rather than 195.0, as when the events are prepared whole.
+    """
+    chunk = chunk.assign(**to_nullable_integers(chunk, [col for col in columns_to_change if col in chunk.columns]))
+    return merge_dataframes(chunk, npc_codes_df, verbose=False, index=index)
+
+
+def run_in_chunks(chunksize, data_dir=DATA_DIR):
+    """Prepare the events CSV file and merge the NPC codes in chunks of chunksize rows, for very large event files."""
+    data_dir = Path(data_dir)
+    prepared_csv_path = data_dir.joinpath("paralympics_events_prepared.csv")
     try:
-        paralympics_datafile_csv = Path(__file__).parent.joinpath("data", "paralympics_events_raw.csv")
-        selected_columns = ['type', 'year', 'country', 'host', 'start', 'end', 'countries', 'events', 'sports',
-                            'participants_m', 'participants_f', 'participants']
-        events_csv_df = pd.read_csv(paralympics_datafile_csv, usecols=selected_columns)
-
-        # 打印 'type' 列的唯一值，查看不一致
-        print("\nUnique values in 'type' column before processing:")
-        print(events_csv_df['type'].unique())
-
-        print("\nStart and End Dates (Before Processing):")
-        print(events_csv_df[['start', 'end']].head())
-        print("\nMissing values in 'start' column:", events_csv_df['start'].isnull().sum())
-        print("Missing values in 'end' column:", events_csv_df['end'].isnull().sum())
-
-        events_columns_to_change = ['countries', 'events', 'participants_m', 'participants_f', 'participants']
-        events_csv_df = prepare_data(events_csv_df, events_columns_to_change)
-
-        # 打印处理后的 'type' 列的唯一值
-        print("\nUnique values in 'type' column after processing:")
-        print(events_csv_df['type'].unique())
-
-        print("\nStart and End Dates (After Processing):")
-        print(events_csv_df[['start', 'end']].head())
-
-        events_csv_df = handle_missing_values(events_csv_df)  # 处理缺失值
-        events_csv_df = replace_country_names(events_csv_df)  # 替换国家名称
-
-        print("Prepared CSV file content:")
-        describe_dataframe(events_csv_df)
-
-        # 保存准备好的 DataFrame 到 CSV 文件
-        output_path = Path(__file__).parent.joinpath("data", "paralympics_events_prepared.csv")
-        events_csv_df.to_csv(output_path, index=False)
-        print(f"\nSaved prepared DataFrame to '{output_path}'.")
-
+        index = CountryIndex.load(data_dir.joinpath("npc_codes.csv"),
+                                  aliases_path=data_dir.joinpath("country_aliases.csv"))
+        # 分块流式处理，不把整个文件读入内存
+        prepare_data_in_chunks(data_dir.joinpath("paralympics_events_raw.csv"), prepared_csv_path,
+                               EVENTS_COLUMNS_TO_CHANGE, chunksize=chunksize, usecols=EVENTS_SELECTED_COLUMNS,
+                               index=index)
+
+        # NPC 代码表很小，每一块都与整个代码表合并
+        npc_codes_df = index.records[['Code', 'Name']]
+        process_csv_in_chunks(prepared_csv_path, data_dir.joinpath("paralympics_merged_prepared.csv"),
+                              lambda chunk: merge_prepared_chunk(chunk, npc_codes_df, index),
+                              chunksize=chunksize)
+        index.print_report()
     except FileNotFoundError as e:
-        print(f"CSV file not found. Please check the file path. Error: {e}")
+        print(f"Data file not found. Please check the file path. Error: {e}")
 
-    # 读取第二个 DataFrame (Excel 文件)
-    try:
-        excel_file = Path(__file__).parent.joinpath("data", "paralympics_all_raw.xlsx")
-        df_excel = pd.read_excel(excel_file, sheet_name=0)
 
-        excel_columns_to_change = ['Rank', 'Gold', 'Silver', 'Bronze', 'Total']
-        df_excel = prepare_data(df_excel, excel_columns_to_change)
-
-        print("\nExcel file content (first sheet):")
-        describe_dataframe(df_excel)
-
-        # 保存准备好的 Excel DataFrame
-        output_excel_path = Path(__file__).parent.joinpath("data", "paralympics_excel_prepared.csv")
-        df_excel.to_csv(output_excel_path, index=False)
-        print(f"\nSaved prepared Excel DataFrame to '{output_excel_path}'.")
+# 主程序
+def main(chunksize=None, use_cache=True, verbose=True, use_processes=False):
+    """Prepare the paralympics data files.
+
+    Args:
+        chunksize (int): If given, the events CSV file is prepared and merged in chunks of this many rows instead of
+            being loaded whole. Use this for event files that are too large to fit in memory.
+        use_cache (bool): Reuse the cached output of stages whose inputs have not changed. Default is True.
+        verbose (bool): Print a description of the prepared DataFrames. Default is True.
+        use_processes (bool): Load the input files in a process pool rather than a thread pool. Default is False.
+    """
+    pd.set_option("display.max_columns", None)
 
-    except FileNotFoundError as e:
-        print(f"Excel file (first sheet) not found. Please check the file path. Error: {e}")
+    if chunksize:
+        run_in_chunks(chunksize)
+        return
 
-    # 读取 npc_codes.csv 并合并
+    stages = build_pipeline(cache_dir=PIPELINE_CACHE_DIR if use_cache else None)
     try:
-        npc_codes_file = Path(__file__).parent.joinpath("data", "npc_codes.csv")
-        npc_codes_df = pd.read_csv(npc_codes_file, usecols=['Code', 'Name'], encoding='utf-8', encoding_errors='ignore')
-
-        merged_df = merge_dataframes(events_csv_df, npc_codes_df)
-
-        # 打印合并后的完整 DataFrame 输出
-        print("Merged DataFrame with NPC Codes:")
-        print(merged_df[['country', 'Code', 'Name']])
-
-        # 保存合并后的 DataFrame
-        output_merged_path = Path(__file__).parent.joinpath("data", "paralympics_merged_prepared.csv")
-        merged_df.to_csv(output_merged_path, index=False)
-        print(f"\nSaved merged DataFrame to '{output_merged_path}'.")
-
+        # 输入文件互不依赖，需要时同时读取
+        to_run = stages_to_run(stages['write'])
+        load_stages = [stages[name] for name in ['load_events', 'load_excel', 'load_country_index']]
+        run_concurrently([stage for stage in load_stages if stage in to_run], use_processes=use_processes)
+
+        stages['write'].value()
+        if verbose:
+            print("Prepared CSV file content:")
+            describe_dataframe(stages['clean_events'].value())
+            print("\nExcel file content (first sheet):")
+            describe_dataframe(stages['prepare_excel'].value())
+            print("\nMerged DataFrame with NPC Codes:")
+            print(stages['merge_npc_codes'].value()[['country', 'Code', 'Name']])
     except FileNotFoundError as e:
-        print(f"NPC codes file not found. Please check the file path. Error: {e}")
-    except Exception as e:
-        print(f"An error occurred while reading the NPC codes file: {e}")
+        print(f"Data file not found. Please check the file path. Error: {e}")
+
 
 # 运行主程序
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+"""Reduce the points drawn in a line plot to a point budget without losing the peaks.
+
+matplotlib draws every point it is given, so a series with millions of rows, such as participants per day, is slow to
+render while the figure can only show a few thousand pixels across. minmax_positions splits the points, in the order
+they are drawn, into equal buckets and keeps the lowest and highest point of each bucket, plus the first and last
+point. The line drawn through the points that are kept has the same outline as the full line, so single peaks, such as
+the 1994 winter games, are never dropped. Largest-Triangle-Three-Buckets gives a smoother line but picks one point per
+bucket in turn, so it can miss a peak and cannot be done for all the buckets at once.
+
+Series with no more points than the budget are drawn as they are.
+
+Example:
+    keep = minmax_positions(df['participants'])
+    plt.plot(df['start'].iloc[keep], df['participants'].iloc[keep])
+"""
+import numpy as np
+import pandas as pd
+
+# Points drawn per line. At two points per bucket this is more than one bucket per pixel of a 10 inch wide figure.
+DEFAULT_POINT_BUDGET = 4_000
+
+
+def minmax_positions(values, point_budget=DEFAULT_POINT_BUDGET):
+    """Return the positions of the points to draw, the lowest and highest point of each bucket.
+
+    Missing values are only kept where a whole bucket is missing, so large gaps in the line are still shown.
+
+    Args:
+        values (pd.Series or np.ndarray): The y values in the order they are drawn.
+        point_budget (int): The most points to keep. Default is DEFAULT_POINT_BUDGET. None keeps all the points.
+
+    Returns:
+        np.ndarray: The positions of the points to keep, in order. All the positions if there are no more points than
+            the budget.
+    """
+    n_points = len(values)
+    if point_budget is None or n_points <= max(point_budget, 4):
+        return np.arange(n_points)
+
+    # The first and last points are always kept, the rest are split into buckets of two points each
+    n_buckets = max(1, (point_budget - 2) // 2)
+    bucket_size = -(-(n_points - 2) // n_buckets)
+    y = np.full(n_buckets * bucket_size, np.nan)
+    y[:n_points - 2] = pd.Series(values).to_numpy(dtype='float64', na_value=np.nan)[1:-1]
+    buckets = y.reshape(n_buckets, bucket_size)
+    missing = np.isnan(buckets)
+    lows = np.where(missing, np.inf, buckets).argmin(axis=1)
+    highs = np.where(missing, -np.inf, buckets).argmax(axis=1)
+
+    starts = np.arange(n_buckets) * bucket_size + 1
+    positions = np.concatenate(([0], starts + lows, starts + highs, [n_points - 1]))
+    # Buckets past the end of the values are only padding
+    return np.unique(positions[positions < n_points])
+
+
+def downsample(df, y_cols, point_budget=DEFAULT_POINT_BUDGET):
+    """Return the rows of a DataFrame to draw for one or more y columns.
+
+    Args:
+        df (pd.DataFrame): The rows in the order they are drawn.
+        y_cols (str or list): The y column, or the columns of each line drawn against the same x column.
+        point_budget (int): The most points to keep for each column. Default is DEFAULT_POINT_BUDGET. None keeps all
+            the rows.
+
+    Returns:
+        pd.DataFrame: The rows kept for any of the columns, in order.
+    """
+    if isinstance(y_cols, str):
+        y_cols = [y_cols]
+    if point_budget is None or len(df) <= point_budget:
+        return df
+    positions = np.unique(np.concatenate([minmax_positions(df[col], point_budget) for col in y_cols]))
+    return df.iloc[positions]
@@ -0,0 +1,130 @@
+"""Calculate histogram bin counts once per group and draw the histograms from the counts.
+
+DataFrame.hist filters and bins the rows each time a histogram is drawn, so every summer or winter histogram reads all
+the events again. histogram_counts groups the rows by a column, e.g. 'type', once, and bins every requested column of
+every group with numpy.histogram. plot_histograms then draws a group from the bin counts with Axes.stairs, without the
+rows.
+
+The counts are cached with caching.ResultCache by a fingerprint of the grouping and requested columns, in the same way
+as the profiles. The cache is kept in memory and, if a cache directory is given, as JSON files on disk. Finding the
+fingerprint reads the columns, so code that draws several groups should get the counts once and pass them to each plot
+rather than call histogram_counts for each one. The groups are named by their values as strings, or ALL_ROWS when the
+rows are not grouped.
+
+Example:
+    histograms = histogram_counts(df, ['participants_m', 'participants_f'], group_col='type')
+    fig, axes = plot_histograms(histograms, 'summer')
+    fig, axes = plot_histograms(histograms, 'winter')
+"""
+import math
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from tutorialpkg.caching import ResultCache, cache_key
+from tutorialpkg.profiling import dataframe_fingerprint
+
+# Name of the only group when the rows are not grouped
+ALL_ROWS = 'all'
+
+# Bins per histogram, as for DataFrame.hist
+DEFAULT_BINS = 10
+
+# Histogram counts already calculated in this process, and saved in the cache directories, keyed by fingerprint
+_histograms = ResultCache(suffix='.histograms.json')
+
+
+def calculate_histograms(df, columns, group_col=None, bins=DEFAULT_BINS):
+    """Bin each column of each group of rows with numpy.histogram.
+
+    The rows are sorted by group once and the columns are converted to one float array, so each group is a slice of
+    the same array. Missing values are left out, and the bins of each group cover the range of its own values, as for
+    DataFrame.hist on the rows of the group. Rows with no group are left out.
+
+    Args:
+        df (pd.DataFrame): The data.
+        columns (list): The numeric columns to bin.
+        group_col (str): The column to group the rows by. Default is None, all the rows are one group.
+        bins (int): Number of bins. Default is DEFAULT_BINS.
+
+    Returns:
+        dict: {'columns': columns, 'bins': bins, 'group_col': group_col, 'groups': {group: {column: {'edges': list,
+            'counts': list}}}}, with only lists, dictionaries, strings and numbers so it can be saved as JSON.
+    """
+    values = df[columns].to_numpy(dtype='float64', na_value=np.nan)
+    if group_col is None:
+        names, bounds = [ALL_ROWS], np.array([0, len(df)])
+    else:
+        codes, uniques = pd.factorize(df[group_col], sort=True)
+        order = np.argsort(codes, kind='stable')
+        values = values[order]
+        # Rows with no group have the code -1, so they sort first and are left out of every group
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        names = [str(name) for name in uniques]
+
+    groups = {}
+    for name, start, stop in zip(names, bounds[:-1], bounds[1:]):
+        group = {}
+        for i, col in enumerate(columns):
+            column_values = values[start:stop, i]
+            counts, edges = np.histogram(column_values[~np.isnan(column_values)], bins=bins)
+            group[col] = {'edges': edges.tolist(), 'counts': counts.tolist()}
+        groups[name] = group
+    return {'columns': list(columns), 'bins': bins, 'group_col': group_col, 'groups': groups}
+
+
+def histogram_counts(df, columns, group_col=None, bins=DEFAULT_BINS, cache_dir=None):
+    """Return the histogram counts of each column for each group, calculating them if they are not cached.
+
+    Only the grouping and requested columns are fingerprinted, so other changes to the DataFrame keep the counts. The
+    fingerprint reads every row of those columns, even when the counts are cached, so call this once and reuse the
+    counts for each group that is drawn.
+
+    Args:
+        df (pd.DataFrame): The data.
+        columns (list): The numeric columns to bin.
+        group_col (str): The column to group the rows by, e.g. 'type'. Default is None, all the rows are one group.
+        bins (int): Number of bins. Default is DEFAULT_BINS.
+        cache_dir (Path): Directory to save the counts in so later runs can use them. Default is None, memory only.
+
+    Returns:
+        dict: The counts, see calculate_histograms.
+    """
+    columns = list(columns)
+    used_cols = columns if group_col is None or group_col in columns else [group_col, *columns]
+    key = cache_key(dataframe_fingerprint(df[used_cols]), group_col, bins)
+    histograms = _histograms.get(key, cache_dir)
+    if histograms is None:
+        histograms = calculate_histograms(df, columns, group_col=group_col, bins=bins)
+        _histograms.put(key, histograms, cache_dir)
+    return histograms
+
+
+def plot_histograms(histograms, group=ALL_ROWS, columns=None, figsize=(10, 6)):
+    """Draw the histogram of each column of a group from its bin counts, one subplot per column.
+
+    The subplots are laid out in a grid as by DataFrame.hist, and each is titled with its column name.
+
+    Args:
+        histograms (dict): Counts from histogram_counts.
+        group (str): The group to draw. Default is ALL_ROWS, for counts that are not grouped.
+        columns (list): The columns to draw. Default is all the columns in the counts.
+        figsize (tuple): Width and height of the figure in inches. Default is (10, 6).
+
+    Returns:
+        tuple: (Figure, np.ndarray of the Axes used, one per column)
+    """
+    columns = histograms['columns'] if columns is None else columns
+    ncols = math.ceil(math.sqrt(len(columns)))
+    nrows = math.ceil(len(columns) / ncols)
+    fig, axes = plt.subplots(nrows=nrows, ncols=ncols, figsize=figsize, squeeze=False)
+    axes = axes.flatten()
+    for ax, col in zip(axes, columns):
+        counts = histograms['groups'][group][col]
+        ax.stairs(counts['counts'], counts['edges'], fill=True)
+        ax.set_title(col)
+        ax.grid(True)
+    for ax in axes[len(columns):]:
+        fig.delaxes(ax)
+    return fig, axes[:len(columns)]
@@ -0,0 +1,222 @@
+"""Run data preparation as a series of named stages that cache their output on disk.
+
+Each stage has a key, a hash of its name, its parameters, the code of its function and the keys of its inputs. The
+inputs are other stages or data files, and a data file's key is the hash of its contents. For a function in this
+package the code is the source of its module and of every package module that module uses, and so on, so a change to
+a helper such as handle_missing_values also runs the stages again. A stage whose key has not changed since the last
+run loads its output from the cache instead of running again. Stages are only loaded when a later stage needs them,
+so when nothing has changed only the last stage is checked.
+
+Example:
+    raw = FileInput(Path('data', 'paralympics_events_raw.csv'))
+    events = Stage('load', pd.read_csv, [raw], cache_dir=cache_dir)
+    prepared = Stage('prepare', prepare_data, [events], params={'save': False}, cache_dir=cache_dir)
+    df = prepared.value()
+"""
+import hashlib
+import inspect
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from tutorialpkg.caching import file_hash
+
+
+def timed_call(func, args, params):
+    """Call func and return its result with the time taken in seconds. Defined at module level so it can be
+    pickled and called in another process."""
+    start = time.perf_counter()
+    result = func(*args, **params)
+    return result, time.perf_counter() - start
+
+
+def code_key(func):
+    """Return a hash of the code a function may run.
+
+    For a function defined in this package this is the source of its module and of every package module the module
+    uses, directly or through other package modules. A module uses another if it imports it, or imports a function or
+    class from it. For other functions, e.g. pd.read_csv, it is the source of the function itself.
+
+    Args:
+        func (function): The function.
+
+    Returns:
+        str: The hex digest of the hash.
+    """
+    package = __name__.split('.')[0]
+    module = inspect.getmodule(func)
+    if module is None or module.__name__.split('.')[0] != package or getattr(module, '__file__', None) is None:
+        try:
+            code = inspect.getsource(func)
+        except (OSError, TypeError):
+            code = getattr(func, '__qualname__', repr(func))
+        return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+    found = {module.__name__: module}
+    to_visit = [module]
+    while to_visit:
+        for value in list(vars(to_visit.pop()).values()):
+            used = value if inspect.ismodule(value) else sys.modules.get(getattr(value, '__module__', None) or '')
+            if (used is not None and used.__name__.split('.')[0] == package and used.__name__ not in found
+                    and getattr(used, '__file__', None) is not None):
+                found[used.__name__] = used
+                to_visit.append(used)
+
+    sha = hashlib.sha256()
+    for name in sorted(found):
+        sha.update(name.encode('utf-8'))
+        sha.update(Path(found[name].__file__).read_bytes())
+    return sha.hexdigest()
+
+
+class FileInput:
+    """A data file used as the input to a stage. Its value is the path and its key is the hash of its contents."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.name = self.path.name
+        self._key = None
+
+    @property
+    def key(self):
+        if self._key is None:
+            self._key = file_hash(self.path)
+        return self._key
+
+    def value(self):
+        return self.path
+
+
+class Stage:
+    """A named step in a pipeline whose output is cached on disk, keyed by a hash of everything it depends on.
+
+    Args:
+        name (str): Name of the stage, used in the cache file name and the progress messages.
+        func (function): Called with the values of the inputs as positional arguments and params as keyword arguments.
+        inputs (list): FileInput and Stage objects the stage depends on.
+        params (dict): Keyword arguments for func. They must be JSON serialisable to be part of the key.
+        cache_dir (Path): Directory for the cached outputs. If None the output is not cached.
+        outputs (list): Paths of files written by the stage. The stage runs again if any of them are missing.
+    """
+
+    def __init__(self, name, func, inputs=(), params=None, cache_dir=None, outputs=()):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.params = params or {}
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.outputs = [Path(p) for p in outputs]
+        self._key = None
+        self._value = None
+        self._has_value = False
+
+    @property
+    def key(self):
+        if self._key is None:
+            description = {
+                'name': self.name,
+                'code': code_key(self.func),
+                'params': self.params,
+                'inputs': [i.key for i in self.inputs],
+            }
+            self._key = hashlib.sha256(json.dumps(description, default=str).encode('utf-8')).hexdigest()
+        return self._key
+
+    @property
+    def cache_path(self):
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir.joinpath(f'{self.name}-{self.key[:16]}.pkl')
+
+    def is_cached(self):
+        """Return True if the output for the current key is in the cache and any output files exist."""
+        if self.cache_path is None or not self.cache_path.exists():
+            return False
+        return all(p.exists() for p in self.outputs)
+
+    def value(self):
+        """Return the output of the stage, from the cache if the key has not changed or else by running it."""
+        if self._has_value:
+            return self._value
+
+        if self.is_cached():
+            self._value = pd.read_pickle(self.cache_path)
+            self._has_value = True
+            print(f"Stage '{self.name}': loaded from cache.")
+        else:
+            self._set_result(*timed_call(self.func, self.input_values(), self.params))
+        return self._value
+
+    def input_values(self):
+        """Return the values of the inputs, running any input stages that have not run yet."""
+        return [i.value() for i in self.inputs]
+
+    def _set_result(self, value, seconds):
+        """Keep the value returned by running the stage and save it to the cache."""
+        self._value = value
+        self._has_value = True
+        print(f"Stage '{self.name}': ran in {seconds:.3f} s.")
+        if self.cache_dir is not None:
+            self._save()
+
+    def _save(self):
+        """Save the output to the cache, replacing outputs of this stage saved under previous keys."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for old_path in self.cache_dir.glob(f'{self.name}-*.pkl'):
+            old_path.unlink()
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        pd.to_pickle(self._value, tmp_path)
+        tmp_path.replace(self.cache_path)
+
+
+def stages_to_run(stage):
+    """Return the stages that stage.value() would run, in the order they would run.
+
+    Stages that are in the cache, or already have a value, are not run and nor are the stages they depend on.
+    """
+    if stage._has_value or stage.is_cached():
+        return []
+    to_run = []
+    for i in stage.inputs:
+        if isinstance(i, Stage):
+            to_run.extend(s for s in stages_to_run(i) if s not in to_run)
+    to_run.append(stage)
+    return to_run
+
+
+def run_concurrently(stages, use_processes=False, max_workers=None):
+    """Run stages that do not depend on each other at the same time, e.g. stages that each load a different file.
+
+    Threads suit stages that mostly wait on the disk or release the GIL, such as pd.read_csv. Use processes for stages
+    that hold the GIL, such as reading .xlsx files with openpyxl. With processes the stage functions and their
+    results must be picklable and the inputs are found in this process first.
+
+    Args:
+        stages (list): The stages to run.
+        use_processes (bool): Run the stages in a process pool instead of a thread pool. Default is False.
+        max_workers (int): Maximum number of threads or processes. Default is one per stage.
+    """
+    stages = [s for s in stages if not s._has_value]
+    if not stages:
+        return
+
+    start = time.perf_counter()
+    if use_processes:
+        to_run = [s for s in stages if not s.is_cached()]
+        with ProcessPoolExecutor(max_workers=max_workers or len(to_run) or 1) as executor:
+            futures = {s: executor.submit(timed_call, s.func, s.input_values(), s.params) for s in to_run}
+            for s in stages:
+                if s in futures:
+                    s._set_result(*futures[s].result())
+                else:
+                    s.value()
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers or len(stages)) as executor:
+            for future in [executor.submit(s.value) for s in stages]:
+                future.result()
+    names = ', '.join(s.name for s in stages)
+    print(f"Stages {names}: ran concurrently in {time.perf_counter() - start:.3f} s.")
@@ -0,0 +1,335 @@
+"""Profile a DataFrame in one pass and return the profile as a dictionary that can be saved as JSON.
+
+describe_dataframe used to print head, tail, dtypes, info, describe and the missing values one after another, and each
+of those scans the data again. profile_dataframe works out the missing values mask once and the statistics of all the
+numeric columns together, and returns them rather than printing them, so they can be saved or compared.
+
+Profiles are cached by a fingerprint of the data: a hash of the column names, dtypes and values of a DataFrame, or the
+hash of the contents of a file. Profiling the same data again returns the cached profile. The cache is kept in memory
+and, if a cache directory is given, as JSON files on disk. With profile_file a cached profile is returned without
+reading the file at all.
+
+For files too large to load, StreamingStatistics keeps the count, mean, variance, min, max and null count of each
+numeric column while the file is read in chunks. Statistics from different chunks or processes can be merged.
+
+Example:
+    profile = profile_dataframe(df)
+    print_profile(profile)
+    save_profile(profile, Path('events_profile.json'))
+
+    stats = statistics_from_csv(Path('events.csv'), chunksize=100_000)
+    print(stats.summary())
+"""
+import hashlib
+import json
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from tutorialpkg.caching import ResultCache, cache_key, file_hash, read_sheet
+
+# Profiles already calculated in this process, and saved in the cache directories, keyed by fingerprint
+_profiles = ResultCache()
+
+PERCENTILES = [25, 50, 75]
+
+
+def _hash_arrow_array(sha, array):
+    """Add the type, position and memory buffers of a pyarrow array, and its dictionary if it has one, to a hash."""
+    sha.update(f'{array.type}:{array.offset}:{len(array)}'.encode('utf-8'))
+    for buffer in array.buffers():
+        if buffer is not None:
+            sha.update(buffer)
+    if pa.types.is_dictionary(array.type):
+        _hash_arrow_array(sha, array.dictionary)
+
+
+def dataframe_fingerprint(df):
+    """Return a hash of the column names, dtypes, index and values of a DataFrame.
+
+    With pyarrow the memory buffers of the columns are hashed directly, which is much faster than hashing each value
+    with pd.util.hash_pandas_object, especially for text columns. Equal data held in memory in a different way, e.g.
+    after slicing, may get a different fingerprint, so at worst a profile is calculated again.
+
+    Args:
+        df (pd.DataFrame): The data.
+
+    Returns:
+        str: The hex digest of the hash.
+    """
+    sha = hashlib.sha256()
+    sha.update(json.dumps([[str(col), str(dtype)] for col, dtype in df.dtypes.items()]).encode('utf-8'))
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=True) if pa is not None else None
+    except pa.ArrowException:
+        # e.g. an object column with a mix of text and numbers
+        table = None
+    if table is None:
+        sha.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+        return sha.hexdigest()
+    for column in table.columns:
+        for chunk in column.chunks:
+            _hash_arrow_array(sha, chunk)
+    return sha.hexdigest()
+
+
+def _rows_to_records(df):
+    """Convert rows to a list of dictionaries of JSON values, with dates as ISO strings and missing values as None."""
+    return json.loads(df.to_json(orient='records', date_format='iso'))
+
+
+def _json_value(value):
+    """Convert a numpy or pandas scalar to a Python value that can be saved as JSON."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _numeric_statistics(df, columns):
+    """Calculate the describe() statistics of the numeric columns together, as one 2D float array."""
+    if not columns:
+        return {}
+    values = df[columns].to_numpy(dtype=float, na_value=np.nan)
+    if len(values) == 0:
+        values = np.full((1, len(columns)), np.nan)
+    # Columns with no values, or one value for the std, give NaN and a warning that can be ignored
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        means = np.nanmean(values, axis=0)
+        stds = np.nanstd(values, axis=0, ddof=1)
+        quantiles = np.nanpercentile(values, [0] + PERCENTILES + [100], axis=0)
+    statistics = {}
+    for i, col in enumerate(columns):
+        col_stats = {'mean': means[i], 'std': stds[i], 'min': quantiles[0, i]}
+        col_stats.update({f'{p}%': quantiles[j + 1, i] for j, p in enumerate(PERCENTILES)})
+        col_stats['max'] = quantiles[-1, i]
+        statistics[col] = {k: _json_value(v) for k, v in col_stats.items()}
+    return statistics
+
+
+def _other_statistics(series):
+    """Calculate the statistics of a non-numeric column: the number of unique values and the most common value."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return {'min': _json_value(series.min()), 'max': _json_value(series.max())}
+    counts = series.value_counts()
+    if counts.empty:
+        return {'unique': 0, 'top': None, 'freq': None}
+    return {'unique': len(counts), 'top': _json_value(counts.index[0]), 'freq': int(counts.iloc[0])}
+
+
+def calculate_profile(df, n_rows=5, n_missing_rows=20):
+    """Calculate the profile of a DataFrame without using the cache, see profile_dataframe."""
+    missing = df.isna().to_numpy()
+    null_counts = missing.sum(axis=0)
+    rows_with_missing = np.flatnonzero(missing.any(axis=1))
+
+    numeric_columns = [col for col in df.columns
+                       if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])]
+    statistics = _numeric_statistics(df, numeric_columns)
+    memory = df.memory_usage(index=True, deep=False)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        columns.append({
+            'name': str(col),
+            'dtype': str(df[col].dtype),
+            'non_null': int(len(df) - null_counts[i]),
+            'null': int(null_counts[i]),
+            'memory_bytes': int(memory[col]),
+            'statistics': statistics[col] if col in statistics else _other_statistics(df[col]),
+        })
+
+    return {
+        'shape': list(df.shape),
+        'memory_bytes': int(memory.sum()),
+        'columns': columns,
+        'head': _rows_to_records(df.head(n_rows)),
+        'tail': _rows_to_records(df.tail(n_rows)),
+        'rows_with_missing': {
+            'count': len(rows_with_missing),
+            'index': [_json_value(i) for i in df.index[rows_with_missing[:n_missing_rows]]],
+        },
+    }
+
+
+def profile_dataframe(df, cache_dir=None, n_rows=5):
+    """Profile a DataFrame: its shape, columns, dtypes, missing values, summary statistics, first and last rows.
+
+    Args:
+        df (pd.DataFrame): The data.
+        cache_dir (Path): Directory to save profiles in so later runs can use them. Default is None, memory only.
+        n_rows (int): Number of rows to include from the start and the end of the data. Default is 5.
+
+    Returns:
+        dict: The profile, with only lists, dictionaries, strings, numbers and None so it can be saved as JSON.
+    """
+    fingerprint = cache_key(dataframe_fingerprint(df), n_rows)
+    profile = _profiles.get(fingerprint, cache_dir)
+    if profile is None:
+        profile = calculate_profile(df, n_rows=n_rows)
+        profile['fingerprint'] = fingerprint
+        _profiles.put(fingerprint, profile, cache_dir)
+    return profile
+
+
+def profile_file(file_path, cache_dir=None, sheet_name=0, n_rows=5):
+    """Profile the data in a CSV or Excel file, using the cached profile without reading the file if it is unchanged.
+
+    Args:
+        file_path (Path): The .csv or .xlsx file.
+        cache_dir (Path): Directory to save profiles in so later runs can use them. Default is None, memory only.
+        sheet_name (str or int): The sheet to read from an Excel file. Default is the first sheet.
+        n_rows (int): Number of rows to include from the start and the end of the data. Default is 5.
+
+    Returns:
+        dict: The profile, see profile_dataframe.
+    """
+    file_path = Path(file_path)
+    fingerprint = cache_key(file_hash(file_path), sheet_name, n_rows)
+    profile = _profiles.get(fingerprint, cache_dir)
+    if profile is None:
+        df = pd.read_csv(file_path) if file_path.suffix == '.csv' else read_sheet(file_path, sheet_name=sheet_name)
+        profile = calculate_profile(df, n_rows=n_rows)
+        profile['fingerprint'] = fingerprint
+        _profiles.put(fingerprint, profile, cache_dir)
+    return profile
+
+
+def save_profile(profile, file_path):
+    """Save a profile as a JSON file."""
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    file_path.write_text(json.dumps(profile, indent=2), encoding='utf-8')
+
+
+def load_profile(file_path):
+    """Load a profile saved by save_profile."""
+    return json.loads(Path(file_path).read_text(encoding='utf-8'))
+
+
+def print_profile(profile):
+    """Print a profile in the same order as describe_dataframe printed its results."""
+    names = [col['name'] for col in profile['columns']]
+    print(f"DataFrame shape: {tuple(profile['shape'])}")
+    print("\nFirst rows:")
+    print(pd.DataFrame(profile['head'], columns=names))
+    print("\nLast rows:")
+    print(pd.DataFrame(profile['tail'], columns=names))
+    print("\nColumns:")
+    print(pd.DataFrame([{k: col[k] for k in ('name', 'dtype', 'non_null', 'null', 'memory_bytes')}
+                        for col in profile['columns']]).to_string(index=False))
+    print(f"memory usage: {profile['memory_bytes']} bytes")
+    print("\nStatistical summary:")
+    print(pd.DataFrame({col['name']: col['statistics'] for col in profile['columns']}))
+    missing = profile['rows_with_missing']
+    print(f"\nRows with missing values: {missing['count']}, e.g. rows {missing['index']}")
+
+
+class StreamingStatistics:
+    """Count, mean, variance, min, max and null count of numeric columns, updated one chunk of rows at a time.
+
+    Each chunk's statistics are calculated with numpy and combined with the running totals using the parallel form
+    of Welford's algorithm (Chan et al.), which keeps the variance accurate without holding all the values or a
+    running sum of squares. Statistics calculated separately, e.g. in different processes, are combined with merge.
+
+    Args:
+        columns (list): The numeric columns. Default is None, the numeric columns of the first chunk.
+    """
+
+    def __init__(self, columns=None):
+        self.columns = list(columns) if columns is not None else None
+        self.rows = 0
+        if self.columns is not None:
+            self._reset_totals()
+
+    def _reset_totals(self):
+        n = len(self.columns)
+        self.count = np.zeros(n)
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.min = np.full(n, np.nan)
+        self.max = np.full(n, np.nan)
+        self.nulls = np.zeros(n, dtype=np.int64)
+
+    def update(self, chunk):
+        """Add the rows in a DataFrame to the statistics. Returns self so calls can be chained."""
+        if self.columns is None:
+            self.columns = [col for col in chunk.columns
+                            if pd.api.types.is_numeric_dtype(chunk[col]) and not pd.api.types.is_bool_dtype(chunk[col])]
+            self._reset_totals()
+        values = chunk[self.columns].to_numpy(dtype=float, na_value=np.nan)
+        present = ~np.isnan(values)
+        count = present.sum(axis=0).astype(float)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean = np.where(count > 0, np.nansum(values, axis=0) / np.maximum(count, 1), 0.0)
+            m2 = np.nansum((values - mean) ** 2, axis=0)
+            chunk_min = np.nanmin(values, axis=0) if len(values) else np.full(len(self.columns), np.nan)
+            chunk_max = np.nanmax(values, axis=0) if len(values) else np.full(len(self.columns), np.nan)
+        self._combine(count, mean, m2, chunk_min, chunk_max, len(values) - count.astype(np.int64), len(values))
+        return self
+
+    def merge(self, other):
+        """Add the statistics of another StreamingStatistics, for the same columns, to these. Returns self."""
+        if other.columns is None:
+            return self
+        if self.columns is None:
+            self.columns = list(other.columns)
+            self._reset_totals()
+        if other.columns != self.columns:
+            raise ValueError(f'Cannot merge statistics for columns {other.columns} into {self.columns}.')
+        self._combine(other.count, other.mean, other.m2, other.min, other.max, other.nulls, other.rows)
+        return self
+
+    def _combine(self, count, mean, m2, col_min, col_max, nulls, rows):
+        """Combine the statistics of a group of rows with the running totals."""
+        total = self.count + count
+        delta = mean - self.mean
+        safe_total = np.maximum(total, 1)
+        self.mean = np.where(total > 0, self.mean + delta * count / safe_total, 0.0)
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * count / safe_total
+        self.count = total
+        self.min = np.fmin(self.min, col_min)
+        self.max = np.fmax(self.max, col_max)
+        self.nulls = self.nulls + nulls
+        self.rows += rows
+
+    def summary(self):
+        """Return the statistics as a DataFrame laid out like df.describe(), with the null counts as an extra row.
+
+        The quartiles in describe() need all the values, so they are not included.
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.where(self.count > 1, np.sqrt(self.m2 / np.maximum(self.count - 1, 1)), np.nan)
+        mean = np.where(self.count > 0, self.mean, np.nan)
+        return pd.DataFrame([self.count, mean, std, self.min, self.max, self.nulls],
+                            index=['count', 'mean', 'std', 'min', 'max', 'null'], columns=self.columns)
+
+
+def statistics_from_csv(file_path, chunksize=100_000, columns=None, **read_csv_kwargs):
+    """Calculate StreamingStatistics for a CSV file, reading it a chunk at a time so it does not have to fit in memory.
+
+    Args:
+        file_path (Path): The CSV file.
+        chunksize (int): Number of rows to read at a time. Default is 100,000.
+        columns (list): The numeric columns. Default is None, the numeric columns of the first chunk.
+        **read_csv_kwargs: Other arguments for pd.read_csv, e.g. usecols.
+
+    Returns:
+        StreamingStatistics: The statistics of the whole file.
+    """
+    stats = StreamingStatistics(columns)
+    for chunk in pd.read_csv(file_path, chunksize=chunksize, **read_csv_kwargs):
+        stats.update(chunk)
+    return stats
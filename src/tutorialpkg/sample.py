@@ -1,9 +1,39 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
 import matplotlib.pyplot as plt
 import pandas as pd
 from pathlib import Path
 
+from tutorialpkg.downsample import DEFAULT_POINT_BUDGET, downsample
+from tutorialpkg.histograms import histogram_counts, plot_histograms
+
+# 图像默认保存的目录
+DEFAULT_SAVE_DIR = Path(__file__).parent.joinpath("data")
+PREPARED_CSV_PATH = DEFAULT_SAVE_DIR.joinpath("paralympics_events_prepared.csv")
+
+# 批量渲染时每个工作进程使用的数据框
+_worker_df = None
+
 
-def draw_and_save_histogram(df, columns=None):
+def save_and_close(fig, file_name, message, save_dir=None, show=True):
+    """将图像保存为.png文件，按需显示，然后关闭图像释放内存，返回保存的路径."""
+    save_dir = Path(save_dir) if save_dir is not None else DEFAULT_SAVE_DIR
+    save_dir.mkdir(parents=True, exist_ok=True)
+    fig_fp = save_dir.joinpath(file_name)
+    try:
+        fig.savefig(fig_fp)
+        print(f'{message} {fig_fp}')
+        if show:
+            plt.show()  # 显示图像
+    finally:
+        plt.close(fig)
+    return fig_fp
+
+
+def draw_and_save_histogram(df, columns=None, save_dir=None, show=True):
     """绘制数据框的直方图并保存为.png文件，仅对指定的列绘图."""
     if columns is None or len(columns) == 0:  # 检查是否指定了列
         print("未指定列或指定的列为空，无法绘制直方图。")
@@ -20,56 +50,47 @@ def draw_and_save_histogram(df, columns=None):
             ax.set_ylabel('frequency')
             ax.set_title(ax.get_title())
 
-        plt.tight_layout()
+        fig = axes.flat[0].figure
+        fig.tight_layout()
 
         # 保存直方图
-        save_dir = Path(r"C:\comp0035-2024-tutorials\src\tutorialpkg\data")
-        if not save_dir.exists():
-            save_dir.mkdir(parents=True, exist_ok=True)
-
-        fig_fp = save_dir.joinpath('histogram_with_labels.png')
-        plt.savefig(fig_fp)
-        print(f'直方图已保存至 {fig_fp}')
-        plt.show()  # 显示图像
+        return save_and_close(fig, 'histogram_with_labels.png', '直方图已保存至', save_dir, show)
     else:
         print("没有数值列可以绘制直方图.")
 
 
-def draw_and_save_histogram_by_event_type(df, event_type, columns=None):
-    """绘制并保存指定列的直方图，按事件类型过滤 ('summer' 或 'winter')."""
-    filtered_df = df[df['type'] == event_type]
+def draw_and_save_histogram_by_event_type(df, event_type, columns=None, save_dir=None, show=True, histograms=None):
+    """绘制并保存指定列的直方图，按事件类型过滤 ('summer' 或 'winter').
 
+    直方图由 histogram_counts 按事件类型一次算好并缓存的分箱计数绘制，再次绘制不会重新读取数据行。
+    也可以传入已经算好的 histograms，此时不需要数据框。
+    """
     if columns is None or len(columns) == 0:
         print(f"未指定列或指定的列为空，无法绘制 {event_type} 事件的直方图。")
         return
 
-    numeric_cols = filtered_df[columns]
+    if histograms is None:
+        histograms = histogram_counts(df, columns, group_col='type')
 
-    if not numeric_cols.empty:
-        axes = numeric_cols.hist(bins=10, figsize=(10, 6))
+    if event_type in histograms['groups']:
+        fig, axes = plot_histograms(histograms, event_type, columns)
 
-        for ax in axes.flatten():
+        for ax in axes:
             ax.set_xlabel('number value')
             ax.set_ylabel('frequency')
             ax.set_title(f"{event_type.capitalize()} Event: {ax.get_title()}")
 
-        plt.tight_layout()
+        fig.tight_layout()
 
         # 保存直方图
-        save_dir = Path(r"C:\comp0035-2024-tutorials\src\tutorialpkg\data")
-        if not save_dir.exists():
-            save_dir.mkdir(parents=True, exist_ok=True)
-
-        fig_fp = save_dir.joinpath(f'histogram_{event_type}_events.png')
-        plt.savefig(fig_fp)
-        print(f'{event_type.capitalize()}事件的直方图已保存至 {fig_fp}')
-        plt.show()  # 显示图像
+        return save_and_close(fig, f'histogram_{event_type}_events.png',
+                              f'{event_type.capitalize()}事件的直方图已保存至', save_dir, show)
     else:
 
         print(f"没有数值列可以绘制 {event_type} 事件的直方图.")
 
 
-def draw_and_save_boxplot(df, columns=None):
+def draw_and_save_boxplot(df, columns=None, save_dir=None, show=True):
     """绘制数据框的箱线图并保存为.png文件，仅对指定的列绘图."""
     if columns is None or len(columns) == 0:
         print("未指定列或指定的列为空，无法绘制箱线图。")
@@ -92,17 +113,10 @@ def draw_and_save_boxplot(df, columns=None):
 
         for i in range(idx + 1, len(axes)):
             fig.delaxes(axes[i])
-        plt.tight_layout()
+        fig.tight_layout()
 
         # 保存箱线图
-        save_dir = Path(r"C:\comp0035-2024-tutorials\src\tutorialpkg\data")
-        if not save_dir.exists():
-            save_dir.mkdir(parents=True, exist_ok=True)
-
-        fig_fp = save_dir.joinpath('boxplot_with_labels.png')
-        plt.savefig(fig_fp)
-        print(f'箱线图已保存至 {fig_fp}')
-        plt.show()  # 显示图像
+        return save_and_close(fig, 'boxplot_with_labels.png', '箱线图已保存至', save_dir, show)
     else:
         print("没有数值列可以绘制箱线图.")
 
@@ -111,13 +125,17 @@ def draw_and_save_timeseries(df, x_col,
                              y_col,
                              xlabel="Start Date",
                              ylabel="Number of Participants",
-                             title="Time Series"):
+                             title="Time Series",
+                             save_dir=None,
+                             show=True,
+                             point_budget=DEFAULT_POINT_BUDGET):
 
-    """绘制并保存时间序列图."""
-    df[x_col] = pd.to_datetime(df[x_col])
+    """绘制并保存时间序列图，点数超过 point_budget 时只绘制每段的最低点和最高点."""
+    df = df.assign(**{x_col: pd.to_datetime(df[x_col])})  # 不修改传入的数据框
+    points = downsample(df, y_col, point_budget)
 
-    plt.figure(figsize=(10, 6))
-    plt.plot(df[x_col], df[y_col], label=y_col)
+    fig = plt.figure(figsize=(10, 6))
+    plt.plot(points[x_col], points[y_col], label=y_col)
 
     plt.xlabel(xlabel)
     plt.ylabel(ylabel)
@@ -127,27 +145,22 @@ def draw_and_save_timeseries(df, x_col,
     plt.tight_layout()
 
     # 保存时间序列图
-    save_dir = Path(r"C:\comp0035-2024-tutorials\src\tutorialpkg\data")
-    if not save_dir.exists():
-        save_dir.mkdir(parents=True, exist_ok=True)
-
-    fig_fp = save_dir.joinpath(f'{title.lower().replace(" ", "_")}.png')
-    plt.savefig(fig_fp)
-    print(f'时间序列图已保存至 {fig_fp}')
-    plt.show()  # 显示图像
-# 确保在函数定义之前有两个空行
+    return save_and_close(fig, f'{title.lower().replace(" ", "_")}.png', '时间序列图已保存至', save_dir, show)
 
 
 def draw_and_save_timeseries_by_event_type(df, event_type,
                                            x_col='start',
                                            y_col='participants',
                                            xlabel="Start Date",
-                                           ylabel="Number of Participants"):
+                                           ylabel="Number of Participants",
+                                           save_dir=None,
+                                           show=True,
+                                           point_budget=DEFAULT_POINT_BUDGET):
 
-    """按事件类型绘制并保存时间序列图。"""
+    """按事件类型绘制并保存时间序列图，点数超过 point_budget 时降采样。"""
     # 过滤数据
-    filtered_df = df[df['type'] == event_type]
-    plt.figure(figsize=(10, 6))
+    filtered_df = downsample(df[df['type'] == event_type], y_col, point_budget)
+    fig = plt.figure(figsize=(10, 6))
     plt.plot(filtered_df[x_col],
              filtered_df[y_col],
              label=f'{event_type.capitalize()} Participants')
@@ -160,19 +173,13 @@ def draw_and_save_timeseries_by_event_type(df, event_type,
     plt.tight_layout()
 
     # 保存时间序列图
-    save_dir = Path(r"C:\comp0035-2024-tutorials\src\tutorialpkg\data")
-    if not save_dir.exists():
-        save_dir.mkdir(parents=True, exist_ok=True)
-
-    fig_fp = save_dir.joinpath(f'{event_type}_participants_timeseries.png')
-    plt.savefig(fig_fp)
-    print(f'{event_type.capitalize()}事件的时间序列图已保存至 {fig_fp}')
-    plt.show()
+    return save_and_close(fig, f'{event_type}_participants_timeseries.png',
+                          f'{event_type.capitalize()}事件的时间序列图已保存至', save_dir, show)
 
 
 def annotate_anomalies(df):
     """标注时间序列中的异常点（如 1994 年冬季残奥会）。"""
-    df['start'] = pd.to_datetime(df['start'])
+    df = df.assign(start=pd.to_datetime(df['start']))  # 不修改传入的数据框
 
     plt.figure(figsize=(10, 6))
     plt.plot(df['start'], df['participants'], label='Participants')
@@ -231,20 +238,22 @@ def annotate_anomalies(df):
 #     plt.show()  # 显示图像
 
 
-def draw_and_save_timeseries_gender(df):
-    """绘制并保存带有男女参与者的时间序列图。"""
-    df['start'] = pd.to_datetime(df['start'])
+def draw_and_save_timeseries_gender(df, save_dir=None, show=True, point_budget=DEFAULT_POINT_BUDGET):
+    """绘制并保存带有男女参与者的时间序列图，每条线的点数超过 point_budget 时降采样。"""
+    df = df.assign(start=pd.to_datetime(df['start']))  # 不修改传入的数据框
+    male = downsample(df, 'participants_m', point_budget)
+    female = downsample(df, 'participants_f', point_budget)
 
-    plt.figure(figsize=(10, 6))
+    fig = plt.figure(figsize=(10, 6))
     plt.plot(
-        df['start'],
-        df['participants_m'],
+        male['start'],
+        male['participants_m'],
         label='Male Participants',
         color='blue'
     )
     plt.plot(
-        df['start'],
-        df['participants_f'],
+        female['start'],
+        female['participants_f'],
         label='Female Participants',
         color='orange'
     )
@@ -257,26 +266,21 @@ def draw_and_save_timeseries_gender(df):
     plt.tight_layout()
 
     # 保存带有性别数据的时间序列图
-    save_dir = Path(r"C:\comp0035-2024-tutorials\src\tutorialpkg\data")
-    if not save_dir.exists():
-        save_dir.mkdir(parents=True, exist_ok=True)
-
-    fig_fp = save_dir.joinpath('timeseries_gender_plot.png')
-    plt.savefig(fig_fp)
-    print(f'带有性别参与者的时间序列图已保存至 {fig_fp}')
-    plt.show()
+    return save_and_close(fig, 'timeseries_gender_plot.png', '带有性别参与者的时间序列图已保存至', save_dir, show)
 
 
-def draw_grouped_timeseries(df, group_col, x_col, y_col):
-    """按指定列分组绘制时间序列图."""
-    df[x_col] = pd.to_datetime(df[x_col])
+def draw_grouped_timeseries(df, group_col, x_col, y_col, save_dir=None, show=True,
+                            point_budget=DEFAULT_POINT_BUDGET):
+    """按指定列分组绘制时间序列图，每组的点数超过 point_budget 时降采样."""
+    df = df.assign(**{x_col: pd.to_datetime(df[x_col])})  # 不修改传入的数据框
 
     # 按 group_col 进行分组
     grouped = df.groupby(group_col)
 
-    plt.figure(figsize=(10, 6))
+    fig = plt.figure(figsize=(10, 6))
 
     for name, group in grouped:
+        group = downsample(group, y_col, point_budget)
         plt.plot(group[x_col], group[y_col], label=name)  # 按组绘制
 
     plt.xlabel('Start Date')
@@ -287,69 +291,127 @@ def draw_grouped_timeseries(df, group_col, x_col, y_col):
     plt.tight_layout()
 
     # 保存时间序列图
-    save_dir = Path(r"C:\comp0035-2024-tutorials\src\tutorialpkg\data")
-    if not save_dir.exists():
-        save_dir.mkdir(parents=True, exist_ok=True)
-
-    fig_fp = save_dir.joinpath('timeseries_grouped_plot.png')
-    plt.savefig(fig_fp)
-    print(f'按类型分组的时间序列图已保存至 {fig_fp}')
-    plt.show()
-
-
-if __name__ == '__main__':
-    # 指定CSV文件的路径
-    csv_file_path = Path(r"C:\comp0035-2024-tutorials\src\
-                           r:tutorialpkg\data\paralympics_events_prepared.csv")
+    return save_and_close(fig, 'timeseries_grouped_plot.png', '按类型分组的时间序列图已保存至', save_dir, show)
+
+
+
+PLOT_FUNCTIONS = {func.__name__: func for func in [
+    draw_and_save_histogram,
+    draw_and_save_histogram_by_event_type,
+    draw_and_save_boxplot,
+    draw_and_save_timeseries,
+    draw_and_save_timeseries_by_event_type,
+    draw_and_save_timeseries_gender,
+    draw_grouped_timeseries,
+]}
+
+# 示例数据的全部图像，每项为一个绘图说明
+SAMPLE_PLOTS = [
+    {'plot': 'draw_and_save_histogram_by_event_type', 'event_type': 'summer',
+     'columns': ['participants_m', 'participants_f']},
+    {'plot': 'draw_and_save_histogram_by_event_type', 'event_type': 'winter',
+     'columns': ['participants_m', 'participants_f']},
+    {'plot': 'draw_and_save_boxplot', 'columns': ['participants_m', 'participants_f']},
+    {'plot': 'draw_and_save_timeseries_by_event_type', 'event_type': 'summer'},
+    {'plot': 'draw_and_save_timeseries_by_event_type', 'event_type': 'winter'},
+    {'plot': 'draw_grouped_timeseries', 'group_col': 'type', 'x_col': 'start', 'y_col': 'participants'},
+    {'plot': 'draw_and_save_timeseries_gender'},
+]
+
+
+def with_histogram_counts(df, specs):
+    """为按事件类型绘制直方图的说明一次算好分箱计数并加入说明，同一组列只计算一次.
+
+    绘图时直接使用计数，夏季和冬季的直方图都不再读取数据行，也不需要在每个工作进程中重新计算。
+
+    Args:
+        df (pd.DataFrame): 绘图的数据.
+        specs (list): 绘图说明，见 render_plots.
+
+    Returns:
+        list: 新的绘图说明，直方图的说明带有 'histograms'，其他说明不变.
+    """
+    counts = {}
+    result = []
+    for spec in specs:
+        if (spec.get('plot') == 'draw_and_save_histogram_by_event_type' and spec.get('columns')
+                and 'histograms' not in spec):
+            columns = tuple(spec['columns'])
+            if columns not in counts:
+                counts[columns] = histogram_counts(df, list(columns), group_col='type')
+            spec = {**spec, 'histograms': counts[columns]}
+        result.append(spec)
+    return result
+
+
+def _init_worker(df):
+    """在工作进程中使用不显示窗口的 Agg 后端，并保存数据框，每个进程只传一次数据."""
+    global _worker_df
+    matplotlib.use('Agg', force=True)
+    _worker_df = df
+
+
+def _render_plot(spec, save_dir):
+    """在工作进程中按绘图说明绘制一张图，返回保存的路径."""
+    kwargs = dict(spec)
+    func = PLOT_FUNCTIONS[kwargs.pop('plot')]
+    kwargs.setdefault('save_dir', save_dir)
+    return func(_worker_df, show=False, **kwargs)
+
+
+def render_plots(df, specs, save_dir=None, max_workers=None):
+    """在进程池中用 Agg 后端批量绘制图像并保存为.png文件，不显示图像.
+
+    每个绘图说明是一个字典，'plot' 为 PLOT_FUNCTIONS 中的函数名，其余的键为该函数的参数，
+    例如 {'plot': 'draw_and_save_timeseries_by_event_type', 'event_type': 'winter'}。
+    说明中可以用 'save_dir' 为单张图指定目录。每张图保存后立即关闭，内存不会随图像数量增长。
+    按事件类型绘制的直方图的分箱计数由 with_histogram_counts 在主进程中一次算好。
+
+    Args:
+        df (pd.DataFrame): 绘图的数据，每个工作进程只接收一次.
+        specs (list): 绘图说明.
+        save_dir (Path): 保存图像的目录. 默认为 DEFAULT_SAVE_DIR.
+        max_workers (int): 最多的进程数. 默认为每个 CPU 一个.
+
+    Returns:
+        list: 每个绘图说明保存的路径，按 specs 的顺序；没有绘图的说明为 None.
+    """
+    unknown = [spec.get('plot') for spec in specs if spec.get('plot') not in PLOT_FUNCTIONS]
+    if unknown:
+        raise ValueError(f"未知的绘图函数 {unknown}，可用的函数为 {list(PLOT_FUNCTIONS)}")
+    if not specs:
+        return []
+
+    specs = with_histogram_counts(df, specs)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(specs))
+    # 每次向进程发送多张图的说明，减少进程间通信
+    chunksize = max(1, len(specs) // (max_workers * 4))
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(df,)) as executor:
+        return list(executor.map(_render_plot, specs, [save_dir] * len(specs), chunksize=chunksize))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='绘制并保存残奥会数据的图像.')
+    parser.add_argument('--data', type=Path, default=PREPARED_CSV_PATH, help='准备好的数据 CSV 文件')
+    parser.add_argument('--output-dir', type=Path, default=DEFAULT_SAVE_DIR, help='保存图像的目录')
+    parser.add_argument('--show', action='store_true', help='逐张绘制并显示图像，而不是在进程池中批量绘制')
+    parser.add_argument('--workers', type=int, default=None, help='批量绘制的进程数')
+    args = parser.parse_args()
+
+    if not args.data.is_file():
+        print(f"文件 {args.data} 不存在，请检查路径是否正确。")
+        return
+    df_paralympics = pd.read_csv(args.data)
 
-    if csv_file_path.is_file():
-        df_paralympics = pd.read_csv(csv_file_path)
+    if args.show:
+        # 逐张绘制、保存并显示图像
+        for spec in with_histogram_counts(df_paralympics, SAMPLE_PLOTS):
+            kwargs = dict(spec)
+            PLOT_FUNCTIONS[kwargs.pop('plot')](df_paralympics, save_dir=args.output_dir, **kwargs)
+    else:
+        paths = render_plots(df_paralympics, SAMPLE_PLOTS, save_dir=args.output_dir, max_workers=args.workers)
+        print(f'已批量保存 {sum(path is not None for path in paths)} 张图像至 {args.output_dir}')
 
 
 if __name__ == '__main__':
-    # 指定CSV文件的路径
-    csv_file_path = Path(r"C:\comp0035-2024-tutorials\src\
-                           r:tutorialpkg\data\paralympics_events_prepared.csv")
-
-    if csv_file_path.is_file():
-        df_paralympics = pd.read_csv(csv_file_path)
-
-        # 绘制并保存 summer 事件的直方图
-        draw_and_save_histogram_by_event_type(
-            df_paralympics,
-            'summer',
-            columns=['participants_m', 'participants_f']
-        )
-
-        # 绘制并保存 winter 事件的直方图
-        draw_and_save_histogram_by_event_type(
-            df_paralympics,
-            'winter',
-            columns=['participants_m', 'participants_f']
-        )
-
-        # 绘制并保存箱线图
-        draw_and_save_boxplot(
-            df_paralympics,
-            columns=['participants_m', 'participants_f']
-        )
-
-        # 绘制并保存 summer 和 winter 事件的时间序列图
-        draw_and_save_timeseries_by_event_type(df_paralympics, 'summer')
-        draw_and_save_timeseries_by_event_type(df_paralympics, 'winter')
-
-        # 绘制按事件类型分组的时间序列图
-        draw_grouped_timeseries(
-            df_paralympics,
-            'type',
-            'start',
-            'participants'
-        )
-        # 绘制并保存带有性别的时间序列图
-        draw_and_save_timeseries_gender(df_paralympics)
-
-        # 显示绘制的图像
-        plt.show()
-
-    else:
-        print(f"文件 {csv_file_path} 不存在，请检查路径是否正确。")
+    main()
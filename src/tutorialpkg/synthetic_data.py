@@ -0,0 +1,409 @@
+"""Generate synthetic paralympics data in the format of paralympics_all.xlsx, at any scale.
+
+The real data has a few dozen events, about 800 medal standings rows and about 230 NPC codes, which is too little to
+measure the performance of the data preparation and database code. The generator writes the same three tables with the
+same columns and quirks, scaled up by a factor:
+
+- npc_codes: code, name, region, sub_region, member_type and notes, with some missing values.
+- events: one summer and one winter event each year from 1960, with some events in more than one host city. The
+  'host' and 'country' columns then hold comma-separated values, the nth host in the nth country. The 'disabilities'
+  column is a comma-separated list and the dates are written as dd/mm/YYYY in CSV files.
+- medal_standings: rows keyed by Year, matched to the events by year as in the real data, with the Location taken
+  from the first host of the year's first event. Tied teams share a rank and a few rows have no rank.
+
+Every host country and medal NPC is in npc_codes, so the tables load into the database with create_query_db.create_db.
+The event dates must have four digit years, so there are at most MAX_EVENTS events. Above that the medal table keeps
+growing by adding more teams to each year.
+
+The tables are generated and written a chunk at a time, so a 10^7 row medal table is never all in memory. CSV and
+Parquet files are written to a directory, with one file per table, and xlsx to a single workbook with a sheet per table.
+
+Example:
+    data_path = generate_dataset(Path('synthetic'), scale=100, file_format='parquet')
+    cur, conn = create_db(data_path, Path('synthetic.db'), bulk=True)
+"""
+import argparse
+import string
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from tutorialpkg.xlsx_export import append_chunks
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Size of each table in the real data, multiplied by the scale factor
+BASE_EVENTS = 32
+BASE_MEDAL_ROWS = 817
+BASE_NPCS = 232
+
+FIRST_YEAR = 1960
+LAST_YEAR = 9999
+MAX_EVENTS = 2 * (LAST_YEAR - FIRST_YEAR + 1)
+
+# The largest number of data rows in an xlsx sheet, one row is needed for the column names
+XLSX_MAX_ROWS = 1_048_575
+
+FILE_FORMATS = ['csv', 'parquet', 'xlsx']
+
+# The columns of each table and their types, used to keep the types the same in every chunk
+TABLE_COLUMNS = {
+    'events': {
+        'type': 'str', 'year': 'int', 'country': 'str', 'host': 'str', 'start': 'date', 'end': 'date',
+        'disabilities': 'str', 'countries': 'float', 'events': 'float', 'sports': 'int', 'participants_m': 'float',
+        'participants_f': 'float', 'participants': 'float', 'highlights': 'str', 'url': 'str',
+    },
+    'medal_standings': {
+        'Location': 'str', 'Year': 'int', 'Rank': 'float', 'Team': 'str', 'NPC': 'str', 'Gold': 'int',
+        'Silver': 'int', 'Bronze': 'int', 'Total': 'int',
+    },
+    'npc_codes': {
+        'code': 'str', 'name': 'str', 'region': 'str', 'sub_region': 'str', 'member_type': 'str', 'notes': 'str',
+    },
+}
+
+DISABILITIES = ['Spinal injury', 'Amputee', 'Vision Impairment', 'Cerebral Palsy', 'Les Autres',
+                'Intellectual Disability']
+REGIONS = ['Europe', 'Africa', 'Asia', 'America', 'Oceania']
+SUB_REGIONS = ['North, South, West', 'East', 'Carribean, Central', 'West, Central', 'South, South-East', 'Oceania',
+               'South', 'West', 'Central, East', 'North']
+MEMBER_TYPES = ['country', 'dissolved', 'construct', 'team']
+NAME_SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ten', 'vo', 'sha', 'nu', 'bel', 'da', 'ri', 'ga', 'sto', 'lin', 'mar', 'zu',
+                  'po', 'ven', 'tha', 'cor']
+HIGHLIGHTS = ['Record number of athletes took part', 'First Games held in the same venues as the Olympic Games',
+              'New sport added to the programme', 'Ticket sales exceeded all previous Games']
+
+
+def _bijective_words(indices, alphabet, min_length):
+    """Turn integers into distinct words made from the alphabet, at least min_length symbols long.
+
+    Words of min_length symbols are used for the first len(alphabet) ** min_length integers, then longer words, so
+    every integer gets a different word, e.g. 0 -> 'AAA' and 17576 -> 'AAAA' with the letters A-Z and a length of 3.
+    """
+    base = len(alphabet)
+    symbols = np.array(alphabet, dtype=object)
+    indices = np.asarray(indices, dtype=np.int64)
+    # Find the length of each word, then the offset of the index from the first word of that length
+    length = np.full(len(indices), min_length)
+    offset = indices.copy()
+    block = base ** min_length
+    while (offset >= block).any():
+        longer = offset >= block
+        offset[longer] -= block
+        length[longer] += 1
+        block *= base
+    words = np.full(len(indices), '', dtype=object)
+    for position in range(length.max(initial=min_length)):
+        has_symbol = position < length
+        words[has_symbol] = symbols[offset[has_symbol] % base] + words[has_symbol]
+        offset //= base
+    return words
+
+
+def npc_code_values(indices):
+    """Return the NPC code for each index, three letters for the first 17,576 NPCs and four or more after that."""
+    return _bijective_words(indices, list(string.ascii_uppercase), 3)
+
+
+def npc_name_values(indices):
+    """Return a distinct made up country name for each NPC index, e.g. 'Kalomi' or 'Republic of Kalora'."""
+    names = np.array([name.capitalize() for name in _bijective_words(indices, NAME_SYLLABLES, 2)], dtype=object)
+    republics = np.asarray(indices) % 20 == 7
+    names[republics] = 'Republic of ' + names[republics]
+    return names
+
+
+def table_sizes(scale=1, n_events=None, n_medal_rows=None, n_npcs=None):
+    """Return the number of rows in each table for a scale factor, with any sizes given replacing the scaled ones.
+
+    Args:
+        scale (float): Multiplies the number of rows in each table of the real data. Default is 1.
+        n_events (int): Number of events. Default is the scaled number of events, up to MAX_EVENTS.
+        n_medal_rows (int): Number of medal standings rows. Default is the scaled number of rows.
+        n_npcs (int): Number of NPC codes. Default is the scaled number of codes.
+
+    Returns:
+        dict: The number of rows for each table name.
+
+    Raises:
+        ValueError: If the sizes cannot be generated, e.g. more medal rows in a year than there are NPCs.
+    """
+    sizes = {
+        'events': n_events if n_events is not None else min(max(round(BASE_EVENTS * scale), 1), MAX_EVENTS),
+        'medal_standings': n_medal_rows if n_medal_rows is not None else round(BASE_MEDAL_ROWS * scale),
+        'npc_codes': n_npcs if n_npcs is not None else max(round(BASE_NPCS * scale), 1),
+    }
+    if not 1 <= sizes['events'] <= MAX_EVENTS:
+        raise ValueError(f"The number of events must be between 1 and {MAX_EVENTS}, got {sizes['events']}.")
+    if sizes['npc_codes'] < 1:
+        raise ValueError('There must be at least one NPC.')
+    n_years = (sizes['events'] + 1) // 2
+    if sizes['medal_standings'] > n_years * sizes['npc_codes']:
+        raise ValueError(f"{sizes['medal_standings']} medal rows need more than the {sizes['npc_codes']} NPCs in each "
+                         f"of the {n_years} years. Increase the number of NPCs.")
+    return sizes
+
+
+def generate_npc_chunk(start, stop, rng):
+    """Generate the npc_codes rows with index start up to stop."""
+    indices = np.arange(start, stop)
+    n = len(indices)
+    return pd.DataFrame({
+        'code': npc_code_values(indices),
+        'name': npc_name_values(indices),
+        'region': np.where(rng.random(n) < 0.005, None, rng.choice(REGIONS, n)),
+        'sub_region': np.where(rng.random(n) < 0.04, None, rng.choice(SUB_REGIONS, n)),
+        'member_type': rng.choice(MEMBER_TYPES, n, p=[0.94, 0.035, 0.02, 0.005]),
+        'notes': np.where(rng.random(n) < 0.03, 'Competed under a different code before 1992', None),
+    })
+
+
+def generate_host_countries(n_events, n_npcs, rng):
+    """Choose the hosts and their countries. Returns the host names and the NPC index of the country of each host.
+
+    Some cities host more than once, as Tokyo and Innsbruck do in the real data, so there are fewer hosts than events.
+    """
+    n_hosts = max(n_events * 3 // 4, 1)
+    host_names = np.array([f'City {name.capitalize()}' for name in _bijective_words(np.arange(n_hosts),
+                                                                                     NAME_SYLLABLES, 2)])
+    return host_names, rng.integers(0, n_npcs, n_hosts)
+
+
+def generate_event_chunk(start, stop, host_names, host_countries, rng):
+    """Generate the events rows with index start up to stop, a summer and a winter event each year."""
+    indices = np.arange(start, stop)
+    n = len(indices)
+    years = FIRST_YEAR + indices // 2
+    types = np.where(indices % 2 == 0, 'summer', 'winter')
+
+    # One host for most events and two for a few, joined with commas. The nth host is in the nth country.
+    first_host = rng.integers(0, len(host_names), n)
+    second_host = np.where(rng.random(n) < 0.05, rng.integers(0, len(host_names), n), -1)
+    second_host[second_host == first_host] = -1
+    has_second = second_host >= 0
+    hosts = host_names[first_host].astype(object)
+    countries = npc_name_values(host_countries[first_host])
+    hosts[has_second] = hosts[has_second] + ', ' + host_names[second_host[has_second]]
+    countries[has_second] = countries[has_second] + ', ' + npc_name_values(host_countries[second_host[has_second]])
+
+    # Summer events start from June to September and winter events from January to March
+    day_of_year = np.where(types == 'summer', rng.integers(152, 270, n), rng.integers(10, 90, n))
+    start_dates = (years - 1970).astype('datetime64[Y]').astype('datetime64[D]') + day_of_year
+    end_dates = start_dates + rng.integers(5, 14, n)
+
+    n_disabilities = np.minimum(1 + (indices // 8), len(DISABILITIES))
+    n_disabilities = np.minimum(n_disabilities, rng.integers(1, len(DISABILITIES) + 1, n) + 3)
+    disability_lists = np.array([', '.join(DISABILITIES[:k]) for k in range(len(DISABILITIES) + 1)], dtype=object)
+
+    participants_m = rng.integers(50, 3000, n).astype(float)
+    participants_f = np.round(participants_m * rng.uniform(0.2, 0.8, n))
+    participants = participants_m + participants_f
+
+    def with_missing(values, fraction):
+        values = values.astype(float)
+        values[rng.random(n) < fraction] = np.nan
+        return values
+
+    first_host_names = pd.Series(host_names[first_host])
+    return pd.DataFrame({
+        'type': types,
+        'year': years,
+        'country': countries,
+        'host': hosts,
+        'start': start_dates.astype('datetime64[s]'),
+        'end': end_dates.astype('datetime64[s]'),
+        'disabilities': disability_lists[n_disabilities],
+        'countries': with_missing(rng.integers(10, 180, n), 0.06),
+        'events': with_missing(rng.integers(50, 1000, n), 0.03),
+        'sports': rng.integers(2, 23, n),
+        'participants_m': with_missing(participants_m, 0.09),
+        'participants_f': with_missing(participants_f, 0.09),
+        'participants': with_missing(participants, 0.06),
+        'highlights': np.where(rng.random(n) < 0.06, None, rng.choice(HIGHLIGHTS, n)),
+        'url': ('https://www.paralympic.org/' + first_host_names.str.lower().str.replace(' ', '-') + '-'
+                + pd.Series(years).astype(str)).to_numpy(),
+    })
+
+
+def medal_rows_per_year(n_medal_rows, n_years):
+    """Share the medal standings rows between the years as evenly as possible. Returns the rows for each year."""
+    rows = np.full(n_years, n_medal_rows // n_years, dtype=np.int64)
+    rows[:n_medal_rows % n_years] += 1
+    return rows
+
+
+def generate_medal_chunk(years, rows, locations, n_npcs, rng):
+    """Generate the medal standings rows for some of the years.
+
+    Each year has a different set of teams, taken from the NPCs starting at a random one, so a team appears at most once
+    a year. The teams are ranked on gold, then silver, then bronze medals and tied teams share a rank.
+
+    Args:
+        years (np.ndarray): The years.
+        rows (np.ndarray): The number of rows for each year.
+        locations (np.ndarray): The location of each year.
+        n_npcs (int): The number of NPCs.
+        rng (np.random.Generator): Random number generator.
+    """
+    total_rows = rows.sum()
+    year_index = np.repeat(np.arange(len(years)), rows)
+    # Position of each row within its year
+    position = np.arange(total_rows) - np.repeat(np.cumsum(rows) - rows, rows)
+    npc = (np.repeat(rng.integers(0, n_npcs, len(years)), rows) + position) % n_npcs
+
+    # Teams higher up the table win more medals
+    scale = 40.0 / (position + 1) ** 0.8
+    gold = rng.poisson(scale)
+    silver = rng.poisson(scale)
+    bronze = rng.poisson(scale * 1.1)
+
+    order = np.lexsort((-bronze, -silver, -gold, year_index))
+    year_index, npc, gold, silver, bronze = (a[order] for a in (year_index, npc, gold, silver, bronze))
+    position = np.arange(total_rows)
+    new_year = np.r_[True, year_index[1:] != year_index[:-1]]
+    new_rank = new_year | np.r_[True, (gold[1:] != gold[:-1]) | (silver[1:] != silver[:-1])
+                                | (bronze[1:] != bronze[:-1])]
+    year_start = np.maximum.accumulate(np.where(new_year, position, 0))
+    rank_start = np.maximum.accumulate(np.where(new_rank, position, 0))
+    rank = (rank_start - year_start + 1).astype(float)
+    rank[rng.random(total_rows) < 0.001] = np.nan
+
+    return pd.DataFrame({
+        'Location': locations[year_index],
+        'Year': years[year_index],
+        'Rank': rank,
+        'Team': npc_name_values(npc),
+        'NPC': npc_code_values(npc),
+        'Gold': gold,
+        'Silver': silver,
+        'Bronze': bronze,
+        'Total': gold + silver + bronze,
+    })
+
+
+def parquet_schema(table_name):
+    """Return the pyarrow schema for a table, so every chunk is written with the same column types."""
+    types = {'str': pa.string(), 'int': pa.int64(), 'float': pa.float64(), 'date': pa.timestamp('s')}
+    return pa.schema([(col, types[kind]) for col, kind in TABLE_COLUMNS[table_name].items()])
+
+
+def write_csv_chunks(path, table_name, chunks):
+    """Write the chunks of a table to a CSV file, with the dates written as dd/mm/YYYY."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, header=i == 0, index=False, date_format='%d/%m/%Y',
+                         columns=list(TABLE_COLUMNS[table_name]))
+
+
+def write_parquet_chunks(path, table_name, chunks):
+    """Write the chunks of a table to a Parquet file, one row group per chunk."""
+    schema = parquet_schema(table_name)
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def write_xlsx_chunks(workbook, table_name, chunks):
+    """Add a sheet for a table to a write-only openpyxl workbook, with the dates formatted as dd/mm/YYYY."""
+    number_formats = {col: 'dd/mm/yyyy' for col, kind in TABLE_COLUMNS[table_name].items() if kind == 'date'}
+    append_chunks(workbook, chunks, table_name, columns=list(TABLE_COLUMNS[table_name]), number_formats=number_formats)
+
+
+def generate_dataset(output_path, scale=1, file_format='csv', n_events=None, n_medal_rows=None, n_npcs=None,
+                     seed=0, chunksize=100_000):
+    """Generate the synthetic npc_codes, events and medal_standings tables and write them to disk.
+
+    Args:
+        output_path (Path): Directory for the CSV or Parquet files, or the xlsx file to write.
+        scale (float): Multiplies the number of rows in each table of the real data. Default is 1.
+        file_format (str): One of 'csv', 'parquet' or 'xlsx'. Default is 'csv'.
+        n_events (int): Number of events, replacing the scaled number. Default is None.
+        n_medal_rows (int): Number of medal standings rows, replacing the scaled number. Default is None.
+        n_npcs (int): Number of NPC codes, replacing the scaled number. Default is None.
+        seed (int): Seed for the random number generator, the same seed gives the same data. Default is 0.
+        chunksize (int): Number of rows to generate and write at a time. Default is 100,000.
+
+    Returns:
+        Path: The path to pass to create_query_db.create_db as the data path.
+
+    Raises:
+        ValueError: If the format is not known, a table is too large for an xlsx sheet or the sizes are not valid.
+    """
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"Unknown file format '{file_format}', expected one of {FILE_FORMATS}.")
+    if file_format == 'parquet' and pq is None:
+        raise ValueError('pyarrow is needed to write Parquet files.')
+    sizes = table_sizes(scale, n_events, n_medal_rows, n_npcs)
+    if file_format == 'xlsx' and max(sizes.values()) > XLSX_MAX_ROWS:
+        raise ValueError(f'An xlsx sheet holds at most {XLSX_MAX_ROWS} rows, use csv or parquet for {sizes}.')
+
+    rng = np.random.default_rng(seed)
+    output_path = Path(output_path)
+    n_npcs = sizes['npc_codes']
+    host_names, host_countries = generate_host_countries(sizes['events'], n_npcs, rng)
+
+    # The events are needed to find the year and location of the medal rows. There are at most MAX_EVENTS, so they
+    # are kept in memory.
+    events_df = pd.concat([generate_event_chunk(start, min(start + chunksize, sizes['events']), host_names,
+                                                host_countries, rng)
+                           for start in range(0, sizes['events'], chunksize)], ignore_index=True)
+    first_events = events_df.drop_duplicates('year')
+    years = first_events['year'].to_numpy()
+    locations = first_events['host'].str.split(',').str[0].str.strip().to_numpy()
+    rows = medal_rows_per_year(sizes['medal_standings'], len(years))
+
+    def npc_chunks():
+        for start in range(0, n_npcs, chunksize):
+            yield generate_npc_chunk(start, min(start + chunksize, n_npcs), rng)
+
+    def medal_chunks():
+        # Group whole years into chunks of about chunksize rows
+        chunk_ids = (np.cumsum(rows) - 1) // chunksize
+        for chunk_id in np.unique(chunk_ids):
+            in_chunk = chunk_ids == chunk_id
+            yield generate_medal_chunk(years[in_chunk], rows[in_chunk], locations[in_chunk], n_npcs, rng)
+
+    tables = {'npc_codes': npc_chunks(), 'events': [events_df], 'medal_standings': medal_chunks()}
+    if file_format == 'xlsx':
+        from openpyxl import Workbook
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        workbook = Workbook(write_only=True)
+        for table_name in ['events', 'medal_standings', 'npc_codes']:
+            write_xlsx_chunks(workbook, table_name, tables[table_name])
+        workbook.save(output_path)
+    else:
+        output_path.mkdir(parents=True, exist_ok=True)
+        for table_name, chunks in tables.items():
+            table_path = output_path.joinpath(f'{table_name}.{file_format}')
+            if file_format == 'csv':
+                write_csv_chunks(table_path, table_name, chunks)
+            else:
+                write_parquet_chunks(table_path, table_name, chunks)
+
+    print(f"Generated {sizes} rows as {file_format} in '{output_path}'.")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic paralympics data set at a chosen scale.')
+    parser.add_argument('output_path', type=Path, help='Directory for csv or parquet files, or the xlsx file')
+    parser.add_argument('--scale', type=float, default=1, help='Multiplies the size of the real data, default 1')
+    parser.add_argument('--format', dest='file_format', choices=FILE_FORMATS, default='csv')
+    parser.add_argument('--events', dest='n_events', type=int, help='Number of events')
+    parser.add_argument('--medal-rows', dest='n_medal_rows', type=int, help='Number of medal standings rows')
+    parser.add_argument('--npcs', dest='n_npcs', type=int, help='Number of NPC codes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    args = parser.parse_args()
+    generate_dataset(**vars(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,63 +2,66 @@
 
 Introduced smaller functions to some aspects to allow for more tests.
 """
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from contextlib import redirect_stdout
 from pathlib import Path
 
 import pandas as pd
 
+from tutorialpkg.country_names import CountryIndex, load_aliases
+from tutorialpkg.data_utils import to_nullable_integers
+from tutorialpkg.profiling import print_profile, profile_dataframe, save_profile
+from tutorialpkg.xlsx_export import write_xlsx_chunks
 
-def describe_dataframe(df, output_file):
+# Larger dataframes are streamed to .xlsx files rather than built in memory by DataFrame.to_excel
+XLSX_STREAM_MIN_ROWS = 50_000
+
+
+def describe_dataframe(df, output_file, json_file=None):
     """ Description of the contents of the data using Pandas dataframe functions.
 
-            Read the data from the file and perform the following operations:
-            - Display the first 5 rows of the dataframe
-            - Display the shape of the dataframe
-            - Display the column names
-            - Display the data types of the columns
-            - Display summary statistics
-            - Display any missing values in the dataframe
+            Profile the data in one pass with profile_dataframe and write:
+            - The shape of the dataframe
+            - The first and last 5 rows of the dataframe
+            - The column names, data types, non-null and null counts
+            - Summary statistics
+            - The number of rows with missing values
 
         Args:
            output_file (Path) : Filepath of the file to save the description to
            df (DataFrame) : Pandas dataframe with the data in
+           json_file (Path) : Filepath to also save the profile to as JSON. Default is None.
+
+        Returns:
+            profile (dict): The profile of the data
     """
+    profile = profile_dataframe(df)
     with open(output_file, mode='w', encoding='UTF-8') as output:
         with redirect_stdout(output):
-            print("\nShape of the dataframe:")
-            print(df.shape)
-            print("First 5 rows of the dataframe:")
-            print(df.head())
-            print("Last 5 rows of the dataframe:")
-            print(df.tail())
-            print("\nColumn names:")
-            print(df.columns)
-            print("\nData types of the columns:")
-            print(df.dtypes)
-            print("\nSummary statistics:")
-            print(df.describe())
-            print("Rows with missing values:")
-            print(df[df.isna().any(axis=1)])
-            print("\nColumns with missing values:")
-            print(df.isnull().sum())
+            print_profile(profile)
+    if json_file is not None:
+        save_profile(profile, json_file)
+    return profile
 
 
 def convert_float_to_int(df):
-    """Convert float64 columns to int.
+    """Convert float64 columns that only hold whole numbers to the smallest nullable integer type.
+
+    All the columns are converted together by to_nullable_integers. Missing values become <NA>, they are not replaced
+    with 0.
 
     Args:
         df (DataFrame): DataFrame with float64 columns to be converted.
 
     Returns:
-        DataFrame: DataFrame with float64 columns converted to int.
+        DataFrame: DataFrame with float64 columns converted to nullable integer types, e.g. UInt16.
     """
     float_columns = df.select_dtypes(include=['float64']).columns
-    for col in float_columns:
-        try:
-            df[col] = df[col].astype('int')
-        except ValueError as e:
-            print(f"Error converting column {col} to int: {e}")
-    return df
+    integer_arrays = to_nullable_integers(df, float_columns)
+    for col in float_columns.difference(list(integer_arrays)):
+        print(f"Column {col} has values that are not whole numbers, it is left as float64.")
+    return df.assign(**integer_arrays)
 
 
 def convert_to_datetime(df, columns, date_format='%d/%m/%Y'):
@@ -91,30 +94,110 @@ def add_duration_column(df, start_col, end_col):
     return df
 
 
-def save_dataframe_to_file(df, file_path, file_type):
+def write_csv(df, file_path, compression=None):
+    """Write a CSV file, compressed with e.g. 'gzip' or 'zstd' if compression is given."""
+    df.to_csv(file_path, index=False, compression=compression)
+
+
+def write_xlsx(df, file_path, compression=None):
+    """Write an Excel file. The compression is ignored as .xlsx files are already zip files.
+
+    Dataframes with more than XLSX_STREAM_MIN_ROWS rows are streamed with write_xlsx_chunks, which converts and writes
+    the rows a batch at a time, so the memory used does not grow with the number of rows. It carries on in a new sheet
+    after 1,048,576 rows, but does not format the header row as to_excel does.
+    """
+    if len(df) > XLSX_STREAM_MIN_ROWS:
+        write_xlsx_chunks(file_path, [df])
+    else:
+        df.to_excel(file_path, index=False)
+
+
+def write_parquet(df, file_path, compression='snappy'):
+    """Write a Parquet file, compressed with 'snappy' by default, or e.g. 'zstd', 'gzip' or None."""
+    df.to_parquet(file_path, index=False, compression=compression)
+
+
+def write_feather(df, file_path, compression='lz4'):
+    """Write a Feather file, compressed with 'lz4' by default, or 'zstd' or 'uncompressed' to allow memory-mapping."""
+    df.reset_index(drop=True).to_feather(file_path, compression=compression)
+
+
+# The writer for each file type. Add to this to save other file types with save_dataframe_to_file.
+WRITERS = {
+    'csv': write_csv,
+    'xlsx': write_xlsx,
+    'parquet': write_parquet,
+    'feather': write_feather,
+}
+
+
+def save_dataframe_to_file(df, file_path, file_type, compression=None):
     """
-    Save the dataframe to a CSV and Excel file.
+    Save the dataframe to a file of the given type.
+
+    The file is written to a temporary file in the same directory and then renamed, so a reader never sees a partly
+    written file and an existing file is only replaced once the new one is complete.
+
     Args:
         df (pd.DataFrame): DataFrame to save
-        file_path (str): Path to save the CSV or XLSX file
-        file_type (str): 'csv' or 'xlsx' to specify the file type
+        file_path (str): Path to save the file to
+        file_type (str): One of the types in WRITERS e.g. 'csv', 'xlsx', 'parquet' or 'feather'
+        compression (str): Compression for the file type, e.g. 'zstd'. Default is None, the writer's default.
     Raises:
         ValueError: If an invalid file type is specified
     """
-    if file_type is 'csv':
-        df.to_csv(file_path, index=False)
-    elif file_type is 'xlsx':
-        df.to_excel(file_path, index=False)
-    else:
-        raise ValueError("Invalid file type. Please specify 'csv' or 'xlsx'.")
+    if file_type not in WRITERS:
+        raise ValueError(f"Invalid file type. Please specify one of: {', '.join(WRITERS)}.")
+    file_path = Path(file_path)
+    # Keep the suffix, pandas uses it to choose the Excel writer
+    tmp_path = file_path.with_name(f'{file_path.stem}.tmp{file_path.suffix}')
+    kwargs = {} if compression is None else {'compression': compression}
+    try:
+        WRITERS[file_type](df, tmp_path, **kwargs)
+        os.replace(tmp_path, file_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def save_dataframe_to_files(df, file_paths, compression=None, max_workers=None, use_processes=False):
+    """
+    Save the dataframe to several files at the same time, one thread or process per file.
 
+    The Parquet and Feather writers release the GIL, so threads let them run while another file is written. The CSV
+    and Excel writers hold the GIL, use processes to write those at the same time as each other. With processes the
+    dataframe is pickled and sent to each process, and writers added to WRITERS must be defined at module level.
 
-def prepare_event_data(df_raw, df_npc=None):
+    Args:
+        df (pd.DataFrame): DataFrame to save
+        file_paths (dict): The path to save to for each file type, e.g. {'csv': csv_path, 'parquet': parquet_path}
+        compression (dict): Compression for each file type, e.g. {'parquet': 'zstd'}. Default is None, the writers'
+            defaults.
+        max_workers (int): Maximum number of threads or processes. Default is one per file.
+        use_processes (bool): Write the files in a process pool instead of a thread pool. Default is False.
+    Returns:
+        list: The paths of the saved files
+    """
+    compression = compression or {}
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_class(max_workers=max_workers or len(file_paths) or 1) as executor:
+        futures = [executor.submit(save_dataframe_to_file, df, file_path, file_type, compression.get(file_type))
+                   for file_type, file_path in file_paths.items()]
+        for future in futures:
+            future.result()
+    return list(file_paths.values())
+
+
+def prepare_event_data(df_raw, df_npc=None, save=True, file_types=('csv', 'xlsx'), compression=None):
     """Prepare the event data for analysis.
 
     Args:
         df_raw: Initial dataframe with paralympics data loaded from the data file
         df_npc (DataFrame): Dataframe with paralympics country code data loaded from the data file
+        save (bool): Save the prepared data to files in the data directory. Default is True.
+        file_types (tuple): The types of file to save, written at the same time. Default is .csv and .xlsx. Add
+            'parquet' or 'feather' to save a copy that can be read without parsing the CSV file.
+        compression (dict): Compression for each file type, see save_dataframe_to_files. Default is None.
 
     Returns:
         df_prepared (DataFrame): DataFrame for use in  the project
@@ -123,17 +206,17 @@ def prepare_event_data(df_raw, df_npc=None):
     df_prepared = convert_float_to_int(df_prepared)
     df_prepared = convert_to_datetime(df_prepared, ['start', 'end'])
 
-    replacements = {
-        'UK': 'Great Britain',
-        'USA': 'United States of America',
-        'Korea': 'Republic of Korea',
-        'Russia': 'Russian Federation',
-        'China': "People's Republic of China"
-    }
-    df_prepared = df_prepared['country'] = df_prepared['country'].replace(replacements)
+    # Match the country names to NPC codes, allowing for other spellings e.g. 'UK'
+    if df_npc is not None:
+        index = CountryIndex(df_npc, load_aliases())
+    else:
+        index = CountryIndex.load()
+    codes = index.codes(df_prepared['country'])
+    df_prepared['country'] = codes.map(index.names).fillna(df_prepared['country'])
 
     if df_npc is not None:
-        df_prepared = df_prepared.merge(df_npc, left_on='country', right_on='Name', how='left')
+        # Unmatched countries have no code, so leave out any NPC rows with no code rather than join them
+        df_prepared = df_prepared.assign(Code=codes).merge(df_npc[df_npc['Code'].notna()], on='Code', how='left')
 
     cols_to_drop = ['URL', 'disabilities_included', 'highlights', 'Name']
     df_prepared = df_prepared.drop(columns=cols_to_drop)
@@ -141,9 +224,10 @@ def prepare_event_data(df_raw, df_npc=None):
     df_prepared = clean_type_column(df_prepared)
     df_prepared = add_duration_column(df_prepared, 'start', 'end')
 
-    csv_path = Path(__file__).parent.parent.joinpath("data", "paralympics_events_prepared.csv")
-    excel_path = Path(__file__).parent.parent.joinpath("data", "paralympics_events_prepared.xlsx")
-    save_dataframe_to_file(df_prepared, csv_path, file_type='csv')
-    save_dataframe_to_file(df_prepared, excel_path, file_type='xlsx')
+    if save:
+        data_dir = Path(__file__).parent.parent.joinpath("data")
+        file_paths = {file_type: data_dir.joinpath(f"paralympics_events_prepared.{file_type}")
+                      for file_type in file_types}
+        save_dataframe_to_files(df_prepared, file_paths, compression=compression)
 
     return df_prepared
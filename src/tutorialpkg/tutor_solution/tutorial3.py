@@ -8,6 +8,9 @@ from pathlib import Path
 import matplotlib.pyplot as plt
 import pandas as pd
 
+from tutorialpkg.downsample import DEFAULT_POINT_BUDGET, downsample
+from tutorialpkg.histograms import histogram_counts, plot_histograms
+
 
 def draw_sample_plot(df):
     """Draw a sample plot using pandas.plot."""
@@ -21,22 +24,26 @@ def draw_sample_plot(df):
     plt.show()
 
 
-def view_distribution(df, columns=None):
+def view_distribution(df, columns=None, cache_dir=None):
     """Draw a histogram of specified columns in the DataFrame to visualise the distribution of the
     data.
 
+    The bin counts are calculated once with numpy.histogram and cached by a fingerprint of the data, so drawing the
+    same columns again does not bin the rows again.
+
     Parameters:
         df : pd.DataFrame   The DataFrame to plot
-        columns : list      The column names to plot
+        columns : list      The column names to plot, default is all the numeric columns
+        cache_dir : Path    Directory to save the bin counts in, default is None to keep them in memory only
 
     Returns:
         None
     """
 
-    if columns:
-        df[columns].hist()
-    else:
-        df.hist()
+    if not columns:
+        columns = df.select_dtypes(include='number').columns.tolist()
+    histograms = histogram_counts(df, columns, cache_dir=cache_dir)
+    plot_histograms(histograms, columns=columns)
     plt.show()
 
 
@@ -62,16 +69,18 @@ def view_outliers(df):
     plt.show()
 
 
-def view_timeseries(df, date_column, value_column, filter_value=None):
+def view_timeseries(df, date_column, value_column, filter_value=None, point_budget=DEFAULT_POINT_BUDGET):
     """Draw a timeseries plot of the DataFrame using the specified date and value columns.
 
-    Sort the rows in date order before plotting.
+    Sort the rows in date order before plotting. Lines with more points than the point budget are downsampled to the
+    lowest and highest value in each bucket of dates, so the peaks are still drawn.
 
     Parameters:
         df : pd.DataFrame   The DataFrame to plot
         date_column : str   The column name containing the date data
         value_column : str  The column name containing the value data
         filter_value: str   The value to filter the DataFrame by
+        point_budget: int   The most points to draw for each line, None to draw them all
 
     """
 
@@ -87,8 +96,8 @@ def view_timeseries(df, date_column, value_column, filter_value=None):
     # df.plot(x=date_column, y=value_column)
 
     # This version draws one line for each 'type'
-    df_summer = df[df['type'] == 'summer']
-    df_winter = df[df['type'] == 'winter']
+    df_summer = downsample(df[df['type'] == 'summer'], value_column, point_budget)
+    df_winter = downsample(df[df['type'] == 'winter'], value_column, point_budget)
     ax = df_summer.plot(x=date_column, y=value_column, label='Summer games')
     df_winter.plot(x=date_column, y=value_column, ax=ax, label='Winter games')
     plt.xticks(rotation=90)
@@ -4,6 +4,9 @@ from pathlib import Path
 
 import pandas as pd
 
+from tutorialpkg.caching import read_sheet
+from tutorialpkg.week8_queries.create_query_db import extract_host_country_pairs, fetch_key_map
+
 
 # This is the same function as for the student database.
 def create_not_normalised_db(df, db_path, table_name):
@@ -257,27 +260,16 @@ def add_host_data(df_events, db_path):
         # Commit the changes
         connection.commit()
 
-        # Extract unique host and country pairs
-        # Initialize an empty DataFrame with the columns needed
-        host_country_df = pd.DataFrame(columns=['host', 'country'])
-        # Iterate over each row in the events DataFrame and split each column into multiple values where there is ','
-        for index, row in df_events.iterrows():
-            hosts = row['host'].split(',')
-            countries = row['country'].split(',')
-            # Create pairs of each host with each country and append to the DataFrame
-            for host, country in zip(hosts, countries):
-                new_row = pd.DataFrame({'host': [host.strip()], 'country': [country.strip()]})
-                host_country_df = pd.concat([host_country_df, new_row], ignore_index=True)
-        # Remove duplicate hosts from the dataframe
-        host_country_df = host_country_df.drop_duplicates(subset=['host', 'country'])
+        # Extract unique host and country pairs, splitting the values where an event has more than one host
+        host_country_df = extract_host_country_pairs(df_events)
+
+        # Get all the country codes from the country table in one query
+        country_codes = fetch_key_map(cursor, 'SELECT name, code FROM country')
 
         # Iterate over the dataframe, add the host and country to the host table
         for index, row in host_country_df.iterrows():
-            # Get the country code from the country table
-            country_name = row['country']
-            select_sql = f'SELECT code from country where name="{country_name}"'
-            result = cursor.execute(select_sql).fetchone()
-            country_code = result[0]
+            # Get the country code for the country name
+            country_code = country_codes[row['country']]
             # Insert into the host table
             host = row['host']
             cursor.execute('INSERT INTO host (country_code, host) VALUES (?, ?)', (country_code, host))
@@ -323,15 +315,18 @@ def add_host_event_data(df, db_path):
         # Commit the changes
         connection.commit()
 
+        # Get the event ids, which match based on the year and type of event, and the host ids in one query each
+        event_ids = fetch_key_map(cursor, 'SELECT year, type, event_id FROM event ORDER BY event_id')
+        host_ids = fetch_key_map(cursor, 'SELECT host, host_id FROM host ORDER BY host_id')
+
         # Iterate each event, find the pairs of hosts, then get the event_id and host_id and insert into the host_event table
         for index, row in df.iterrows():
             hosts = row['host'].split(',')
-            # Find the event id for the event. This matches based on the year and type of event.
-            event_id = cursor.execute('SELECT event_id FROM event WHERE year = ? AND type = ?',
-                                      (row['year'], row['type'])).fetchone()[0]
+            # Find the event id for the event
+            event_id = event_ids[(row['year'], row['type'])]
             # Find the host_id for each host
             for host in hosts:
-                host_id = cursor.execute(f'SELECT host_id FROM host WHERE host = "{host.strip()}"').fetchall()[0][0]
+                host_id = host_ids[host.strip()]
                 # Insert the host_event pair
                 cursor.execute('INSERT INTO host_event (host_id, event_id) VALUES (?, ?)', (host_id, event_id))
 
@@ -358,8 +353,8 @@ if __name__ == '__main__':
     # Activity: Create a normalised database and add the data to the tables
     data_file_xlsx = Path(__file__).parent.parent.joinpath('data_db_activity', 'paralympics_all.xlsx')
     db_file_norm = Path(__file__).parent.parent.joinpath('data_db_activity', 'paralympics_normalised.db')
-    events_df = pd.read_excel(data_file_xlsx, sheet_name='events')
-    npc_df = pd.read_excel(data_file_xlsx, sheet_name='npc_codes')
+    events_df = read_sheet(data_file_xlsx, sheet_name='events')
+    npc_df = read_sheet(data_file_xlsx, sheet_name='npc_codes')
     # Create the normalised database structure
     create_paralympics_db_structure(db_file_norm)
     # Adding data is in a series of functions to isolate the different parts of the process
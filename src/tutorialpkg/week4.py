@@ -1,20 +1,48 @@
 import argparse
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import numpy as np
 import pandas as pd
-from datetime import datetime
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from tutorialpkg.profiling import statistics_from_csv
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def load_data(file_path: Path):
+# Columns that hold dates as text. The pyarrow CSV engine would parse ISO dates itself, so these are read as strings
+# to let check_date_format see the dates as they are written in the file.
+DATE_COLUMNS = ['start', 'end']
+
+def load_data(file_path: Path, columns=None, dtypes=None, use_arrow=True):
     """
     Load data from a CSV or Excel file.
+    Only the columns that are asked for are parsed, so a check of a few columns does not pay for parsing long text
+    columns. CSV files are read with the multi-threaded pyarrow engine into Arrow-backed columns when pyarrow is
+    installed.
     :param file_path: Path to the file.
+    :param columns: List of the columns to load. Columns that are not in the file are skipped. Default is all columns.
+    :param dtypes: Dictionary of column name to dtype, for columns where the type should not be inferred.
+    :param use_arrow: Set to False to read with the default pandas engines and NumPy dtypes. Default is True.
     :return: DataFrame containing the loaded data.
     """
+    arrow_options = {'engine': 'pyarrow', 'dtype_backend': 'pyarrow'} if use_arrow and pa is not None else {}
     if file_path.suffix == '.csv':
         try:
-            df = pd.read_csv(file_path)
+            if arrow_options:
+                dtypes = {**{column: 'string[pyarrow]' for column in DATE_COLUMNS}, **(dtypes or {})}
+            if columns is not None or dtypes is not None:
+                # The pyarrow engine needs the columns and dtypes to be in the file, so read the header first
+                header = pd.read_csv(file_path, nrows=0).columns
+                if columns is not None:
+                    columns = [column for column in header if column in columns]
+                if dtypes is not None:
+                    dtypes = {column: dtype for column, dtype in dtypes.items() if column in header}
+            df = pd.read_csv(file_path, usecols=columns, dtype=dtypes, **arrow_options)
             logging.info(f"Loaded CSV data from {file_path}")
             print(df.columns)  # Print column names to verify
             return df
@@ -22,7 +50,10 @@ def load_data(file_path: Path):
             logging.error(f"CSV file not found. Please check the file path. Error: {e}")
     elif file_path.suffix in ['.xls', '.xlsx']:
         try:
-            df = pd.read_excel(file_path)
+            # openpyxl still reads every cell, but only the selected columns are converted
+            usecols = None if columns is None else (lambda column: column in columns)
+            dtype_backend = {'dtype_backend': 'pyarrow'} if arrow_options else {}
+            df = pd.read_excel(file_path, usecols=usecols, dtype=dtypes, **dtype_backend)
             logging.info(f"Loaded Excel data from {file_path}")
             print(df.columns)  # Print column names to verify
             return df
@@ -50,6 +81,126 @@ def print_statistics(df):
         logging.info("Statistics of the dataset:")
         print(df.describe())
 
+def print_statistics_in_chunks(file_path: Path, chunksize=100_000):
+    """
+    Print the count, mean, std, min, max and null count of the numeric columns of a CSV file that may not fit in memory.
+    The file is read a chunk at a time and the statistics of the chunks combined, see profiling.StreamingStatistics.
+    :param file_path: Path to the CSV file.
+    :param chunksize: Number of rows to read at a time.
+    :return: The StreamingStatistics for the file.
+    """
+    try:
+        stats = statistics_from_csv(file_path, chunksize=chunksize)
+    except FileNotFoundError as e:
+        logging.error(f"CSV file not found. Please check the file path. Error: {e}")
+        return None
+    logging.info(f"Statistics of the dataset, {stats.rows} rows read in chunks of {chunksize}:")
+    print(stats.summary())
+    return stats
+
+def key_hashes(df, columns):
+    """
+    Hash the values in the key columns of each row in one pass.
+    :param df: DataFrame containing data.
+    :param columns: List of the key columns.
+    :return: Array with a 64-bit hash of the key of each row.
+    """
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+def canonical_keys(df, columns):
+    """
+    Convert the key columns to one form that does not depend on the dtypes pandas inferred for them.
+    pd.read_csv infers the dtypes of each chunk on its own, e.g. 'year' is int64 in one chunk and float64 in the next
+    if it has a missing value, and the same value hashes differently in different dtypes. Numbers are converted to
+    float64 and then, like every other value, to text, with missing values as 'nan' whatever the dtype of the column.
+    :param df: DataFrame containing data.
+    :param columns: List of the key columns.
+    :return: DataFrame of the key columns as object columns of strings.
+    """
+    keys = {}
+    for column in columns:
+        values = df[column]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            values = pd.Series(values.to_numpy(dtype='float64', na_value=np.nan), index=df.index)
+        keys[column] = values.astype(object).where(values.notna(), np.nan).astype(str).astype(object)
+    return pd.DataFrame(keys, index=df.index)
+
+def duplicate_key_mask(df, columns, hashes=None):
+    """
+    Find the rows whose key, the values in the key columns, appears more than once.
+    The keys are hashed and the hashes checked for duplicates with a hash table, which takes O(n) time. Rows with a
+    repeated hash are then compared on their values, so a hash collision is not reported as a duplicate.
+    :param df: DataFrame containing data.
+    :param columns: List of the key columns.
+    :param hashes: The hashes from key_hashes, if they have already been calculated.
+    :return: Boolean array, True for each row whose key is not unique.
+    """
+    if hashes is None:
+        hashes = key_hashes(df, columns)
+    duplicated = pd.Series(hashes).duplicated(keep=False).to_numpy(copy=True)
+    if duplicated.any():
+        duplicated[duplicated] = df.loc[duplicated, columns].duplicated(keep=False).to_numpy()
+    return duplicated
+
+def group_rows(keys, labels):
+    """
+    Group row labels by key without a Python loop over the rows.
+    :param keys: Array with a key for each row, e.g. its hash.
+    :param labels: Array with the index label of each row.
+    :return: Tuple of (positions of the first row of each group, list of the row labels in each group), with the
+        groups in the order they first appear.
+    """
+    codes, uniques = pd.factorize(keys)
+    order = np.argsort(codes, kind='stable')
+    ends = np.cumsum(np.bincount(codes, minlength=len(uniques)))
+    starts = np.r_[0, ends[:-1]]
+    # Slicing a list is much faster than np.split when there are millions of small groups
+    sorted_labels = labels[order].tolist()
+    return order[starts], [sorted_labels[start:end] for start, end in zip(starts.tolist(), ends.tolist())]
+
+def duplicate_key_groups(df, columns):
+    """
+    Find the groups of rows that have the same key.
+    :param df: DataFrame containing data.
+    :param columns: List of the key columns.
+    :return: List of dictionaries with the 'key', a tuple of the key values, and the 'rows' with that key.
+    """
+    hashes = key_hashes(df, columns)
+    duplicated = duplicate_key_mask(df, columns, hashes)
+    if not duplicated.any():
+        return []
+    duplicates = df.loc[duplicated, columns]
+    first_rows, groups = group_rows(hashes[duplicated], duplicates.index.to_numpy())
+    keys = zip(*(duplicates[column].iloc[first_rows].tolist() for column in columns))
+    return [{'key': key, 'rows': rows} for key, rows in zip(keys, groups)]
+
+def duplicate_key_groups_in_chunks(chunks, columns):
+    """
+    Find the groups of rows that have the same key in data read in chunks, e.g. pd.read_csv with a chunksize.
+    Only the hash and index of each row are kept, 16 bytes a row, so duplicates are found across chunks without
+    holding all the data in memory. The keys are hashed in the form given by canonical_keys, so a key is found in
+    chunks where pandas inferred different dtypes for its columns. Rows are grouped by the hash of their key, so unlike
+    duplicate_key_groups a hash collision would be reported as a duplicate; with a 64-bit hash this is very unlikely
+    below billions of rows.
+    :param chunks: Iterable of DataFrames. Their index labels are used as the row indices so should not overlap.
+    :param columns: List of the key columns.
+    :return: List of dictionaries with the 'rows' that have the same key.
+    """
+    hashes = []
+    labels = []
+    for chunk in chunks:
+        hashes.append(key_hashes(canonical_keys(chunk, columns), columns))
+        labels.append(chunk.index.to_numpy())
+    if not hashes:
+        return []
+    hashes = np.concatenate(hashes)
+    labels = np.concatenate(labels)
+    duplicated = pd.Series(hashes).duplicated(keep=False).to_numpy()
+    if not duplicated.any():
+        return []
+    first_rows, groups = group_rows(hashes[duplicated], labels[duplicated])
+    return [{'rows': rows} for rows in groups]
+
 def check_unique_values(df, columns):
     """
     Check if the specified columns have unique values.
@@ -59,14 +210,34 @@ def check_unique_values(df, columns):
     if df is not None:
         for column in columns:
             if column in df.columns:
-                if df[column].is_unique:
+                duplicated = duplicate_key_mask(df, [column])
+                if not duplicated.any():
                     logging.info(f"Column '{column}' has unique values.")
                 else:
-                    duplicate_values = df[df.duplicated([column], keep=False)][column]
-                    logging.warning(f"Column '{column}' does not have unique values. Duplicates at rows: {duplicate_values.index.tolist()}")
+                    logging.warning(f"Column '{column}' does not have unique values. Duplicates at rows: {df.index[duplicated].tolist()}")
             else:
                 logging.error(f"Column '{column}' not found in the dataset.")
 
+def check_unique_key(df, columns):
+    """
+    Check if the combination of the specified columns is unique, e.g. an event is identified by its year and type.
+    :param df: DataFrame containing data.
+    :param columns: List of the columns in the key.
+    :return: List of the duplicate groups, see duplicate_key_groups.
+    """
+    if df is not None:
+        missing = [column for column in columns if column not in df.columns]
+        if missing:
+            logging.error(f"Columns {missing} not found in the dataset.")
+            return None
+        groups = duplicate_key_groups(df, columns)
+        if groups:
+            for group in groups:
+                logging.warning(f"Key {tuple(columns)} = {group['key']} is not unique. Duplicates at rows: {group['rows']}")
+        else:
+            logging.info(f"Key {tuple(columns)} has unique values.")
+        return groups
+
 def check_null_values(df, columns):
     """
     Check if the specified columns have any null values.
@@ -85,54 +256,247 @@ def check_null_values(df, columns):
             else:
                 logging.error(f"Column '{column}' not found in the dataset.")
 
+def parse_date_column(series, date_format="%d/%m/%Y"):
+    """
+    Parse a column of dates in one go with a strict format.
+    :param series: Series of date strings, or of dates if the data came from an Excel file.
+    :param date_format: Expected date format.
+    :return: Series of datetimes, NaT where the value is missing or does not match the format.
+    """
+    return pd.to_datetime(series, format=date_format, errors='coerce')
+
 def check_date_format(df, columns, date_format="%d/%m/%Y"):
     """
     Check if the specified date columns match the given format.
+    Each column is parsed once with pandas rather than calling strptime on every value.
     :param df: DataFrame containing data.
     :param columns: List of date columns to check.
     :param date_format: Expected date format.
+    :return: Dictionary of column name to an array of the row indices with dates that do not match the format.
     """
     if df is not None:
+        errors = {}
         for column in columns:
             if column in df.columns:
-                for index, value in df[column].items():
-                    try:
-                        datetime.strptime(value, date_format)
-                    except ValueError:
-                        logging.error(f"Date format error in column '{column}' at row {index}: '{value}' does not match format {date_format}")
+                invalid = parse_date_column(df[column], date_format).isna()
+                errors[column] = df.index[invalid].to_numpy()
+                for index, value in df.loc[invalid, column].items():
+                    logging.error(f"Date format error in column '{column}' at row {index}: '{value}' does not match format {date_format}")
             else:
                 logging.error(f"Column '{column}' not found in the dataset.")
+        return errors
 
 def check_duration(df):
     """
     Check if the 'duration' column is equal to the difference between 'end' and 'start'.
+    The dates are parsed once per column and the expected durations are calculated for all rows at once.
     :param df: DataFrame containing data.
+    :return: Array of the row indices where the duration is wrong or a date could not be parsed.
     """
     if df is not None:
         if 'start' in df.columns and 'end' in df.columns and 'duration' in df.columns:
-            for index, row in df.iterrows():
-                try:
-                    start_date = datetime.strptime(row['start'], "%d/%m/%Y")
-                    end_date = datetime.strptime(row['end'], "%d/%m/%Y")
-                    expected_duration = (end_date - start_date).days
-                    if row['duration'] != expected_duration:
-                        logging.error(f"Duration error at row {index}: Expected {expected_duration}, found {row['duration']}")
-                except ValueError as e:
-                    logging.error(f"Date parsing error at row {index}: {e}")
+            start_dates = parse_date_column(df['start'])
+            end_dates = parse_date_column(df['end'])
+            unparsed = start_dates.isna() | end_dates.isna()
+            # Report the start date if it is the one that could not be parsed, otherwise the end date
+            unparsed_values = df['start'].where(start_dates.isna(), df['end'])[unparsed]
+            for index, value in unparsed_values.items():
+                logging.error(f"Date parsing error at row {index}: time data '{value}' does not match format '%d/%m/%Y'")
+
+            expected_durations = (end_dates - start_dates).dt.days
+            wrong = ~unparsed & (df['duration'] != expected_durations)
+            for index, expected, found in zip(df.index[wrong], expected_durations[wrong], df.loc[wrong, 'duration']):
+                logging.error(f"Duration error at row {index}: Expected {int(expected)}, found {found}")
+            return df.index[unparsed | wrong].to_numpy()
         else:
             logging.error("Columns 'start', 'end', or 'duration' not found in the dataset.")
 
-def check_column_constraints(df):
+# Constraints checked by check_column_constraints. Each has a 'check', one of the keys in CONSTRAINT_RULES, and the
+# arguments for that check. A check with 'columns' is applied to each of the columns in turn.
+DEFAULT_CONSTRAINTS = [
+    {'check': 'unique', 'columns': ['event_code', 'year', 'country', 'host']},
+    {'check': 'unique_key', 'key': ['year', 'type']},
+    {'check': 'not_null', 'columns': ['type', 'year', 'country', 'host', 'start', 'end', 'duration', 'Code']},
+    {'check': 'date_format', 'columns': ['start', 'end'], 'date_format': '%d/%m/%Y'},
+    {'check': 'duration', 'start': 'start', 'end': 'end', 'duration': 'duration'},
+    {'check': 'sum', 'total': 'participants', 'parts': ['participants_m', 'participants_f']},
+    {'check': 'range', 'columns': ['year'], 'min_value': 1960},
+    {'check': 'range', 'columns': ['duration', 'countries', 'events', 'sports', 'participants_m', 'participants_f',
+                                   'participants'], 'min_value': 0},
+]
+
+def not_null_rule(df, dates, column):
+    """Rows where the column is null."""
+    return df[column].isna()
+
+def unique_rule(df, dates, column):
+    """Rows with a value that appears more than once in the column."""
+    return pd.Series(duplicate_key_mask(df, [column]), index=df.index)
+
+def unique_key_rule(df, dates, key):
+    """Rows with a combination of values in the key columns that appears more than once."""
+    return pd.Series(duplicate_key_mask(df, key), index=df.index)
+
+def date_format_rule(df, dates, column, date_format="%d/%m/%Y"):
+    """Rows where the column is not a date in the format."""
+    return dates[(column, date_format)].isna()
+
+def duration_rule(df, dates, start, end, duration, date_format="%d/%m/%Y"):
+    """Rows where the duration is not the number of days from start to end. Rows with unparsed dates are skipped."""
+    expected_durations = (dates[(end, date_format)] - dates[(start, date_format)]).dt.days
+    return expected_durations.notna() & (df[duration] != expected_durations)
+
+def sum_rule(df, dates, total, parts):
+    """Rows where the total is not the sum of the parts. Rows with a null total or part are skipped."""
+    values = df[[total] + parts]
+    return values.notna().all(axis=1) & (df[total] != values[parts].sum(axis=1))
+
+def range_rule(df, dates, column, min_value=None, max_value=None):
+    """Rows where the column is below min_value or above max_value. Null values are skipped."""
+    outside = pd.Series(False, index=df.index)
+    if min_value is not None:
+        outside |= df[column] < min_value
+    if max_value is not None:
+        outside |= df[column] > max_value
+    return outside
+
+# Each check is a function called with the DataFrame, the parsed date columns and the arguments in the constraint. It
+# returns a boolean Series that is True for the rows that break the constraint.
+CONSTRAINT_RULES = {
+    'not_null': not_null_rule,
+    'unique': unique_rule,
+    'unique_key': unique_key_rule,
+    'date_format': date_format_rule,
+    'duration': duration_rule,
+    'sum': sum_rule,
+    'range': range_rule,
+}
+
+def expand_constraints(constraints):
+    """
+    Split constraints with a 'columns' list into one constraint per column.
+    :param constraints: List of constraint dictionaries.
+    :return: List of (check name, arguments) tuples.
+    """
+    expanded = []
+    for constraint in constraints:
+        arguments = {k: v for k, v in constraint.items() if k not in ('check', 'columns')}
+        if 'columns' in constraint:
+            expanded.extend((constraint['check'], {'column': column, **arguments}) for column in constraint['columns'])
+        else:
+            expanded.append((constraint['check'], arguments))
+    return expanded
+
+def constraint_columns(check, arguments):
+    """Return the columns a constraint uses."""
+    columns = [arguments[k] for k in ('column', 'start', 'end', 'duration', 'total') if k in arguments]
+    return columns + list(arguments.get('parts', [])) + list(arguments.get('key', []))
+
+def columns_for_constraints(constraints):
+    """
+    Return the columns used by a list of constraints, to load only those columns with load_data.
+    :param constraints: List of constraint dictionaries, see DEFAULT_CONSTRAINTS.
+    :return: List of column names in the order they are first used.
+    """
+    columns = []
+    for check, arguments in expand_constraints(constraints):
+        columns.extend(column for column in constraint_columns(check, arguments) if column not in columns)
+    return columns
+
+def date_columns_to_parse(rules):
+    """Return the (column, format) pairs that the date format and duration rules need parsed."""
+    to_parse = []
+    for check, arguments in rules:
+        date_format = arguments.get('date_format', "%d/%m/%Y")
+        if check == 'date_format':
+            columns = [arguments['column']]
+        elif check == 'duration':
+            columns = [arguments['start'], arguments['end']]
+        else:
+            columns = []
+        to_parse.extend((column, date_format) for column in columns if (column, date_format) not in to_parse)
+    return to_parse
+
+def validate(df, constraints=None, max_workers=None, sample_size=10):
+    """
+    Check all the constraints in one pass over the columns and return a report.
+    The date columns are parsed once and shared by the date format and duration checks. Each check works on whole
+    columns, so the checks can be split across a thread pool; pandas releases the GIL for much of the work.
+    :param df: DataFrame containing data.
+    :param constraints: List of constraint dictionaries, see DEFAULT_CONSTRAINTS. Default is DEFAULT_CONSTRAINTS.
+    :param max_workers: Number of threads to run the checks in. Default is None, which runs them in this thread.
+    :param sample_size: Number of row indices to include in the report for each constraint that fails.
+    :return: Dictionary with the number of rows and a list of results, one per constraint and column. Each result
+        has the check, its arguments, the number of rows that fail and a sample of their indices, or an error if
+        a column is missing. It only holds lists, numbers and strings so it can be saved as JSON.
+    """
+    if constraints is None:
+        constraints = DEFAULT_CONSTRAINTS
+    rules = expand_constraints(constraints)
+    unknown = {check for check, arguments in rules if check not in CONSTRAINT_RULES}
+    if unknown:
+        raise ValueError(f"Unknown checks {sorted(unknown)}, expected one of {list(CONSTRAINT_RULES)}.")
+
+    results = [{'check': check, **arguments} for check, arguments in rules]
+    runnable = []
+    for result, (check, arguments) in zip(results, rules):
+        missing = [column for column in constraint_columns(check, arguments) if column not in df.columns]
+        if missing:
+            result['error'] = f"Columns {missing} not found in the dataset."
+        else:
+            runnable.append((result, check, arguments))
+
+    def run_rule(check, arguments):
+        return CONSTRAINT_RULES[check](df, dates, **arguments)
+
+    def parse(column, date_format):
+        return parse_date_column(df[column], date_format)
+
+    to_parse = date_columns_to_parse([(check, arguments) for result, check, arguments in runnable])
+    if max_workers is not None and max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            dates = dict(zip(to_parse, executor.map(lambda pair: parse(*pair), to_parse)))
+            masks = list(executor.map(lambda rule: run_rule(*rule[1:]), runnable))
+    else:
+        dates = {pair: parse(*pair) for pair in to_parse}
+        masks = [run_rule(check, arguments) for result, check, arguments in runnable]
+
+    for (result, check, arguments), mask in zip(runnable, masks):
+        failed_rows = df.index[mask.fillna(False).to_numpy(dtype=bool)]
+        result['failed'] = len(failed_rows)
+        result['sample_rows'] = failed_rows[:sample_size].tolist()
+    return {'rows': len(df), 'results': results}
+
+def log_report(report):
+    """
+    Log one line for each constraint in a report from validate.
+    :param report: Dictionary returned by validate.
+    """
+    for result in report['results']:
+        arguments = ', '.join(f'{k}={v}' for k, v in result.items()
+                              if k not in ('check', 'failed', 'sample_rows', 'error'))
+        if 'error' in result:
+            logging.error(f"{result['check']} ({arguments}): {result['error']}")
+        elif result['failed']:
+            logging.warning(f"{result['check']} ({arguments}): {result['failed']} of {report['rows']} rows fail, "
+                            f"e.g. rows {result['sample_rows']}")
+        else:
+            logging.info(f"{result['check']} ({arguments}): all rows pass.")
+
+def check_column_constraints(df, constraints=None, max_workers=None):
     """
     Check column constraints like NOT NULL, UNIQUE, etc.
+    All the constraints are checked in one pass by validate and one line is logged per constraint, rather than one per
+    bad row.
     :param df: DataFrame containing data.
+    :param constraints: List of constraint dictionaries. Default is DEFAULT_CONSTRAINTS.
+    :param max_workers: Number of threads to run the checks in. Default is None, which runs them in this thread.
+    :return: The report from validate.
     """
     if df is not None:
-        # Example checks for constraints based on dataset
-        check_unique_values(df, ['event_code', 'year', 'country', 'host'])
-        check_null_values(df, ['type', 'year', 'country', 'host', 'start', 'end', 'duration', 'Code'])
-        check_date_format(df, ['start', 'end'])
-        check_duration(df)
+        report = validate(df, constraints, max_workers=max_workers)
+        log_report(report)
+        return report
 
 def main(file_type: str):
     # Use absolute paths for the files
@@ -144,8 +508,8 @@ def main(file_type: str):
         logging.error("Unsupported file type. Use 'csv' or 'excel'.")
         return
 
-    # Load data
-    df_paralympics = load_data(datafile)
+    # Load only the columns that are checked
+    df_paralympics = load_data(datafile, columns=columns_for_constraints(DEFAULT_CONSTRAINTS))
 
     # Print data types
     print_data_types(df_paralympics)
@@ -4,6 +4,9 @@ from pathlib import Path
 
 import pandas as pd
 
+from tutorialpkg.caching import read_sheet
+from tutorialpkg.country_names import CountryIndex
+
 
 def create_paralympics_db_structure(cursor, connection):
     """Create the paralympics database structure."""
@@ -156,6 +159,40 @@ def create_paralympics_db_structure(cursor, connection):
             connection.rollback()
 
 
+def create_indexes(cursor, connection):
+    """Create secondary indexes on the columns used to look up and join the paralympics tables.
+
+    None of the tables have indexes other than their primary keys, so queries that filter or join on other columns
+    scan the whole table. Create the indexes after the data has been added as it is quicker than updating them for
+    each row inserted.
+    """
+    index_sql = [
+        'CREATE INDEX IF NOT EXISTS idx_event_year_type ON Event(year, type)',
+        'CREATE INDEX IF NOT EXISTS idx_host_host ON Host(host)',
+        'CREATE INDEX IF NOT EXISTS idx_country_name ON Country(name)',
+        'CREATE INDEX IF NOT EXISTS idx_disability_category ON Disability(category)',
+        'CREATE INDEX IF NOT EXISTS idx_medalresult_event_id ON MedalResult(event_id)',
+        'CREATE INDEX IF NOT EXISTS idx_medalresult_country_code ON MedalResult(country_code)',
+        'CREATE INDEX IF NOT EXISTS idx_participants_event_id ON Participants(event_id)',
+        'CREATE INDEX IF NOT EXISTS idx_question_event_id ON Question(event_id)',
+        'CREATE INDEX IF NOT EXISTS idx_answerchoice_question_id ON AnswerChoice(question_id)',
+        # The primary keys of the link tables start with the other column, so they cannot be used to join on event_id
+        'CREATE INDEX IF NOT EXISTS idx_hostevent_event_id ON HostEvent(event_id)',
+        'CREATE INDEX IF NOT EXISTS idx_disabilityevent_event_id ON DisabilityEvent(event_id)',
+    ]
+    try:
+        for sql in index_sql:
+            cursor.execute(sql)
+        # Update the statistics the query planner uses to choose between indexes
+        cursor.execute('ANALYZE;')
+        connection.commit()
+
+    except sqlite3.Error as e:
+        print(f'An error occurred creating the indexes. Error: {e}')
+        if connection:
+            connection.rollback()
+
+
 def add_country_data(df, cursor, connection):
     """Add the country data to the paralympics database."""
     # Insert all values into the country table
@@ -214,33 +251,81 @@ def add_event_data(df, cursor, connection):
             connection.rollback()
 
 
-def add_host_data(df_events, cursor, connection):
-    """Add data to the normalised paralympics database."""
+def fetch_key_map(cursor, sql):
+    """Run a SELECT once and return a dictionary that maps a key to an id, to look up foreign keys in memory.
+
+    The last column in the SELECT is the id, the other columns are the key. A single key column gives plain keys,
+    more than one gives tuple keys. If a key appears more than once the first row is kept, the same row that
+    fetchone() would return for a query on that key, so order the SELECT by the id.
+
+    Parameters
+    ----------
+    cursor : sqlite3 cursor
+    sql : SELECT statement with the key column(s) followed by the id column e.g. 'SELECT name, code FROM Country'
+
+    Returns
+    -------
+    dict of key -> id
+    """
+    key_map = {}
+    for *key, value in cursor.execute(sql).fetchall():
+        key_map.setdefault(key[0] if len(key) == 1 else tuple(key), value)
+    return key_map
+
+
+def extract_host_country_pairs(df_events):
+    """Return the unique (host, country) pairs in the events data.
+
+    An event can have more than one host, in which case the 'host' and 'country' columns hold comma-separated values
+    and the nth host is in the nth country. Both columns are split and exploded for all events at once, rather than
+    building the pairs one event at a time, so this scales linearly with the number of events.
+
+    Parameters
+    ----------
+    df_events : DataFrame with the 'host' and 'country' columns of the events data
+
+    Returns
+    -------
+    DataFrame with 'host' and 'country' columns, one row per unique pair, in the order they first appear
+    """
+    events = df_events[['host', 'country']].reset_index(drop=True)
+    exploded = {}
+    for col in ['host', 'country']:
+        values = events[col].str.split(',').explode()
+        # Number each value within its event so the nth host is paired with the nth country, as zip() would
+        exploded[col] = pd.DataFrame({'event': values.index, 'position': values.groupby(level=0).cumcount(),
+                                      col: values.str.strip()})
+    pairs = exploded['host'].merge(exploded['country'], on=['event', 'position'], how='inner')
+    return pairs[['host', 'country']].drop_duplicates().reset_index(drop=True)
+
+
+def add_host_data(df_events, cursor, connection, country_index=None):
+    """Add data to the normalised paralympics database.
+
+    Parameters
+    ----------
+    df_events : DataFrame with the events sheet data
+    cursor : sqlite3 cursor
+    connection : sqlite3 connection
+    country_index : CountryIndex to find the country codes in. Default is None, the codes are read from the Country
+        table.
+    """
 
     try:
         # Extract unique host and country pairs
-        # Initialize an empty DataFrame with the columns needed
-        host_country_df = pd.DataFrame(columns=['host', 'country'])
-        # Iterate over each row in the events DataFrame and split each column into multiple values where there is ','
-        for index, row in df_events.iterrows():
-            hosts = row['host'].split(',')
-            countries = row['country'].split(',')
-            # Create pairs of each host with each country and append to the DataFrame
-            for host, country in zip(hosts, countries):
-                new_row = pd.DataFrame({'host': [host.strip()], 'country': [country.strip()]})
-                host_country_df = pd.concat([host_country_df, new_row], ignore_index=True)
-        # Remove duplicate hosts from the dataframe
-        host_country_df = host_country_df.drop_duplicates(subset=['host', 'country'])
-
-        # Iterate over the dataframe, add the host and country to the host table
-        for index, row in host_country_df.iterrows():
-            # Get the country code from the country table
-            country_name = row['country']
-            select_sql = f'SELECT code from Country where name="{country_name}"'
-            result = cursor.execute(select_sql).fetchone()
-            country_code = result[0]
-            # Insert into the host table
-            host = row['host']
+        host_country_df = extract_host_country_pairs(df_events)
+
+        if country_index is None:
+            # Get all the country codes from the country table in one query
+            country_codes = fetch_key_map(cursor, 'SELECT name, code FROM Country')
+            codes = [country_codes[country] for country in host_country_df['country']]
+        else:
+            # Look up each country once in the index, which also matches other spellings of the names
+            codes = country_index.codes(host_country_df['country'])
+            codes = codes.astype(object).where(codes.notna(), None)
+
+        # Iterate over the pairs, add the host and country to the host table
+        for host, country_code in zip(host_country_df['host'], codes):
             cursor.execute('INSERT INTO Host (country_code, host) VALUES (?, ?)', (country_code, host))
 
         # Commit the changes
@@ -256,17 +341,18 @@ def add_host_event_data(df, cursor, connection):
     """Add HostEvent data to the paralympics database."""
 
     try:
+        # Get the event ids, which match based on the year and type of event, and the host ids in one query each
+        event_ids = fetch_key_map(cursor, 'SELECT year, type, event_id FROM Event ORDER BY event_id')
+        host_ids = fetch_key_map(cursor, 'SELECT host, host_id FROM Host ORDER BY host_id')
+
         # Iterate each event, find the pairs of hosts, then get the event_id and host_id and insert into the host_event table
         for index, row in df.iterrows():
             hosts = row['host'].split(',')
-            # Find the event id for the event. This matches based on the year and type of event.
-            event_id = cursor.execute(
-                'SELECT event_id FROM Event WHERE year = ? AND type = ?',
-                (row['year'], row['type'])
-            ).fetchone()[0]
+            # Find the event id for the event
+            event_id = event_ids[(row['year'], row['type'])]
             # Find the host_id for each host
             for host in hosts:
-                host_id = cursor.execute(f'SELECT host_id FROM Host WHERE host = "{host.strip()}"').fetchall()[0][0]
+                host_id = host_ids[host.strip()]
                 # Insert the host_event pair
                 cursor.execute('INSERT INTO HostEvent (host_id, event_id) VALUES (?, ?)', (host_id, event_id))
 
@@ -286,26 +372,28 @@ def add_disabilities_data(df, cursor, connection):
         split_disabilities = df['disabilities'].str.split(', ')
         # Flatten the list of lists into a single list
         all_disabilities = [item for sublist in split_disabilities for item in sublist]
-        # Convert the list to a set to get unique values
-        unique_disabilities = set(all_disabilities)
-        # Insert the unique values into the table
+        # Get the unique values in the order they first appear, as a set's order changes from run to run
+        unique_disabilities = dict.fromkeys(all_disabilities)
+        # Insert the unique values into the table, keeping the id of each new row
+        disability_ids = {}
         for d in unique_disabilities:
             cursor.execute('INSERT INTO Disability (category) VALUES (?)', (d,))
+            disability_ids[d] = cursor.lastrowid
         connection.commit()
 
+        # Get the event ids, which match based on the year and type of event, in one query
+        event_ids = fetch_key_map(cursor, 'SELECT year, type, event_id FROM Event ORDER BY event_id')
+
         # Iterate each result row in the event table
         for index, row in df.iterrows():
             # find the event_id
-            event_id = cursor.execute('SELECT event_id FROM Event WHERE year = ? AND type = ?',
-                                      (row['year'], row['type'])).fetchone()[0]
+            event_id = event_ids[(row['year'], row['type'])]
             # split the values for the disabilities
             disabilities = row['disabilities'].split(', ')
             # add each diability
             for d in disabilities:
                 # find the disability_id.
-                disability_id = cursor.execute(
-                    'SELECT disability_id FROM Disability WHERE category LIKE ?', (d,)
-                ).fetchone()[0]
+                disability_id = disability_ids[d]
                 # Insert into the DisabilityEvent table
                 cursor.execute('INSERT INTO DisabilityEvent (event_id, disability_id) VALUES (?, ?)',
                                (event_id, disability_id))
@@ -322,11 +410,13 @@ def add_medal_result_data(df, cursor, connection):
     """Add MedalResult data to the paralympics database."""
 
     try:
+        # Get the event ids in one query. This matches the first event in the year.
+        event_ids = fetch_key_map(cursor, 'SELECT year, event_id FROM Event ORDER BY event_id')
+
         # Iterate each result row, get the event_id and code and insert into the MedalResult table
         for index, row in df.iterrows():
-            # Find the event id for the event. This matches based on the year and type of event.
-            qry = f'SELECT event_id FROM Event WHERE year = {row['Year']}'
-            event_id = cursor.execute(qry).fetchone()[0]
+            # Find the event id for the event
+            event_id = event_ids[row['Year']]
             # Insert the medal results
             values = (event_id, row['NPC'], row['Rank'], row['Gold'], row['Silver'], row['Bronze'], row['Total'])
             sql = 'INSERT INTO MedalResult (event_id, country_code, rank, gold, silver, bronze, total) VALUES (?, ?, ?, ?, ?, ?, ?)'
@@ -340,14 +430,110 @@ def add_medal_result_data(df, cursor, connection):
             connection.rollback()
 
 
-def create_db(data_path, db_path, empty=False):
+def column_rows(df, columns):
+    """Return the values in the given columns as an iterator of row tuples for cursor.executemany.
+
+    Each column is converted to a list of Python values in one go, rather than creating a pandas Series for each row
+    as iterrows does. Missing values (NaN) are stored as NULL by sqlite3.
+    """
+    return zip(*(df[col].tolist() for col in columns))
+
+
+def bulk_load_data(events_df, medals_df, npc_df, cursor, connection, country_index=None):
+    """Add all the data to the paralympics database in a single transaction using executemany.
+
+    Alternative to calling each of the add_*_data functions, which insert one row at a time and commit after each
+    table. The tables must be empty, as created by create_paralympics_db_structure. The primary keys are numbered here
+    rather than by SQLite, so the foreign keys can be matched with pandas merges instead of a SELECT for each row.
+
+    Parameters
+    ----------
+    events_df : DataFrame with the events sheet data
+    medals_df : DataFrame with the medal_standings sheet data
+    npc_df : DataFrame with the npc_codes sheet data
+    cursor : sqlite3 cursor
+    connection : sqlite3 connection
+    country_index : CountryIndex to find the host country codes in. Default is None, the codes are found by merging
+        with npc_df on the name.
+
+    Raises
+    ------
+    Exception
+        Any error raised while adding the rows, after the transaction has been rolled back so no rows are added.
+    """
+    try:
+        cursor.executemany('INSERT INTO Country VALUES (?,?,?,?,?,?)', column_rows(npc_df, npc_df.columns))
+
+        # Host rows, with the country code found from the country name
+        hosts = extract_host_country_pairs(events_df)
+        if country_index is None:
+            hosts = hosts.merge(npc_df[['name', 'code']].drop_duplicates('name'), how='left', left_on='country',
+                                right_on='name')
+        else:
+            hosts['code'] = country_index.codes(hosts['country'])
+        hosts['host_id'] = range(1, len(hosts) + 1)
+        cursor.executemany('INSERT INTO Host (host_id, country_code, host) VALUES (?, ?, ?)',
+                           column_rows(hosts, ['host_id', 'code', 'host']))
+
+        # Event and Participants rows. The dates are converted to strings without changing the dataframe passed in.
+        events = events_df.assign(event_id=range(1, len(events_df) + 1),
+                                  start=events_df['start'].dt.strftime('%d/%m/%Y'),
+                                  end=events_df['end'].dt.strftime('%d/%m/%Y'))
+        cursor.executemany(
+            'INSERT INTO Event (event_id, type, year, start, end, countries, events, sports, highlights, url) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            column_rows(events, ['event_id', 'type', 'year', 'start', 'end', 'countries', 'events', 'sports',
+                                 'highlights', 'url']))
+        cursor.executemany(
+            'INSERT INTO Participants (event_id, participants_m, participants_f, participants) VALUES (?, ?, ?, ?)',
+            column_rows(events, ['event_id', 'participants_m', 'participants_f', 'participants']))
+
+        # HostEvent rows, one per host of each event
+        host_events = events[['event_id']].assign(host=events['host'].str.split(',')).explode('host')
+        host_events['host'] = host_events['host'].str.strip()
+        host_events = host_events.merge(hosts[['host', 'host_id']].drop_duplicates('host'), how='left', on='host')
+        cursor.executemany('INSERT INTO HostEvent (host_id, event_id) VALUES (?, ?)',
+                           column_rows(host_events, ['host_id', 'event_id']))
+
+        # Disability rows in the order they first appear, and DisabilityEvent rows, one per disability of each event
+        disability_events = events[['event_id']].assign(
+            category=events['disabilities'].str.split(', ')).explode('category')
+        disabilities = disability_events[['category']].drop_duplicates()
+        disabilities['disability_id'] = range(1, len(disabilities) + 1)
+        cursor.executemany('INSERT INTO Disability (disability_id, category) VALUES (?, ?)',
+                           column_rows(disabilities, ['disability_id', 'category']))
+        disability_events = disability_events.merge(disabilities, how='left', on='category')
+        cursor.executemany('INSERT INTO DisabilityEvent (event_id, disability_id) VALUES (?, ?)',
+                           column_rows(disability_events, ['event_id', 'disability_id']))
+
+        # MedalResult rows, matched to the first event in the same year
+        event_years = events[['year', 'event_id']].drop_duplicates('year')
+        medals = medals_df.merge(event_years, how='left', left_on='Year', right_on='year')
+        cursor.executemany(
+            'INSERT INTO MedalResult (event_id, country_code, rank, gold, silver, bronze, total) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            column_rows(medals, ['event_id', 'NPC', 'Rank', 'Gold', 'Silver', 'Bronze', 'Total']))
+
+        # Commit once, so all the tables are added in the same transaction
+        connection.commit()
+
+    except Exception as e:
+        # Roll back any error, not only SQLite errors, so either all the tables are added or none are
+        print(f'An error occurred bulk loading data to the paralympics database. Error: {e}')
+        connection.rollback()
+        raise
+
+
+def create_db(data_path, db_path, empty=False, bulk=False, indexes=False):
     """Creates a database in the specified directory.
 
     Parameters
     ----------
-    data_path : Path to the excel file with the data
+    data_path : Path to the excel file with the data, or a directory with a .csv or .parquet file per sheet
     db_path : Path to the database file
     empty : Boolean  If True then create a database with no rows. Default is False.
+    bulk : Boolean  If True then add all the data in one transaction using bulk_load_data. Default is False.
+    indexes : Boolean  If True then create the indexes in create_indexes after adding the data. Default is False.
     """
 
     # Create a connection to the database, create a cursor, and enable foreign key support
@@ -361,17 +547,29 @@ def create_db(data_path, db_path, empty=False):
 
     if not empty:
         # Read data and create pandas dataframes
-        events_df = pd.read_excel(data_path, sheet_name='events')
-        medals_df = pd.read_excel(data_path, sheet_name='medal_standings')
-        npc_df = pd.read_excel(data_path, sheet_name='npc_codes')
+        events_df = read_sheet(data_path, sheet_name='events')
+        medals_df = read_sheet(data_path, sheet_name='medal_standings')
+        npc_df = read_sheet(data_path, sheet_name='npc_codes')
+        # The country index is saved next to the data and only built again when the data changes
+        country_index = CountryIndex.load(data_path, sheet_name='npc_codes')
+        # Dates in CSV files are dd/mm/YYYY text rather than dates
+        for col in ['start', 'end']:
+            if not pd.api.types.is_datetime64_any_dtype(events_df[col]):
+                events_df[col] = pd.to_datetime(events_df[col], format='%d/%m/%Y')
 
         # add data to the tables
-        add_country_data(npc_df, cur, conn)
-        add_host_data(events_df, cur, conn)
-        add_event_data(events_df, cur, conn)
-        add_host_event_data(events_df, cur, conn)
-        add_disabilities_data(events_df, cur, conn)
-        add_medal_result_data(medals_df, cur, conn)
+        if bulk:
+            bulk_load_data(events_df, medals_df, npc_df, cur, conn, country_index=country_index)
+        else:
+            add_country_data(npc_df, cur, conn)
+            add_host_data(events_df, cur, conn, country_index=country_index)
+            add_event_data(events_df, cur, conn)
+            add_host_event_data(events_df, cur, conn)
+            add_disabilities_data(events_df, cur, conn)
+            add_medal_result_data(medals_df, cur, conn)
+
+    if indexes:
+        create_indexes(cur, conn)
 
     return cur, conn
 
@@ -0,0 +1,126 @@
+"""Write large DataFrames to .xlsx files in near-constant memory.
+
+DataFrame.to_excel builds every cell of the workbook in memory with openpyxl before anything is saved, so the memory
+used grows with the number of rows. A write-only openpyxl workbook streams each row to a temporary file as it is
+added instead. The rows can come from a list of DataFrames or an iterator of chunks such as
+pd.read_csv(..., chunksize=...). Each chunk is converted to Python values BATCH_ROWS rows at a time, so a single large
+DataFrame, e.g. [df], needs no more memory for the conversion than a chunk of BATCH_ROWS rows.
+
+A sheet holds at most 1,048,576 rows. When there are more, the rows carry on in a new sheet with the same header, named
+'<sheet_name>_2', '<sheet_name>_3' and so on.
+
+Example:
+    with pd.read_csv(csv_path, chunksize=100_000) as reader:
+        write_xlsx_chunks(xlsx_path, reader, sheet_name='events')
+"""
+import os
+from pathlib import Path
+
+# Rows in an Excel sheet, including the header row
+EXCEL_MAX_ROWS = 1_048_576
+
+# Rows of a chunk converted to Python values at a time
+BATCH_ROWS = 10_000
+
+
+def chunk_rows(chunk, columns=None):
+    """Return the rows of a DataFrame as tuples of Python values, with the missing values as None.
+
+    The values are converted a column at a time rather than a row at a time, as DataFrame.iterrows would.
+
+    Args:
+        chunk (pd.DataFrame): The rows.
+        columns (list): The columns to include, in order. Default is all the columns.
+
+    Returns:
+        iterator: A tuple per row.
+    """
+    if columns is not None:
+        chunk = chunk[columns]
+    values = chunk.astype(object).where(chunk.notna(), None)
+    return zip(*(values[col].tolist() for col in values.columns))
+
+
+def append_chunks(workbook, chunks, sheet_name, columns=None, number_formats=None, max_rows=EXCEL_MAX_ROWS,
+                  batch_rows=BATCH_ROWS):
+    """Add the rows of the chunks to a write-only workbook, starting a new sheet each time a sheet is full.
+
+    Args:
+        workbook (openpyxl.Workbook): A workbook created with write_only=True.
+        chunks (iterable): DataFrames with the same columns.
+        sheet_name (str): Name of the first sheet, later sheets have '_2', '_3'... added.
+        columns (list): The columns to write, in order. Default is the columns of the first chunk.
+        number_formats (dict): Excel number format by column name, e.g. {'start': 'dd/mm/yyyy'}. Default is None,
+            openpyxl's default formats.
+        max_rows (int): Rows per sheet, including the header row. Default is the Excel limit.
+        batch_rows (int): Rows of a chunk converted to Python values at a time. Default is BATCH_ROWS.
+
+    Returns:
+        list: The names of the sheets added.
+    """
+    from openpyxl.cell import WriteOnlyCell
+
+    number_formats = number_formats or {}
+    sheet_names = []
+    sheet = None
+    rows_in_sheet = max_rows
+    for chunk in chunks:
+        if columns is None:
+            columns = list(chunk.columns)
+        formats = [(i, number_formats[col]) for i, col in enumerate(columns) if col in number_formats]
+        batches = (chunk.iloc[start:start + batch_rows] for start in range(0, len(chunk), batch_rows))
+        for row in (row for batch in batches for row in chunk_rows(batch, columns)):
+            if rows_in_sheet == max_rows:
+                sheet_names.append(sheet_name if not sheet_names else f'{sheet_name}_{len(sheet_names) + 1}')
+                sheet = workbook.create_sheet(sheet_names[-1])
+                sheet.append(columns)
+                rows_in_sheet = 1
+            if formats:
+                row = list(row)
+                for i, number_format in formats:
+                    if row[i] is not None:
+                        cell = WriteOnlyCell(sheet, value=row[i])
+                        cell.number_format = number_format
+                        row[i] = cell
+            sheet.append(row)
+            rows_in_sheet += 1
+
+    # Keep a sheet with just the header when there are no rows
+    if not sheet_names:
+        sheet_names.append(sheet_name)
+        workbook.create_sheet(sheet_name).append(columns or [])
+    return sheet_names
+
+
+def write_xlsx_chunks(file_path, chunks, sheet_name='Sheet1', columns=None, number_formats=None,
+                      max_rows=EXCEL_MAX_ROWS):
+    """Stream DataFrame chunks to a new .xlsx file, splitting the rows across sheets at the Excel row limit.
+
+    The workbook is saved to a temporary file in the same directory and then renamed, so an existing file is only
+    replaced once the new one is complete.
+
+    Args:
+        file_path (Path): The .xlsx file to write.
+        chunks (iterable): DataFrames with the same columns, e.g. [df] or a pd.read_csv reader with a chunksize.
+        sheet_name (str): Name of the first sheet. Default is 'Sheet1', as for DataFrame.to_excel.
+        columns (list): The columns to write, in order. Default is the columns of the first chunk.
+        number_formats (dict): Excel number format by column name, e.g. {'start': 'dd/mm/yyyy'}. Default is None.
+        max_rows (int): Rows per sheet, including the header row. Default is the Excel limit.
+
+    Returns:
+        list: The names of the sheets written.
+    """
+    from openpyxl import Workbook
+
+    file_path = Path(file_path)
+    workbook = Workbook(write_only=True)
+    sheet_names = append_chunks(workbook, chunks, sheet_name, columns=columns, number_formats=number_formats,
+                                max_rows=max_rows)
+    tmp_path = file_path.with_name(f'{file_path.stem}.tmp{file_path.suffix}')
+    try:
+        workbook.save(tmp_path)
+        os.replace(tmp_path, file_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return sheet_names
@@ -0,0 +1,58 @@
+import os
+
+import pandas as pd
+
+from tutorialpkg import caching
+from tutorialpkg.caching import ResultCache, read_sheet, sheet_cache_paths
+
+
+def test_result_cache_keeps_only_the_most_recently_used_results(tmp_path):
+    """
+    GIVEN a result cache that keeps two results in memory
+    WHEN three results are cached, after the first has been used again
+    THEN the least recently used result is dropped from memory but is still read from the cache directory
+    """
+    cache = ResultCache(maxsize=2)
+    cache.put('a', {'rows': 1}, tmp_path)
+    cache.put('b', {'rows': 2})
+    assert cache.get('a') == {'rows': 1}
+    cache.put('c', {'rows': 3})
+    assert list(cache._results) == ['a', 'c']
+    assert cache.get('b') is None
+    cache.put('d', {'rows': 4})
+    cache.put('e', {'rows': 5})
+    assert cache.get('a') is None
+    assert cache.get('a', tmp_path) == {'rows': 1}
+
+
+def test_read_sheet_uses_cached_copy_until_workbook_changes(tmp_path, monkeypatch):
+    """
+    GIVEN a workbook whose sheet has been read once and cached
+    WHEN the sheet is read again, after the workbook is only touched, and after it is saved with new rows
+    THEN the cached copy is used until the contents change, and then the workbook is parsed and cached again
+    """
+    file_path = tmp_path.joinpath('events.xlsx')
+    pd.DataFrame({'year': [1960, 1964], 'type': ['summer', 'summer']}).to_excel(file_path, index=False)
+    first = read_sheet(file_path)
+    data_path, meta_path = sheet_cache_paths(file_path, 0)
+    assert data_path.exists() and meta_path.exists()
+
+    parsed = []
+    read_excel = pd.read_excel
+
+    def counted_read_excel(*args, **kwargs):
+        parsed.append(args)
+        return read_excel(*args, **kwargs)
+
+    monkeypatch.setattr(caching.pd, 'read_excel', counted_read_excel)
+    pd.testing.assert_frame_equal(read_sheet(file_path), first)
+    stat = file_path.stat()
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    pd.testing.assert_frame_equal(read_sheet(file_path), first)
+    assert parsed == []
+
+    pd.DataFrame({'year': [1960, 1964, 1968], 'type': ['summer'] * 3}).to_excel(file_path, index=False)
+    assert read_sheet(file_path)['year'].tolist() == [1960, 1964, 1968]
+    assert len(parsed) == 1
+    assert read_sheet(file_path)['year'].tolist() == [1960, 1964, 1968]
+    assert len(parsed) == 1
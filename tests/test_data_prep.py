@@ -0,0 +1,200 @@
+import io
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tutorialpkg import country_names
+from tutorialpkg.country_names import CountryIndex
+from tutorialpkg.data_utils import (DATA_DIR, build_pipeline, merge_dataframes, process_csv_in_chunks, run_in_chunks,
+                                    to_nullable_integers)
+from tutorialpkg.profiling import StreamingStatistics
+from tutorialpkg.week4 import duplicate_key_groups, duplicate_key_groups_in_chunks
+
+
+def test_to_nullable_integers_smallest_type_keeps_missing():
+    """
+    GIVEN float columns of whole numbers with missing values, a column with a fraction and a text column
+    WHEN they are converted with to_nullable_integers
+    THEN the whole number columns get the smallest nullable integer type that fits, with <NA> rather than 0 for the
+        missing values, and the other columns are left out
+    """
+    df = pd.DataFrame({
+        'participants': [209.0, np.nan, 70000.0],
+        'change': [-5.0, 3.0, np.nan],
+        'duration': [7.0, 4.5, 10.0],
+        'country': ['Italy', 'Japan', 'Israel'],
+    })
+    arrays = to_nullable_integers(df, df.columns)
+    assert set(arrays) == {'participants', 'change'}
+    converted = df.assign(**arrays)
+    assert converted['participants'].dtype == 'UInt32'
+    assert converted['change'].dtype == 'Int8'
+    assert converted['participants'].tolist() == [209, pd.NA, 70000]
+    assert converted['change'].tolist() == [-5, 3, pd.NA]
+
+
+def test_process_csv_in_chunks_matches_processing_whole_file(tmp_path):
+    """
+    GIVEN a CSV file of events, and a step that keeps only the winter events, so some chunks have no rows left
+    WHEN the file is processed in chunks of 2 rows, and processed whole
+    THEN the two output files are the same
+    """
+    input_path = tmp_path.joinpath('events.csv')
+    input_path.write_text('type,year\nsummer,1960\nsummer,1964\nwinter,1976\nsummer,1968\nwinter,1980\n',
+                          encoding='utf-8')
+
+    def winter_only(df):
+        return df[df['type'] == 'winter']
+
+    rows_written = process_csv_in_chunks(input_path, tmp_path.joinpath('chunked.csv'), winter_only, chunksize=2)
+    winter_only(pd.read_csv(input_path)).to_csv(tmp_path.joinpath('whole.csv'), index=False)
+    assert rows_written == 2
+    assert tmp_path.joinpath('chunked.csv').read_text() == tmp_path.joinpath('whole.csv').read_text()
+
+
+def test_process_csv_in_chunks_with_no_rows(tmp_path):
+    """
+    GIVEN a CSV file with only a header, and an empty file
+    WHEN each is processed in chunks
+    THEN the header only file gives an output file with only the header, and the empty file raises EmptyDataError as
+        pandas.read_csv does
+    """
+    input_path = tmp_path.joinpath('header_only.csv')
+    input_path.write_text('type,year\n', encoding='utf-8')
+    output_path = tmp_path.joinpath('output.csv')
+    output_path.write_text('old output\n', encoding='utf-8')
+    assert process_csv_in_chunks(input_path, output_path, lambda df: df, chunksize=2) == 0
+    assert output_path.read_text() == 'type,year\n'
+
+    empty_path = tmp_path.joinpath('empty.csv')
+    empty_path.write_text('', encoding='utf-8')
+    with pytest.raises(pd.errors.EmptyDataError):
+        process_csv_in_chunks(empty_path, output_path, lambda df: df, chunksize=2)
+
+
+def test_chunked_files_match_files_prepared_whole(tmp_path):
+    """
+    GIVEN a copy of the raw paralympics data files
+    WHEN the files are prepared whole by the pipeline, then again in chunks of 10 rows
+    THEN the prepared events and merged files are the same, with whole number counts in both
+    """
+    for name in ['paralympics_events_raw.csv', 'paralympics_all_raw.xlsx', 'npc_codes.csv', 'country_aliases.csv']:
+        shutil.copy(DATA_DIR.joinpath(name), tmp_path.joinpath(name))
+    output_names = ['paralympics_events_prepared.csv', 'paralympics_merged_prepared.csv']
+
+    build_pipeline(tmp_path, cache_dir=None)['write'].value()
+    whole_files = [tmp_path.joinpath(name).read_text() for name in output_names]
+    run_in_chunks(10, data_dir=tmp_path)
+    chunked_files = [tmp_path.joinpath(name).read_text() for name in output_names]
+
+    assert chunked_files == whole_files
+    assert '.0,' not in whole_files[1]
+
+
+def test_country_index_matches_names_codes_and_aliases():
+    """
+    GIVEN NPC codes and an alias table
+    WHEN the codes of country names written in different ways are found
+    THEN NPC names, codes and aliases match whatever their case, accents and punctuation, and unknown names are counted
+        as unmatched by the number of rows they are in
+    """
+    npc_df = pd.DataFrame({'Code': ['GBR', 'CIV', 'USA'],
+                           'Name': ["Great Britain", "Côte d'Ivoire", 'United States of America']})
+    aliases_df = pd.DataFrame({'Alias': ['UK', 'United States'], 'Code': ['GBR', 'USA']})
+    index = CountryIndex(npc_df, aliases_df)
+    names = pd.Series(['great britain', 'COTE DIVOIRE', 'usa', 'uk ', ' United  States ', 'Atlantis', 'Atlantis',
+                       None])
+    codes = index.codes(names)
+    assert codes.iloc[:5].tolist() == ['GBR', 'CIV', 'USA', 'GBR', 'USA']
+    assert codes.iloc[5:].isna().all()
+    assert dict(index.unmatched) == {'Atlantis': 2}
+    assert index.npc_names(pd.Series(['UK'])).tolist() == ['Great Britain']
+
+
+def test_saved_country_index_rebuilt_when_the_aliases_or_format_change(tmp_path, monkeypatch):
+    """
+    GIVEN a country index saved for NPC codes and aliases files
+    WHEN an alias is added, and then the index format version changes
+    THEN the saved index is used until then, and each change builds and saves the index again
+    """
+    npc_path = tmp_path.joinpath('npc_codes.csv')
+    aliases_path = tmp_path.joinpath('country_aliases.csv')
+    pd.DataFrame({'Code': ['GBR', 'USA'], 'Name': ['Great Britain', 'United States of America']}).to_csv(
+        npc_path, index=False)
+    aliases_path.write_text('Alias,Code\nUK,GBR\n', encoding='utf-8')
+
+    CountryIndex.load(npc_path, aliases_path=aliases_path)
+    saved = CountryIndex.load(npc_path, aliases_path=aliases_path)
+    assert saved._index is None
+    assert saved.codes(pd.Series(['UK', 'America'])).tolist()[0] == 'GBR'
+    assert saved._index is None
+
+    aliases_path.write_text('Alias,Code\nUK,GBR\nAmerica,USA\n', encoding='utf-8')
+    rebuilt = CountryIndex.load(npc_path, aliases_path=aliases_path)
+    assert rebuilt._index is not None
+    assert rebuilt.codes(pd.Series(['UK', 'America'])).tolist() == ['GBR', 'USA']
+    assert CountryIndex.load(npc_path, aliases_path=aliases_path)._index is None
+
+    monkeypatch.setattr(country_names, 'INDEX_FORMAT_VERSION', country_names.INDEX_FORMAT_VERSION + 1)
+    assert CountryIndex.load(npc_path, aliases_path=aliases_path)._index is not None
+
+
+def test_duplicate_key_groups():
+    """
+    GIVEN events where two rows have the same year and type
+    WHEN the duplicate keys are found
+    THEN the rows with the same key are grouped with the key, and rows with the same year but a different type are not
+    """
+    df = pd.DataFrame({'year': [1960, 1964, 1960, 1960], 'type': ['summer', 'summer', 'summer', 'winter']})
+    assert duplicate_key_groups(df, ['year', 'type']) == [{'key': (1960, 'summer'), 'rows': [0, 2]}]
+    assert duplicate_key_groups(df.iloc[:2], ['year', 'type']) == []
+
+
+def test_duplicate_keys_found_across_chunks_with_different_dtypes():
+    """
+    GIVEN a CSV where the key 'year' is read as int64 in the first chunk and float64 in the second, as it has a
+        missing value
+    WHEN the duplicate keys are found in chunks of two rows
+    THEN the same duplicate rows are found as in the whole file
+    """
+    csv = "year,type\n1960,summer\n1964,summer\n1960,summer\n,winter\n"
+    chunks = pd.read_csv(io.StringIO(csv), chunksize=2)
+    groups = duplicate_key_groups_in_chunks(chunks, ['year', 'type'])
+    whole_file_groups = duplicate_key_groups(pd.read_csv(io.StringIO(csv)), ['year', 'type'])
+    assert [group['rows'] for group in groups] == [group['rows'] for group in whole_file_groups] == [[0, 2]]
+
+
+def test_unmatched_country_not_merged_with_npc_row_without_code():
+    """
+    GIVEN NPC codes that include a row with no code
+    WHEN events with a country that is not in the NPC codes are merged with them
+    THEN the unmatched event has no code or NPC name, and the matched event has both
+    """
+    npc_df = pd.DataFrame({'Code': ['GBR', None], 'Name': ['Great Britain', 'X']})
+    events_df = pd.DataFrame({'country': ['UK', 'Atlantis']})
+    merged_df = merge_dataframes(events_df, npc_df, verbose=False)
+    assert merged_df['Code'].tolist()[0] == 'GBR'
+    assert merged_df['Name'].tolist()[0] == 'Great Britain'
+    assert merged_df[['Code', 'Name']].iloc[1].isna().all()
+    assert len(merged_df) == 2
+
+
+def test_merged_streaming_statistics_match_describe():
+    """
+    GIVEN a DataFrame with missing values split into chunks
+    WHEN the statistics of each chunk are calculated separately and then merged
+    THEN the count, mean, std, min and max match DataFrame.describe and the null counts match isna
+    """
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'participants': rng.normal(1000, 300, 1000), 'events': rng.integers(50, 600, 1000)})
+    df.loc[rng.choice(1000, 50, replace=False), 'participants'] = np.nan
+    stats = StreamingStatistics()
+    for start in range(0, len(df), 300):
+        stats.merge(StreamingStatistics().update(df.iloc[start:start + 300]))
+    summary = stats.summary()
+    expected = df.describe().loc[['count', 'mean', 'std', 'min', 'max']]
+    pd.testing.assert_frame_equal(summary.loc[expected.index], expected)
+    assert summary.loc['null'].tolist() == df.isna().sum().tolist()
+    assert stats.rows == len(df)
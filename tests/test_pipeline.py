@@ -0,0 +1,74 @@
+import sys
+import types
+
+import pandas as pd
+
+from tutorialpkg.pipeline import FileInput, Stage, code_key
+
+# Each call of count_rows, so the tests can tell a stage that ran from one loaded from the cache
+calls = []
+
+
+def count_rows(path):
+    calls.append(path)
+    return len(pd.read_csv(path))
+
+
+def add_module(monkeypatch, tmp_path, name, source):
+    """Make a module in the tutorialpkg package from source saved in tmp_path, as code_key reads the module files."""
+    file_path = tmp_path.joinpath(f'{name}.py')
+    file_path.write_text(source, encoding='utf-8')
+    module = types.ModuleType(f'tutorialpkg.{name}')
+    module.__file__ = str(file_path)
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+    exec(compile(source, str(file_path), 'exec'), vars(module))
+    return module
+
+
+def test_code_key_changes_when_a_module_the_function_uses_changes(monkeypatch, tmp_path):
+    """
+    GIVEN a package function in a module that imports a helper module
+    WHEN the helper module's source changes, and then a module that is not used changes
+    THEN the code key changes only for the change to the helper module
+    """
+    helper = add_module(monkeypatch, tmp_path, 'helper_for_test', 'def double(x):\n    return 2 * x\n')
+    stage_module = add_module(monkeypatch, tmp_path, 'stage_for_test', 'def run(x):\n    return x\n')
+    add_module(monkeypatch, tmp_path, 'unused_for_test', 'VALUE = 1\n')
+    stage_module.helper_for_test = helper
+    key = code_key(stage_module.run)
+    assert code_key(stage_module.run) == key
+
+    tmp_path.joinpath('unused_for_test.py').write_text('VALUE = 2\n', encoding='utf-8')
+    assert code_key(stage_module.run) == key
+
+    tmp_path.joinpath('helper_for_test.py').write_text('def double(x):\n    return x + x\n', encoding='utf-8')
+    assert code_key(stage_module.run) != key
+    assert code_key(pd.read_csv) == code_key(pd.read_csv)
+
+
+def test_stage_loaded_from_cache_until_its_input_changes(tmp_path):
+    """
+    GIVEN a stage that counts the rows of a CSV file, with a cache directory
+    WHEN the stage is made again with the same input, and then after the input file changes
+    THEN the second stage loads the output from the cache without running, and the third runs with the new rows
+    """
+    csv_path = tmp_path.joinpath('events.csv')
+    csv_path.write_text('year\n1960\n1964\n', encoding='utf-8')
+    cache_dir = tmp_path.joinpath('cache')
+    calls.clear()
+
+    def make_stage():
+        return Stage('count', count_rows, [FileInput(csv_path)], cache_dir=cache_dir)
+
+    assert make_stage().value() == 2
+    cached = make_stage()
+    assert cached.is_cached()
+    assert cached.value() == 2
+    assert len(calls) == 1
+
+    csv_path.write_text('year\n1960\n1964\n1968\n', encoding='utf-8')
+    changed = make_stage()
+    assert not changed.is_cached()
+    assert changed.value() == 3
+    assert len(calls) == 2
+    assert len(list(cache_dir.glob('count-*.pkl'))) == 1
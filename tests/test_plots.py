@@ -0,0 +1,74 @@
+import matplotlib
+
+matplotlib.use('Agg')
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from tutorialpkg.downsample import downsample, minmax_positions  # noqa: E402
+from tutorialpkg.sample import draw_and_save_histogram_by_event_type, with_histogram_counts  # noqa: E402
+
+
+def test_histogram_counts_calculated_once_and_drawn_without_the_rows(tmp_path):
+    """
+    GIVEN plot specifications for the summer and winter histograms of the same columns, and a box plot
+    WHEN the histogram counts are added to the specifications
+    THEN both histograms share one set of counts, the box plot is unchanged, and the histograms are drawn from the
+        counts without the DataFrame
+    """
+    df = pd.DataFrame({'type': ['summer', 'winter', 'summer'], 'participants_m': [100, 20, 300],
+                       'participants_f': [50, 10, 150]})
+    columns = ['participants_m', 'participants_f']
+    specs = [{'plot': 'draw_and_save_histogram_by_event_type', 'event_type': 'summer', 'columns': columns},
+             {'plot': 'draw_and_save_histogram_by_event_type', 'event_type': 'winter', 'columns': columns},
+             {'plot': 'draw_and_save_boxplot', 'columns': columns}]
+    specs_with_counts = with_histogram_counts(df, specs)
+    assert specs_with_counts[0]['histograms'] is specs_with_counts[1]['histograms']
+    assert specs_with_counts[2] == specs[2]
+    assert 'histograms' not in specs[0]
+    assert specs_with_counts[0]['histograms']['groups']['summer']['participants_m']['counts'][0] == 1
+
+    for spec in specs_with_counts[:2]:
+        kwargs = {key: value for key, value in spec.items() if key != 'plot'}
+        path = draw_and_save_histogram_by_event_type(None, save_dir=tmp_path, show=False, **kwargs)
+        assert path.exists()
+
+
+def test_minmax_positions_keeps_the_extremes_within_the_budget():
+    """
+    GIVEN a long random walk with a single spike, a single dip and a gap of missing values
+    WHEN the points to draw are chosen with a budget of 100 points
+    THEN no more than 100 positions are kept, in order, including the first and last points, the spike, the dip and a
+        missing value in the gap, and a series no longer than the budget is kept whole
+    """
+    rng = np.random.default_rng(0)
+    values = 1_000 + np.cumsum(rng.normal(0, 5, 10_001))
+    values[3_333] += 5_000
+    values[6_666] -= 5_000
+    values[8_000:8_500] = np.nan
+    keep = minmax_positions(pd.Series(values), point_budget=100)
+    assert len(keep) <= 100
+    assert np.all(np.diff(keep) > 0)
+    assert {0, 3_333, 6_666, 10_000} <= set(keep.tolist())
+    # The gap is longer than a bucket, so a missing value is kept and the line is broken there
+    assert np.isnan(values[keep]).any()
+    assert not np.isnan(values[keep[(keep < 8_000) | (keep >= 8_500)]]).any()
+
+    assert minmax_positions(values[:100], point_budget=100).tolist() == list(range(100))
+    assert len(minmax_positions(values, point_budget=None)) == len(values)
+
+
+def test_downsample_keeps_the_rows_of_either_column():
+    """
+    GIVEN rows with a male and a female participants column that peak at different rows
+    WHEN they are downsampled for both columns together
+    THEN the rows kept include the peak of each column, in their original order
+    """
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({'participants_m': rng.normal(100, 5, 5_000), 'participants_f': rng.normal(50, 5, 5_000)})
+    df.loc[1_234, 'participants_m'] = 1_000
+    df.loc[4_321, 'participants_f'] = 1_000
+    points = downsample(df, ['participants_m', 'participants_f'], point_budget=50)
+    assert len(points) <= 100
+    assert {1_234, 4_321} <= set(points.index)
+    assert points.index.is_monotonic_increasing
@@ -0,0 +1,99 @@
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from tutorialpkg.caching import read_sheet
+from tutorialpkg.week8_queries.create_query_db import (bulk_load_data, create_db, create_paralympics_db_structure,
+                                                      extract_host_country_pairs)
+
+DATA_PATH = Path(__file__).parent.parent.joinpath('src', 'tutorialpkg', 'data_db_activity', 'paralympics_all.xlsx')
+
+
+def read_tables(cur):
+    """Return the rows of every table in the database, sorted, by table name."""
+    tables = [row[0] for row in cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+    return {table: sorted(cur.execute(f'SELECT * FROM {table}').fetchall(), key=repr) for table in tables}
+
+
+def test_bulk_load_matches_row_by_row(tmp_path):
+    """
+    GIVEN the paralympics workbook
+    WHEN one database is created row by row and another with bulk=True
+    THEN every table has the same rows in both databases
+    """
+    # Copy the workbook so the cached sheets and country index are saved in the temporary directory
+    data_path = tmp_path.joinpath(DATA_PATH.name)
+    shutil.copy(DATA_PATH, data_path)
+    cur, conn = create_db(data_path, tmp_path.joinpath('row_by_row.db'))
+    bulk_cur, bulk_conn = create_db(data_path, tmp_path.joinpath('bulk.db'), bulk=True)
+    try:
+        tables = read_tables(cur)
+        assert tables == read_tables(bulk_cur)
+        assert all(tables[table] for table in ['Country', 'Event', 'Host', 'HostEvent', 'MedalResult'])
+    finally:
+        conn.close()
+        bulk_conn.close()
+
+
+def test_bulk_load_adds_no_rows_if_any_table_fails(tmp_path):
+    """
+    GIVEN the paralympics workbook with the NPC column removed from the medal standings
+    WHEN the data is bulk loaded into an empty database
+    THEN the error is raised and no rows are added to any table, including those loaded before the medal results
+    """
+    data_path = tmp_path.joinpath(DATA_PATH.name)
+    shutil.copy(DATA_PATH, data_path)
+    events_df = read_sheet(data_path, sheet_name='events')
+    medals_df = read_sheet(data_path, sheet_name='medal_standings').drop(columns=['NPC'])
+    npc_df = read_sheet(data_path, sheet_name='npc_codes')
+    conn = sqlite3.connect(tmp_path.joinpath('bulk.db'))
+    try:
+        cur = conn.cursor()
+        create_paralympics_db_structure(cur, conn)
+        with pytest.raises(KeyError):
+            bulk_load_data(events_df, medals_df, npc_df, cur, conn)
+        assert not any(read_tables(cur).values())
+    finally:
+        conn.close()
+
+
+def test_host_country_pairs_match_each_host_with_its_country():
+    """
+    GIVEN events with one host, two hosts in two countries, and a repeated host
+    WHEN the host and country pairs are extracted
+    THEN the nth host is paired with the nth country, spaces are stripped and each pair appears once in the order it
+        is first found
+    """
+    events = pd.DataFrame({'host': ['Rome', 'Stoke Mandeville, New York', 'Innsbruck', 'Innsbruck'],
+                           'country': ['Italy', 'Great Britain, United States of America', 'Austria', 'Austria']},
+                          index=[10, 20, 30, 40])
+    pairs = extract_host_country_pairs(events)
+    assert list(pairs.itertuples(index=False, name=None)) == [
+        ('Rome', 'Italy'), ('Stoke Mandeville', 'Great Britain'), ('New York', 'United States of America'),
+        ('Innsbruck', 'Austria')]
+
+
+def test_indexes_created_after_the_data_is_added(tmp_path):
+    """
+    GIVEN the paralympics workbook
+    WHEN a database is created with indexes=True, and another without
+    THEN only the first has the secondary indexes, and a query on the event year and type uses its index
+    """
+    data_path = tmp_path.joinpath(DATA_PATH.name)
+    shutil.copy(DATA_PATH, data_path)
+    cur, conn = create_db(data_path, tmp_path.joinpath('indexed.db'), bulk=True, indexes=True)
+    plain_cur, plain_conn = create_db(data_path, tmp_path.joinpath('plain.db'), bulk=True)
+    index_sql = "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'"
+    try:
+        indexes = {row[0] for row in cur.execute(index_sql)}
+        assert {'idx_event_year_type', 'idx_hostevent_event_id', 'idx_disabilityevent_event_id'} <= indexes
+        assert len(indexes) == 11
+        assert plain_cur.execute(index_sql).fetchall() == []
+        plan = cur.execute("EXPLAIN QUERY PLAN SELECT * FROM Event WHERE year = 2012 AND type = 'summer'").fetchall()
+        assert 'idx_event_year_type' in ' '.join(row[-1] for row in plan)
+    finally:
+        conn.close()
+        plain_conn.close()
@@ -0,0 +1,96 @@
+import pandas as pd
+import pytest
+
+from tutorialpkg.week4 import check_date_format, check_duration, load_data, validate
+
+
+def test_date_format_and_duration_checks_find_bad_rows():
+    """
+    GIVEN events with a date in the wrong format, a missing date and a wrong duration
+    WHEN the date formats and durations are checked
+    THEN the rows with bad dates are found for each column, and the rows with a wrong duration or a date that cannot be
+        parsed are found by the duration check
+    """
+    df = pd.DataFrame({'start': ['18/09/1960', '1964-11-08', '05/11/1968', '02/08/1972'],
+                       'end': ['25/09/1960', '12/11/1964', None, '11/08/1972'],
+                       'duration': [7, 4, 9, 8]},
+                      index=[10, 11, 12, 13])
+    errors = check_date_format(df, ['start', 'end'])
+    assert errors['start'].tolist() == [11]
+    assert errors['end'].tolist() == [12]
+    assert check_duration(df).tolist() == [11, 12, 13]
+
+
+def test_validate_finds_the_rows_that_break_each_rule():
+    """
+    GIVEN events where each row breaks one rule: a missing country, a repeated year and type, a badly formatted date, a
+        wrong duration, a total that is not the sum of its parts and a year before 1960
+    WHEN they are validated, in this thread and in a thread pool
+    THEN each rule reports only its bad row, a rule on a missing column reports an error, and both reports are the same
+    """
+    df = pd.DataFrame({
+        'type': ['summer', 'summer', 'summer', 'winter', 'winter', 'winter', 'summer'],
+        'year': [1960, 1964, 1964, 1976, 1980, 1950, 1968],
+        'country': ['Italy', 'Japan', 'Japan', None, 'Norway', 'Austria', 'Israel'],
+        'start': ['18/09/1960', '08/11/1964', '1964-11-08', '21/02/1976', '01/02/1980', '15/01/1950', '05/11/1968'],
+        'end': ['25/09/1960', '12/11/1964', '12/11/1964', '28/02/1976', '08/02/1980', '21/01/1950', '14/11/1968'],
+        'duration': [7, 4, 4, 7, 6, 6, 9],
+        'participants_m': [100, 195, 195, 161, 229, 325, 578],
+        'participants_f': [9, 71, 71, 37, 70, 94, 196],
+        'participants': [109, 266, 266, 198, 299, 419, 700],
+    })
+    constraints = [
+        {'check': 'not_null', 'columns': ['country']},
+        {'check': 'unique_key', 'key': ['year', 'type']},
+        {'check': 'date_format', 'columns': ['start']},
+        {'check': 'duration', 'start': 'start', 'end': 'end', 'duration': 'duration'},
+        {'check': 'sum', 'total': 'participants', 'parts': ['participants_m', 'participants_f']},
+        {'check': 'range', 'columns': ['year'], 'min_value': 1960},
+        {'check': 'not_null', 'columns': ['Code']},
+    ]
+    report = validate(df, constraints)
+    assert report['rows'] == 7
+    assert [result.get('sample_rows') for result in report['results']] == [[3], [1, 2], [2], [4], [6], [5], None]
+    assert report['results'][-1]['error'] == "Columns ['Code'] not found in the dataset."
+    assert validate(df, constraints, max_workers=4) == report
+
+
+def test_validate_rejects_unknown_checks():
+    """
+    GIVEN a constraint with a check that does not exist
+    WHEN the data is validated
+    THEN a ValueError names the unknown check
+    """
+    with pytest.raises(ValueError, match='not_a_check'):
+        validate(pd.DataFrame({'year': [1960]}), [{'check': 'not_a_check', 'columns': ['year']}])
+
+
+def test_load_data_reads_only_the_columns_asked_for(tmp_path):
+    """
+    GIVEN a CSV file and an Excel file of events
+    WHEN they are loaded with a list of columns, with dtypes, and with and without Arrow-backed columns
+    THEN only the columns in the list and in the file are read, in file order, the dtypes are used, the dates are read
+        as text, and the counts are Arrow-backed only when use_arrow is True
+    """
+    csv_path = tmp_path.joinpath('events.csv')
+    csv_path.write_text('type,year,start,highlights\nsummer,1960,18/09/1960,First games\nwinter,1976,21/02/1976,\n',
+                        encoding='utf-8')
+    xlsx_path = tmp_path.joinpath('events.xlsx')
+    pd.read_csv(csv_path).to_excel(xlsx_path, index=False)
+
+    df = load_data(csv_path, columns=['start', 'year', 'not_in_file'])
+    assert list(df.columns) == ['year', 'start']
+    assert isinstance(df['year'].dtype, pd.ArrowDtype)
+    assert df['start'].tolist() == ['18/09/1960', '21/02/1976']
+
+    df = load_data(csv_path, columns=['year', 'start'], use_arrow=False)
+    assert df['year'].dtype == 'int64'
+
+    df = load_data(csv_path, dtypes={'year': 'float64', 'not_in_file': 'int64'})
+    assert list(df.columns) == ['type', 'year', 'start', 'highlights']
+    assert df['year'].dtype == 'float64'
+
+    df = load_data(xlsx_path, columns=['year', 'type'])
+    assert list(df.columns) == ['type', 'year']
+    assert isinstance(df['year'].dtype, pd.ArrowDtype)
+    assert load_data(xlsx_path, columns=['year', 'type'], use_arrow=False)['year'].dtype == 'int64'
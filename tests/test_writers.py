@@ -0,0 +1,102 @@
+import pandas as pd
+import pytest
+
+from tutorialpkg.tutor_solution import tutorial2_refactored
+from tutorialpkg.tutor_solution.tutorial2_refactored import WRITERS, save_dataframe_to_file, save_dataframe_to_files
+from tutorialpkg.xlsx_export import write_xlsx_chunks
+
+READERS = {'csv': pd.read_csv, 'xlsx': pd.read_excel, 'parquet': pd.read_parquet, 'feather': pd.read_feather}
+
+
+@pytest.fixture
+def events():
+    return pd.DataFrame({'type': ['summer', 'winter', 'summer'], 'year': [1960, 1976, 1964],
+                         'participants': [209, 198, 266]})
+
+
+@pytest.mark.parametrize('file_type', list(WRITERS))
+def test_saved_file_reads_back_as_the_same_dataframe(tmp_path, events, file_type):
+    """
+    GIVEN a dataframe of events
+    WHEN it is saved with the writer for a file type and read back
+    THEN the data is unchanged and no temporary file is left in the directory
+    """
+    file_path = tmp_path.joinpath(f'events.{file_type}')
+    save_dataframe_to_file(events, file_path, file_type)
+    pd.testing.assert_frame_equal(READERS[file_type](file_path), events, check_dtype=False)
+    assert [path.name for path in tmp_path.iterdir()] == [file_path.name]
+
+
+def test_failed_save_leaves_the_existing_file_unchanged(tmp_path, events, monkeypatch):
+    """
+    GIVEN a saved CSV file, and a CSV writer that fails after writing part of the file
+    WHEN the dataframe is saved over the file again
+    THEN the error is raised, the existing file is unchanged and the partly written file is removed
+    """
+    file_path = tmp_path.joinpath('events.csv')
+    save_dataframe_to_file(events, file_path, 'csv')
+    saved = file_path.read_bytes()
+
+    def failing_writer(df, path, compression=None):
+        path.write_text('type,ye', encoding='utf-8')
+        raise OSError('disk full')
+
+    monkeypatch.setitem(tutorial2_refactored.WRITERS, 'csv', failing_writer)
+    with pytest.raises(OSError, match='disk full'):
+        save_dataframe_to_file(events.head(1), file_path, 'csv')
+    assert file_path.read_bytes() == saved
+    assert [path.name for path in tmp_path.iterdir()] == [file_path.name]
+
+
+def test_save_to_several_files_at_once(tmp_path, events):
+    """
+    GIVEN a dataframe of events
+    WHEN it is saved as Parquet and Feather at the same time, the Parquet file with zstd compression
+    THEN both files are saved with the same data
+    """
+    file_paths = {'parquet': tmp_path.joinpath('events.parquet'), 'feather': tmp_path.joinpath('events.feather')}
+    saved = save_dataframe_to_files(events, file_paths, compression={'parquet': 'zstd'})
+    assert saved == list(file_paths.values())
+    for file_type, file_path in file_paths.items():
+        pd.testing.assert_frame_equal(READERS[file_type](file_path), events, check_dtype=False)
+
+
+def test_unknown_file_type_is_rejected(tmp_path, events):
+    """
+    GIVEN a file type that has no writer
+    WHEN a dataframe is saved as that type
+    THEN a ValueError is raised and no file is written
+    """
+    with pytest.raises(ValueError):
+        save_dataframe_to_file(events, tmp_path.joinpath('events.txt'), 'txt')
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_xlsx_rows_carry_on_in_new_sheets_when_a_sheet_is_full(tmp_path):
+    """
+    GIVEN chunks of 3 and 4 rows, one with a missing value, and sheets that hold a header and 3 rows
+    WHEN the chunks are streamed to an .xlsx file
+    THEN the rows fill three sheets in order, each with the header, and read back as the chunks joined together
+    """
+    chunks = [pd.DataFrame({'year': [1960, 1964, 1968], 'participants': [209, 266, None]}),
+              pd.DataFrame({'year': [1972, 1976, 1980, 1984], 'participants': [922, 1271, 1653, 2105]})]
+    file_path = tmp_path.joinpath('events.xlsx')
+    sheet_names = write_xlsx_chunks(file_path, iter(chunks), sheet_name='events', max_rows=4)
+    assert sheet_names == ['events', 'events_2', 'events_3']
+
+    sheets = pd.read_excel(file_path, sheet_name=None)
+    assert list(sheets) == sheet_names
+    assert [len(sheet) for sheet in sheets.values()] == [3, 3, 1]
+    pd.testing.assert_frame_equal(pd.concat(sheets.values(), ignore_index=True),
+                                  pd.concat(chunks, ignore_index=True), check_dtype=False)
+
+
+def test_xlsx_with_no_rows_has_a_header_only_sheet(tmp_path):
+    """
+    GIVEN a chunk with columns but no rows
+    WHEN it is streamed to an .xlsx file
+    THEN the file has one sheet with just the header
+    """
+    file_path = tmp_path.joinpath('events.xlsx')
+    assert write_xlsx_chunks(file_path, [pd.DataFrame(columns=['year', 'type'])]) == ['Sheet1']
+    assert list(pd.read_excel(file_path).columns) == ['year', 'type']